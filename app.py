@@ -1,25 +1,40 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from utils import fetch_portfolio_data, load_performance, API_URL, calculate_portfolio_correlation, calculate_market_value_changes
+from lazy_imports import lazy_import, start_import_warm_up
+from utils import load_exchange_rate_data, API_URL, CURRENCY_PAIRS, HEATMAP_ANNOTATION_LIMIT, LIVE_QUOTES_REFRESH, LIVE_QUOTES_URL, MARKET_VALUE_HORIZONS, RISK_CONFIDENCE_LEVEL, SIMULATION_CHUNK_PATHS, get_analytics_scheduler, get_chart_bars, get_chart_line, get_data_service, get_quote_consumer, get_simulation_pool
+from charts import correlation_heatmap_figure, correlation_heatmap_png
+from simulation import SimulationRun
+from live_quotes import LiveHoldings
+from holdings_store import get_symbol_history
+from downsampling import AUTO_RESOLUTION, FULL_RESOLUTION, RESAMPLE_RULES
 from datetime import datetime, timedelta
 import os
 
+# Plotting libraries load on first use, or earlier from the warm-up thread
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+
 st.set_page_config(layout="wide", page_title="Portfolio Dashboard")
 
 st.title("📈 Portfolio Dashboard")
+start_import_warm_up()
 
 # --- Load Data ---
-portfolio_holdings_data, portfolio_metrics_data = fetch_portfolio_data()
-performance_df = load_performance()
-max_performance_date = performance_df['date'].max()
-min_performance_date = performance_df['date'].min()
-if portfolio_holdings_data is None or portfolio_metrics_data is None:
-    st.error("Failed to load portfolio data from API. Please check the API endpoint and your connection.")
+# Data and analytics are precomputed by a background scheduler, sessions only read its latest snapshot
+analytics_scheduler = get_analytics_scheduler()
+with st.spinner("Loading portfolio data..."):
+    snapshot = analytics_scheduler.latest()
+if snapshot is None:
+    st.error(f"Failed to load portfolio data from API. Please check the API endpoint and your connection. ({analytics_scheduler.last_error})")
     st.stop()
+for message in snapshot.warnings:
+    st.warning(message)
 
-holdings_df = pd.DataFrame(portfolio_holdings_data)
+portfolio_metrics_data = snapshot.portfolio_metrics
+performance_df = snapshot.performance.data
+max_performance_date = performance_df['date'].max()
+min_performance_date = performance_df['date'].min()
+st.caption(f"Data as of {datetime.fromtimestamp(snapshot.as_of):%Y-%m-%d %H:%M:%S}")
 
 # Formatting and Styling
 def color_change(val):
@@ -51,6 +66,16 @@ def color_change(val):
 st.sidebar.header("Data Sources")
 st.sidebar.markdown(f"**Holdings ngrok endpoint:** `{API_URL}/accounts/holdings` & `{API_URL}/market/data`")
 st.sidebar.markdown(f"**Performance History Range:** `F:{min_performance_date}T:{max_performance_date}`")
+with st.sidebar.expander("Data Cache Metrics"):
+    # Shared between all sessions of this server process
+    cache_metrics = pd.DataFrame(get_data_service().metrics()).T
+    st.dataframe(cache_metrics[['hit_rate', 'requests', 'stale_hits', 'coalesced', 'waiters', 'max_waiters',
+                                'refreshes', 'refresh_failures', 'last_refresh_seconds', 'age_seconds']].astype(float).round(3))
+# Live quotes only move the holdings table, everything else still comes from the snapshot
+live_quotes = bool(LIVE_QUOTES_URL) and st.sidebar.toggle(
+    "Live quotes", key='live_quotes',
+    help=f"Streams prices from `{LIVE_QUOTES_URL}` into the holdings table every {LIVE_QUOTES_REFRESH} seconds",
+)
 st.sidebar.markdown("---")
 st.sidebar.header("Current Portfolio Metrics")
 if portfolio_metrics_data:
@@ -79,11 +104,17 @@ if portfolio_metrics_data:
     col4.metric("Sharpe Ratio", f"{portfolio_metrics_data.get('Sharpe Ratio', 0):.2f}")
 
 col1, col2, col3, col4 = st.columns(4)
-correlation_matrix, weighted_corr_matrix, portfolio_weighted_corr = calculate_portfolio_correlation(holdings_df, performance_df)
-holdings_df, prev_day_change_percentage = calculate_market_value_changes(holdings_df, performance_df)
+correlation_matrix, weighted_corr_matrix, portfolio_weighted_corr = snapshot.correlation_matrix, snapshot.weighted_corr_matrix, snapshot.portfolio_weighted_corr
+# The snapshot is shared between sessions, the allocation section below cleans this copy in place
+holdings_df, prev_day_change_percentage = snapshot.market_values.copy(), snapshot.prev_day_change
 col1.metric("Portfolio Weighted Correlation", f"{portfolio_weighted_corr:.2f}")
 col2.metric("Previous Day Change", f"{prev_day_change_percentage:.2%}")
 
+# Portfolio level changes from the CAD value history, today's quantities held throughout
+if snapshot.portfolio_changes:
+    for col, (column, change) in zip(st.columns(4), snapshot.portfolio_changes.items()):
+        col.metric(f"{column.replace('Market Value ', '').replace(' (%)', '')} Change", 'N/A' if pd.isna(change) else f"{change:.2%}")
+
 if not holdings_df.empty:
     st.subheader("Asset Allocation (CAD Market Value)")
     # Ensure 'current_market_value_CAD' is numeric
@@ -101,9 +132,46 @@ if not holdings_df.empty:
 else:
     st.warning("No holdings data available to display allocation chart.")
 
+NAV_RANGES = {"1 WK": 7, "1 Month": 30, "6 Months": 180, "1 Year": 360, "All": None}
+
+@st.fragment
+def render_portfolio_value(nav_history):
+    st.subheader("Portfolio Value History (CAD)")
+    range_label = st.radio("Range:", list(NAV_RANGES), index=3, horizontal=True, key='nav_range')
+    days = NAV_RANGES[range_label]
+    start = nav_history.values.index.min() if days is None else nav_history.latest_date - pd.Timedelta(days=days)
+
+    nav = nav_history.nav[nav_history.nav.index >= start]
+    fig_nav = px.line(nav, labels={'value': 'Value (CAD)', 'Date': 'Date'})
+    fig_nav.update_layout(showlegend=False)
+    st.plotly_chart(fig_nav, use_container_width=True)
+
+    # Largest contributors to the return over the range, in either direction
+    contributions = nav_history.contribution_since(start).dropna()
+    top = contributions.loc[contributions.abs().sort_values(ascending=False).index[:10]].sort_values()
+    fig_contrib = px.bar(top, orientation='h', color=top > 0, color_discrete_map={True: '#008000', False: '#FF0000'},
+                         labels={'value': 'Contribution to Return', 'index': 'Symbol'},
+                         title=f'Largest Contributors over {range_label}')
+    fig_contrib.update_layout(showlegend=False, xaxis_tickformat='.2%')
+    st.plotly_chart(fig_contrib, use_container_width=True)
+    st.caption(f"Return over the range: {nav_history.change_since(start):.2%}. Values use today's quantities "
+               "and each day's exchange rate; holdings without price history are not included.")
+
+if snapshot.nav_history is not None and not snapshot.nav_history.empty:
+    render_portfolio_value(snapshot.nav_history)
+
 # Section 2: Holdings Details
-st.header("Current Holdings")
-if not holdings_df.empty:
+LIVE_CHANGE_HIGHLIGHT = 'background-color: rgba(255, 215, 0, 0.25)'
+
+def render_holdings_table(holdings_df, changed_rows=None):
+    """
+    Shows the holdings table.
+
+    Args:
+        holdings_df (pandas.DataFrame): Holdings with market value changes
+        changed_rows (numpy.ndarray, optional): Positions of rows updated by live quotes, their
+            price, market value and change cells are highlighted
+    """
     # Select and rename columns for better display
     display_df = holdings_df[[
         'symbol', 'quantity', 'current_price',
@@ -142,12 +210,54 @@ if not holdings_df.empty:
     styled_df = display_df.style.applymap(
         color_change, subset=market_value_cols
     ).format(formatters, na_rep='N/A')
+    if changed_rows is not None and len(changed_rows):
+        live_cols = ['Current Price', 'Market Value'] + market_value_cols
+        def highlight_changed(frame):
+            styles = pd.DataFrame('', index=frame.index, columns=frame.columns)
+            styles.iloc[changed_rows, [frame.columns.get_loc(col) for col in live_cols]] = LIVE_CHANGE_HIGHLIGHT
+            return styles
+        styled_df = styled_df.apply(highlight_changed, axis=None)
     st.dataframe(styled_df, use_container_width=True, hide_index=True)
-else:
+
+def render_live_holdings(holdings_df, prev_day_change, as_of):
+    """
+    Holdings table driven by the live quote feed. Reruns on its own every LIVE_QUOTES_REFRESH
+    seconds and only recomputes the holdings whose prices ticked since its previous run.
+    """
+    consumer = get_quote_consumer()
+    # Restart from every new snapshot, the store's latest prices are applied on top of it
+    if st.session_state.get('live_holdings_as_of') != as_of:
+        st.session_state['live_holdings'] = LiveHoldings(holdings_df, prev_day_change, list(MARKET_VALUE_HORIZONS))
+        st.session_state['live_holdings_as_of'] = as_of
+    live = st.session_state['live_holdings']
+    changed_rows = live.apply(consumer.store)
+
+    status = consumer.status()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Live Portfolio Value (CAD)", f"${live.total_value_cad:,.2f}")
+    col2.metric("Live Day Change", f"{live.prev_day_change:.2%}")
+    col3.metric("Holdings Updated", f"{len(changed_rows)} of {len(live.df)}")
+    if status['last_tick_at'] is None:
+        feed_state = "waiting for the first quote"
+    else:
+        feed_state = f"last quote at {datetime.fromtimestamp(status['last_tick_at']):%H:%M:%S}"
+    if not status['connected']:
+        feed_state += f", reconnecting ({status['last_error'] or 'stream ended'})"
+    st.caption(f"Live quotes: {status['ticks']:,} received, {feed_state}. Highlighted cells changed since the last update.")
+    render_holdings_table(live.df, changed_rows)
+
+st.header("Current Holdings")
+if holdings_df.empty:
     st.warning("No holdings data to display.")
+elif live_quotes:
+    st.fragment(render_live_holdings, run_every=LIVE_QUOTES_REFRESH)(holdings_df, prev_day_change_percentage, snapshot.as_of)
+else:
+    render_holdings_table(holdings_df)
 
 # Bar chart of holdings by market value
-if not holdings_df.empty:
+# Widgets inside a fragment only rerun their own section, not the whole dashboard
+@st.fragment
+def render_top_holdings(holdings_df):
     st.subheader("Holdings by Market Value (CAD)")
     top_n = st.slider("Number of top holdings to display:", min_value=5, max_value=len(holdings_df), value=min(15, len(holdings_df)), key='top_n_slider')
     
@@ -161,6 +271,9 @@ if not holdings_df.empty:
                                     labels={'current_market_value_CAD':'Market Value (CAD)', 'symbol':'Symbol'},
                                     color='symbol')
     st.plotly_chart(fig_bar_market_value, use_container_width=True)
+
+if not holdings_df.empty:
+    render_top_holdings(holdings_df)
 else:
     st.warning("No holdings data to display.")
 
@@ -171,54 +284,12 @@ st.header("Portfolio Correlation Matrix")
 st.markdown("Visualize the correlation between assets in your portfolio.")
 
 if correlation_matrix is not None and not correlation_matrix.empty:
-    # Use a more efficient rendering approach with Seaborn + Matplotlib
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-    from matplotlib.colors import LinearSegmentedColormap
-    import numpy as np
-    
-    # Generate a correlation matrix visualization
-    @st.cache_data(ttl=3600)  # Cache the figure for 1 hour to improve performance
-    def generate_corr_heatmap(corr_matrix):
-        # Create a custom color map that mimics the RdBu_r but is more efficient
-        colors = ["#053061", "#2166ac", "#92c5de", "#f7f7f7", "#f4a582", "#d6604d", "#b2182b"]
-        cmap = LinearSegmentedColormap.from_list('custom_diverging', colors, N=100)
-        
-        # Set the figure size based on the number of assets
-        n_assets = len(corr_matrix)
-        figsize = (min(12, max(8, n_assets * 0.7)), min(10, max(6, n_assets * 0.7)))
-        
-        # Create the figure
-        fig, ax = plt.subplots(figsize=figsize)
-        
-        # Generate the heatmap - much more efficient without annotations on every cell
-        mask = np.triu(np.ones_like(corr_matrix, dtype=bool), k=1)  # Create mask for upper triangle
-        heatmap = sns.heatmap(
-            corr_matrix, 
-            annot=True,  # Show correlation values
-            fmt=".2f",   # Format to 2 decimal places
-            cmap=cmap,   # Custom colormap
-            vmin=-1, vmax=1,  # Fix bounds between -1 and 1
-            center=0,    # Center the colormap at 0
-            square=True, # Make cells square
-            linewidths=.5,  # Add thin lines between cells
-            annot_kws={"size": 8 if n_assets > 10 else 9},  # Adjust text size based on matrix size
-            mask=mask,   # Only show lower triangle (reduces visual redundancy)
-            cbar_kws={"shrink": 0.8, "label": "Correlation"}  # Colorbar settings
-        )
-        
-        # Rotate x-axis labels for better readability
-        plt.xticks(rotation=45, ha='right')
-        plt.title("Asset Correlation Heatmap", fontsize=14, pad=20)
-        
-        # Tighten the layout to ensure everything fits
-        plt.tight_layout()
-        
-        return fig
-    
-    # Generate and display the heatmap
-    corr_fig = generate_corr_heatmap(correlation_matrix)
-    st.pyplot(corr_fig)
+    if len(correlation_matrix) > HEATMAP_ANNOTATION_LIMIT:
+        # Too many cells to annotate, use an interactive heatmap with values on hover
+        st.plotly_chart(correlation_heatmap_figure(correlation_matrix), use_container_width=True)
+    else:
+        # Rendered once per distinct matrix, reruns reuse the cached PNG bytes
+        st.image(correlation_heatmap_png(correlation_matrix), use_container_width=True)
     
     # Explanation of the correlation matrix
     with st.expander("What does this correlation matrix show?"):
@@ -235,225 +306,269 @@ if correlation_matrix is not None and not correlation_matrix.empty:
 else:
     st.warning("Correlation data is not available. Please ensure your portfolio contains multiple assets with historical price data.")
 
+# Rolling correlation over time, recorded bar by bar by the analytics scheduler
+st.subheader("Rolling Correlation")
+st.markdown("How the correlations have changed over time, for trailing windows and an exponentially weighted average.")
+
+@st.fragment
+def render_rolling_correlation(rolling_correlations, rolling_portfolio_corr):
+    fig_portfolio_corr = px.line(rolling_portfolio_corr, title='Portfolio Weighted Correlation',
+                                 labels={'value': 'Weighted Correlation', 'index': 'Date', 'variable': 'Window'})
+    st.plotly_chart(fig_portfolio_corr, use_container_width=True)
+
+    symbols = next(iter(rolling_correlations.values())).symbols
+    col1, col2 = st.columns(2)
+    symbol_a = col1.selectbox("First asset:", symbols, index=0, key='rolling_corr_a')
+    symbol_b = col2.selectbox("Second asset:", symbols, index=1, key='rolling_corr_b')
+    pair_corr = pd.DataFrame({label: history.pair(symbol_a, symbol_b) for label, history in rolling_correlations.items()})
+    fig_pair_corr = px.line(pair_corr, title=f'{symbol_a} / {symbol_b} Correlation',
+                            labels={'value': 'Correlation', 'index': 'Date', 'variable': 'Window'})
+    fig_pair_corr.update_yaxes(range=[-1, 1])
+    st.plotly_chart(fig_pair_corr, use_container_width=True)
+
+if snapshot.rolling_correlations:
+    render_rolling_correlation(snapshot.rolling_correlations, snapshot.rolling_portfolio_corr)
+else:
+    st.warning("Rolling correlation is not available. It needs at least 2 holdings with historical price data.")
+
+# Section 3b: Portfolio Risk
+st.header("Portfolio Risk")
+st.markdown("Risk figures computed from the last year of daily returns of your holdings.")
+
+holdings_risk, portfolio_risk = snapshot.holdings_risk, snapshot.portfolio_risk
+if holdings_risk is not None and not holdings_risk.empty:
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Annualized Volatility", f"{portfolio_risk['Annualized Volatility']:.2%}")
+    col2.metric("1-Day VaR (Historical)", f"{portfolio_risk['Historical VaR']:.2%}")
+    col3.metric("1-Day CVaR (Historical)", f"{portfolio_risk['Historical CVaR']:.2%}")
+    col4.metric("Max Drawdown", f"{portfolio_risk['Max Drawdown']:.2%}")
+    col5.metric("Beta to VOO", f"{portfolio_risk.get('Beta VOO', float('nan')):.2f}")
+
+    risk_display_df = holdings_risk.sort_values('Risk Contribution', ascending=False)
+    percent_cols = ['Weight', 'Annualized Volatility', 'Historical VaR', 'Historical CVaR', 'Parametric VaR',
+                    'Parametric CVaR', 'Max Drawdown', 'Risk Contribution (%)']
+    risk_formatters = {col: '{:.2%}' for col in percent_cols}
+    risk_formatters.update({col: '{:.2f}' for col in risk_display_df.columns if col not in percent_cols})
+    st.dataframe(risk_display_df.style.format(risk_formatters, na_rep='N/A'), use_container_width=True)
+    with st.expander("What do these risk figures show?"):
+        st.markdown(f"""
+        - **VaR**: the daily loss that is only exceeded on the worst {1 - RISK_CONFIDENCE_LEVEL:.0%} of days. **Historical** uses the
+          observed returns, **Parametric** assumes normally distributed returns.
+        - **CVaR**: the average loss on those worst days.
+        - **Max Drawdown**: the largest fall from a peak over the period.
+        - **Beta**: how much the asset moves for a 1% move in QQQ or VOO.
+        - **Risk Contribution**: the share of the portfolio's volatility that comes from each holding, after diversification.
+        """)
+else:
+    st.warning("Risk figures are not available. Please ensure your portfolio contains multiple assets with historical price data.")
+
+# Section 3c: Monte Carlo Simulation
+st.header("Portfolio Simulation")
+st.markdown("Range of outcomes for the portfolio's CAD value, simulated from the volatility and correlations of your holdings over the past year.")
+
+SIMULATION_HORIZONS = {"3 Months": 63, "6 Months": 126, "1 Year": 252}
+
+def render_simulation_results(run):
+    if run.error is not None:
+        st.error(f"Simulation failed: {run.error}")
+        return
+    if not run.done:
+        st.progress(run.progress(), text=f"Simulated {run.paths_done:,} of {run.n_paths:,} paths...")
+    elif st.session_state.get('mc_polling'):
+        # Finished since the last full render, rerun once more to stop polling
+        st.session_state['mc_polling'] = False
+        st.rerun()
+
+    bands = run.bands()
+    if bands.empty:
+        return
+    initial_value = run.inputs.initial_value
+    final = bands.iloc[-1]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Median Outcome (CAD)", f"${final['50%']:,.0f}", f"{final['50%'] / initial_value - 1:.2%}")
+    col2.metric("Pessimistic, 5th Percentile", f"${final['5%']:,.0f}", f"{final['5%'] / initial_value - 1:.2%}")
+    col3.metric("Optimistic, 95th Percentile", f"${final['95%']:,.0f}", f"{final['95%'] / initial_value - 1:.2%}")
+    col4.metric("Chance of a Loss", f"{run.probability_below(initial_value):.1%}")
+
+    fig_simulation = go.Figure()
+    for upper, lower, name, opacity in (('95%', '5%', '5th - 95th percentile', 0.2), ('75%', '25%', '25th - 75th percentile', 0.35)):
+        fig_simulation.add_trace(go.Scatter(x=bands.index, y=bands[upper], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig_simulation.add_trace(go.Scatter(x=bands.index, y=bands[lower], mode='lines', line=dict(width=0), fill='tonexty',
+                                            fillcolor=f'rgba(31, 119, 180, {opacity})', name=name))
+    fig_simulation.add_trace(go.Scatter(x=bands.index, y=bands['50%'], mode='lines', name='Median', line=dict(color='rgb(31, 119, 180)')))
+    fig_simulation.add_trace(go.Scatter(x=bands.index, y=bands['Mean'], mode='lines', name='Mean', line=dict(color='gray', dash='dash')))
+    fig_simulation.update_layout(title=f'Simulated Portfolio Value (CAD), {run.paths_done:,} paths',
+                                 xaxis_title='Trading Days Ahead', yaxis_title='Portfolio Value (CAD)')
+    st.plotly_chart(fig_simulation, use_container_width=True)
+
+@st.fragment
+def render_simulation(simulation_inputs, inputs_version):
+    col1, col2, col3 = st.columns(3)
+    n_paths = col1.select_slider("Paths:", options=[10_000, 50_000, 100_000, 250_000], value=100_000,
+                                 format_func=lambda n: f"{n:,}", key='mc_paths')
+    horizon = col2.radio("Horizon:", list(SIMULATION_HORIZONS), index=2, horizontal=True, key='mc_horizon')
+    seed = int(col3.number_input("Seed:", min_value=0, value=0, step=1, key='mc_seed'))
+    params = (inputs_version, n_paths, horizon, seed)
+
+    run = st.session_state.get('mc_run')
+    start = st.button("Run simulation", key='mc_start')
+    # Changing an input cancels the running simulation and starts one with the new inputs
+    if start or (run is not None and st.session_state.get('mc_params') != params):
+        if run is not None:
+            run.cancel()
+        run = SimulationRun(get_simulation_pool(), simulation_inputs, n_paths=n_paths, n_steps=SIMULATION_HORIZONS[horizon],
+                            chunk_paths=SIMULATION_CHUNK_PATHS, seed=seed)
+        st.session_state['mc_run'], st.session_state['mc_params'] = run, params
+    if run is None:
+        st.info("Press Run simulation to simulate the portfolio's value.")
+        return
+
+    st.session_state['mc_polling'] = not run.done
+    if run.done:
+        render_simulation_results(run)
+    else:
+        # Refresh the results as chunks finish, without rerunning the inputs above
+        st.fragment(render_simulation_results, run_every=1.0)(run)
+
+if snapshot.simulation_inputs is not None:
+    render_simulation(snapshot.simulation_inputs, f"{snapshot.holdings.fingerprint}-{snapshot.price_panel.fingerprint}")
+else:
+    st.warning("The simulation is not available. Please ensure your portfolio contains multiple assets with historical price data.")
+
 # Section 4: Exchange Rate Tracking
 st.header("Exchange Rate")
 st.markdown("Track historical exchange rates between major currencies and Bitcoin.")
 
-@st.cache_data(ttl=86400)  # Cache for 1 day
-def load_exchange_rate_data(ticker, period="1y"):
-    """
-    Load exchange rate data from Yahoo Finance API and process it for visualization.
-    
-    Args:
-        ticker (str): Yahoo Finance ticker symbol for the exchange rate pair
-        period (str): Time period for data retrieval (default: 1 year)
-        
-    Returns:
-        pandas.DataFrame: Processed exchange rate data with simple column structure
-    """
-    import yfinance as yf
-    try:
-        # Download data from Yahoo Finance
-        data = yf.download(ticker, period=period, progress=False)
-        
-        # If data is empty, return empty DataFrame
-        if data.empty:
-            return pd.DataFrame()
-            
-        # Create a clean DataFrame with the columns we need
-        processed_df = pd.DataFrame()
-        processed_df['Date'] = data.index
-        
-        # Extract 'Close' price - handle both MultiIndex and regular columns
-        if isinstance(data.columns, pd.MultiIndex):
-            # For MultiIndex, get the first level 'Close' column
-            # This works regardless of the second level
-            close_cols = [col for col in data.columns if col[0] == 'Close']
-            if close_cols:
-                processed_df['Close'] = data[close_cols[0]].values
-            else:
-                return pd.DataFrame()  # No Close column found
-        else:
-            # For regular columns, just get 'Close'
-            if 'Close' in data.columns:
-                processed_df['Close'] = data['Close'].values
-            else:
-                return pd.DataFrame()  # No Close column found
-        
-        # Add other columns if needed for display
-        for col_name in ['Open', 'High', 'Low']:
-            if isinstance(data.columns, pd.MultiIndex):
-                cols = [col for col in data.columns if col[0] == col_name]
-                if cols:
-                    processed_df[col_name] = data[cols[0]].values
-            elif col_name in data.columns:
-                processed_df[col_name] = data[col_name].values
-        
-        # Calculate daily change
-        processed_df['Daily Change %'] = processed_df['Close'].pct_change() * 100
-        
-        return processed_df
-    except Exception as e:
-        st.error(f"Error loading exchange rate data: {e}")
-        return pd.DataFrame()
-
-# Define currency pairs and their tickers
-currency_pairs = {
-    "USD/CAD": "CAD=X",  # Canadian Dollar to US Dollar
-    "CAD/CNY": "CADCNY=X",  # Canadian Dollar to Chinese Yuan
-    "USD/CNY": "CNY=X",  # US Dollar to Chinese Yuan
-    "BTC/USD": "BTC-USD",  # US Dollar to Bitcoin
-}
+@st.fragment
+def render_exchange_rates():
+    currency_pairs = CURRENCY_PAIRS
 
-# Create tabs for different currency pairs
-selected_pair = st.radio(
-    "Select Currency Pair:",
-    list(currency_pairs.keys()),
-    horizontal=True
-)
+    # Create tabs for different currency pairs
+    selected_pair = st.radio(
+        "Select Currency Pair:",
+        list(currency_pairs.keys()),
+        horizontal=True
+    )
+
+    # # Add a debug section
+    # with st.expander("Debug Info", expanded=False):
+    #     st.write("This section shows debugging information for the exchange rate data.")
+    #     debug_info = st.empty()
 
-# # Add a debug section
-# with st.expander("Debug Info", expanded=False):
-#     st.write("This section shows debugging information for the exchange rate data.")
-#     debug_info = st.empty()
-
-try:
-    # Load data for selected pair
-    ticker = currency_pairs[selected_pair]
-    exchange_data = load_exchange_rate_data(ticker)
-
-    # # Debug information
-    # with debug_info.container():
-    #     st.write("Exchange Rate Data Info:")
-    #     st.write(f"Data shape: {exchange_data.shape if not exchange_data.empty else 'Empty DataFrame'}")
-    #     if not exchange_data.empty:
-    #         st.write(f"Columns: {exchange_data.columns.tolist()}")
-    #         st.write(f"Data types: {exchange_data.dtypes}")
-    #         st.write("Sample data:")
-    #         st.write(exchange_data.head(2))
+    try:
+        # Load data for selected pair
+        ticker = currency_pairs[selected_pair]
+        exchange_data = load_exchange_rate_data(ticker)
+
+        # # Debug information
+        # with debug_info.container():
+        #     st.write("Exchange Rate Data Info:")
+        #     st.write(f"Data shape: {exchange_data.shape if not exchange_data.empty else 'Empty DataFrame'}")
+        #     if not exchange_data.empty:
+        #         st.write(f"Columns: {exchange_data.columns.tolist()}")
+        #         st.write(f"Data types: {exchange_data.dtypes}")
+        #         st.write("Sample data:")
+        #         st.write(exchange_data.head(2))
     
-    if not exchange_data.empty and 'Close' in exchange_data.columns:
-        # Process the data
-        try:
-            # Make a copy to avoid chained indexing warnings
-            processed_data = exchange_data.copy()
+        if not exchange_data.empty and 'Close' in exchange_data.columns:
+            # Process the data
+            try:
+                # Make a copy to avoid chained indexing warnings
+                processed_data = exchange_data.copy()
             
-            # Calculate daily percentage change safely
-            processed_data['Daily Change %'] = processed_data['Close'].pct_change() * 100
+                # Calculate daily percentage change safely
+                processed_data['Daily Change %'] = processed_data['Close'].pct_change() * 100
             
-            # Get scalar values for calculations
-            start_price = processed_data['Close'].iloc[0]
-            current_price = processed_data['Close'].iloc[-1]
+                # Get scalar values for calculations
+                start_price = processed_data['Close'].iloc[0]
+                current_price = processed_data['Close'].iloc[-1]
             
-            # Ensure these are scalar values
-            start_price = float(start_price)
-            current_price = float(current_price)
+                # Ensure these are scalar values
+                start_price = float(start_price)
+                current_price = float(current_price)
             
-            # Calculate change values
-            ytd_change = ((current_price - start_price) / start_price) * 100
+                # Calculate change values
+                ytd_change = ((current_price - start_price) / start_price) * 100
             
-            # Get daily change safely
-            try:
-                # Get the last row's daily change as a scalar value
-                daily_change_value = processed_data['Daily Change %'].iloc[-1]
-                daily_change = float(daily_change_value) if not pd.isna(daily_change_value) else 0.0
-            except:
-                daily_change = 0.0
+                # Get daily change safely
+                try:
+                    # Get the last row's daily change as a scalar value
+                    daily_change_value = processed_data['Daily Change %'].iloc[-1]
+                    daily_change = float(daily_change_value) if not pd.isna(daily_change_value) else 0.0
+                except:
+                    daily_change = 0.0
             
-            # Display metrics
-            col1, col2, col3 = st.columns(3)
+                # Display metrics
+                col1, col2, col3 = st.columns(3)
             
-            # Format display values
-            if selected_pair == "USD/BTC":
-                price_display = f"{current_price:,.2f}"
-            else:
-                price_display = f"{current_price:.4f}"
+                # Format display values
+                if selected_pair == "USD/BTC":
+                    price_display = f"{current_price:,.2f}"
+                else:
+                    price_display = f"{current_price:.4f}"
             
-            col1.metric(
-                "Current Rate", 
-                price_display,
-                f"{daily_change:.2f}%"
-            )
-            col2.metric("Year-to-Date Change", f"{ytd_change:.2f}%")
+                col1.metric(
+                    "Current Rate", 
+                    price_display,
+                    f"{daily_change:.2f}%"
+                )
+                col2.metric("Year-to-Date Change", f"{ytd_change:.2f}%")
             
-            # Create exchange rate chart
-            fig = px.line(
-                processed_data, 
-                x='Date', 
-                y='Close',
-                title=f'{selected_pair} Exchange Rate (Past Year)',
-                labels={'Close': 'Exchange Rate', 'Date': 'Date'}
-            )
+                # Create exchange rate chart
+                fig = px.line(
+                    processed_data, 
+                    x='Date', 
+                    y='Close',
+                    title=f'{selected_pair} Exchange Rate (Past Year)',
+                    labels={'Close': 'Exchange Rate', 'Date': 'Date'}
+                )
             
-            # Add range slider
-            fig.update_layout(
-                xaxis=dict(
-                    rangeselector=dict(
-                        buttons=list([
-                            dict(count=1, label="1m", step="month", stepmode="backward"),
-                            dict(count=3, label="3m", step="month", stepmode="backward"),
-                            dict(count=6, label="6m", step="month", stepmode="backward"),
-                            dict(step="all")
-                        ])
-                    ),
-                    rangeslider=dict(visible=True),
-                    type="date"
+                # Add range slider
+                fig.update_layout(
+                    xaxis=dict(
+                        rangeselector=dict(
+                            buttons=list([
+                                dict(count=1, label="1m", step="month", stepmode="backward"),
+                                dict(count=3, label="3m", step="month", stepmode="backward"),
+                                dict(count=6, label="6m", step="month", stepmode="backward"),
+                                dict(step="all")
+                            ])
+                        ),
+                        rangeslider=dict(visible=True),
+                        type="date"
+                    )
                 )
-            )
             
-            st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(fig, use_container_width=True)
             
-            # # Show recent exchange rate data table
-            # st.subheader("Recent Exchange Rate Data")
-            # display_cols = ['Date', 'Open', 'High', 'Low', 'Close']
-            # st.dataframe(
-            #     processed_data[display_cols].tail(10).sort_values('Date', ascending=False),
-            #     use_container_width=True,
-            #     hide_index=True
-            # )
-        except Exception as e:
-            st.error(f"Error processing exchange rate data: {str(e)}")
-            st.info("The data may be incomplete or in an unexpected format.")
-    elif not exchange_data.empty:
-        st.error(f"Data is missing required 'Close' column. Found columns: {exchange_data.columns.tolist()}")
-    else:
-        st.warning(f"No exchange rate data available for {selected_pair}.")
-except Exception as e:
-    st.error(f"Error loading exchange rate data: {str(e)}")
-    st.info("Please try a different currency pair or check your internet connection.")
+                # # Show recent exchange rate data table
+                # st.subheader("Recent Exchange Rate Data")
+                # display_cols = ['Date', 'Open', 'High', 'Low', 'Close']
+                # st.dataframe(
+                #     processed_data[display_cols].tail(10).sort_values('Date', ascending=False),
+                #     use_container_width=True,
+                #     hide_index=True
+                # )
+            except Exception as e:
+                st.error(f"Error processing exchange rate data: {str(e)}")
+                st.info("The data may be incomplete or in an unexpected format.")
+        elif not exchange_data.empty:
+            st.error(f"Data is missing required 'Close' column. Found columns: {exchange_data.columns.tolist()}")
+        else:
+            st.warning(f"No exchange rate data available for {selected_pair}.")
+    except Exception as e:
+        st.error(f"Error loading exchange rate data: {str(e)}")
+        st.info("Please try a different currency pair or check your internet connection.")
+
+
+render_exchange_rates()
 
 
 # Section 4: Performance Comparison (VOO & QQQ)
 st.header("Market Benchmark Comparison")
 st.markdown("This section shows the performance of Portfolio vs QQQ/VOO over the past year.")
 
-@st.cache_data(ttl=86400) # Cache for a day
-def calc_normalized_benchmark_data(df, portfolio_metrics_data):
-    
-    sort_by_cols = ['symbol', 'date']
-    df = df.sort_values(by=sort_by_cols).reset_index(drop=True)
-    # Convert date to datetime and pivot the DataFrame
-    df['date'] = pd.to_datetime(df['date'])
-
-    # Filter for close prices and pivot the data
-    prices_df = df.pivot(index='date', columns='symbol', values='close')
-    prices_df = prices_df.ffill().bfill()
-
-    symbols_allocs = dict(zip(portfolio_metrics_data["Symbols"], portfolio_metrics_data["Allocations"]))
-    symbols_allocs = {k: float(v.strip('%')) for k, v in symbols_allocs.items()}
-    sorted_symbols = sorted(prices_df.columns)
-    sorted_portfolio = {symbol: symbols_allocs[symbol] for symbol in sorted_symbols}
-    allocations = [float(alloc) for alloc in sorted_portfolio.values()]
-
-    normalized_allocs_positions = prices_df / prices_df.iloc[0] * allocations
-    normalized_allocs_positions = normalized_allocs_positions.sum(axis = 1)
-    normalized_benchmark_data = prices_df[['QQQ', 'VOO']].copy()
-    normalized_benchmark_data = normalized_benchmark_data / normalized_benchmark_data.iloc[0] * 100
-    normalized_benchmark_data['Portfolio'] = normalized_allocs_positions
-
-    return normalized_benchmark_data
-
-normalized_benchmark_data = calc_normalized_benchmark_data(performance_df, portfolio_metrics_data)
+normalized_benchmark_data = snapshot.normalized_benchmark
 
 if not normalized_benchmark_data.empty:
     fig_benchmark = px.line(normalized_benchmark_data, title='Portfolio vs QQQ/VOO Performance (Normalized to 100)')
@@ -474,31 +589,60 @@ else:
 st.header("Individual Asset Performance")
 st.markdown("This section shows the past year's performance for each of your holdings.")
 
-if not performance_df.empty:
+CHART_RANGES = {
+    "1M": pd.DateOffset(months=1),
+    "3M": pd.DateOffset(months=3),
+    "6M": pd.DateOffset(months=6),
+    "1Y": pd.DateOffset(years=1),
+    "5Y": pd.DateOffset(years=5),
+    "All": None,
+}
+
+@st.fragment
+def render_asset_performance(performance):
     # Get unique symbols for selection
-    symbols = sorted(performance_df['symbol'].unique())
+    history = get_symbol_history(performance)
+    symbols = history.symbols
     selected_symbol = st.selectbox("Select Asset to View:", symbols)
-    
-    # Filter data for selected symbol
-    symbol_data = performance_df[performance_df['symbol'] == selected_symbol].copy()
-    symbol_data['date'] = pd.to_datetime(symbol_data['date'])
-    symbol_data = symbol_data.sort_values('date')
-    
+
+    # The chart only receives the bars of the selected range, aggregated to fit CHART_MAX_POINTS.
+    # Narrowing the range brings back full resolution.
+    col1, col2, col3 = st.columns([3, 2, 2])
+    range_label = col1.radio("Range:", list(CHART_RANGES) + ["Custom"], index=3, horizontal=True, key='asset_range')
+    resolution = col2.selectbox("Resolution:", [AUTO_RESOLUTION, FULL_RESOLUTION] + list(RESAMPLE_RULES), key='asset_resolution')
+    chart_type = col3.radio("Chart:", ["Candlestick", "Line"], horizontal=True, key='asset_chart_type')
+
+    first_date, last_date = (pd.Timestamp(date) for date in history.date_range(selected_symbol))
+    if range_label == "Custom":
+        start, end = st.slider("Dates:", min_value=first_date.date(), max_value=last_date.date(),
+                               value=(max(first_date, last_date - pd.DateOffset(years=1)).date(), last_date.date()), key='asset_dates')
+    else:
+        offset = CHART_RANGES[range_label]
+        start, end = (None if offset is None else (last_date - offset).date()), None
+
+    symbol_data, used_resolution = get_chart_bars(performance, selected_symbol, start, end, resolution)
+    st.caption(f"{len(symbol_data):,} bars at {used_resolution.lower()} resolution")
+
     # Create figure with secondary y-axis for volume
     fig = go.Figure()
-    
-    # Add candlestick chart
-    fig.add_trace(
-        go.Candlestick(
-            x=symbol_data['date'],
-            open=symbol_data['open'],
-            high=symbol_data['high'],
-            low=symbol_data['low'],
-            close=symbol_data['close'],
-            name="Price",
+
+    if chart_type == "Candlestick":
+        # Add candlestick chart
+        fig.add_trace(
+            go.Candlestick(
+                x=symbol_data['date'],
+                open=symbol_data['open'],
+                high=symbol_data['high'],
+                low=symbol_data['low'],
+                close=symbol_data['close'],
+                name="Price",
+            )
         )
-    )
-    
+    else:
+        # Closes at full resolution, thinned to the points that change the shape of the line
+        close_line = get_chart_line(performance, selected_symbol, start, end)
+        fig.add_trace(go.Scatter(x=close_line.index, y=close_line.to_numpy(), mode='lines', name="Close"))
+
     # Add volume as bar chart on secondary y-axis with color scale based on volume
     fig.add_trace(
         go.Bar(
@@ -514,7 +658,19 @@ if not performance_df.empty:
             yaxis="y2"
         )
     )
-    
+
+    rangebreaks = []
+    if used_resolution == FULL_RESOLUTION:
+        rangebreaks = [
+            dict(bounds=["sat", "mon"]),  # hide weekends
+            dict(values=symbol_data[
+                symbol_data['open'].isna() & 
+                symbol_data['high'].isna() & 
+                symbol_data['low'].isna() & 
+                symbol_data['close'].isna()
+            ]['date']) # hide days with no OHLC data
+        ]
+
     # Layout updates for dual y-axis
     fig.update_layout(
         title=f'{selected_symbol} Price and Volume',
@@ -532,18 +688,13 @@ if not performance_df.empty:
         ),
         height=600,
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        xaxis=dict(rangebreaks=[
-            dict(bounds=["sat", "mon"]),  # hide weekends
-            dict(values=symbol_data[
-                symbol_data['open'].isna() & 
-                symbol_data['high'].isna() & 
-                symbol_data['low'].isna() & 
-                symbol_data['close'].isna()
-            ]['date']) # hide days with no OHLC data
-        ])
+        xaxis=dict(rangebreaks=rangebreaks)
     )
-    
+
     st.plotly_chart(fig, use_container_width=True)
+
+if not performance_df.empty:
+    render_asset_performance(snapshot.performance)
 else:
     st.info("No performance data file found or loaded. Check the `performance_reports` folder for valid files.")
 
@@ -0,0 +1,350 @@
+"""
+Offline benchmark of the data loading and analytics in utils.py.
+
+Every case generates a seeded synthetic portfolio (synthetic_data.py) and serves it to the
+real loaders through an in-process requests adapter, so no network is needed. Each function
+is timed over several repetitions with its Streamlit cache cleared, then run once more to
+record peak RSS growth, peak traced Python/numpy memory and the number of memory blocks still
+allocated when it returns. Results are compared against a stored baseline and the run exits
+with status 1 if any metric regressed past the tolerance.
+
+    python benchmarks/analytics_benchmark.py
+    python benchmarks/analytics_benchmark.py --symbols 10,1000,5000 --years 1,20 --currency-mix CAD=0.2,USD=0.8
+    python benchmarks/analytics_benchmark.py --update-baseline
+
+Timings depend on the machine, so regenerate the baseline with --update-baseline when
+benchmarking on different hardware.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+SYNTHETIC_API_URL = "http://synthetic-api.local"
+
+# A metric only counts as regressed if it also grew by more than these absolute amounts
+MIN_WALL_INCREASE = 0.005 # Seconds
+MIN_TRACED_INCREASE = 2.0 # MB
+MIN_RSS_INCREASE = 16.0 # MB, RSS also moves with allocator reuse
+
+
+# --- Offline API ---
+
+def _synthetic_adapter(portfolio):
+    import requests
+    import synthetic_data
+
+    routes = {
+        "/accounts/holdings": synthetic_data.holdings_payload(portfolio),
+        "/market/data": synthetic_data.market_data_payload(portfolio["history"]),
+    }
+
+    class SyntheticAPIAdapter(requests.adapters.BaseAdapter):
+        """Answers API requests from pre-encoded payloads without opening a socket."""
+
+        def send(self, request, **kwargs):
+            body = routes.get(urlsplit(request.url).path)
+            response = requests.Response()
+            response.status_code = 404 if body is None else 200
+            response.reason = "Not Found" if body is None else "OK"
+            response.raw = io.BytesIO(body or b"")
+            response.headers["Content-Type"] = "application/json"
+            response.headers["Content-Length"] = str(len(body or b""))
+            response.encoding = "utf-8"
+            response.url = request.url
+            response.request = request
+            return response
+
+        def close(self):
+            pass
+
+    return SyntheticAPIAdapter()
+
+
+# --- Measurement ---
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _PeakRSS:
+    """Samples the resident set size in a background thread while active."""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.start_rss = self.peak_rss = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = _rss_bytes()
+            if rss is not None and rss > self.peak_rss:
+                self.peak_rss = rss
+
+    def __enter__(self):
+        if self.start_rss is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        rss = _rss_bytes()
+        if rss is not None and self.start_rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+
+    @property
+    def growth_mb(self):
+        return None if self.start_rss is None else (self.peak_rss - self.start_rss) / 2**20
+
+
+def measure(run, setup=None, repeat=5):
+    """
+    Times run() and records its memory profile.
+
+    Args:
+        run (callable): The call being measured
+        setup (callable, optional): Called before every run, outside the measurement
+        repeat (int): Timed repetitions, the median is reported
+
+    Returns:
+        dict: wall_s, wall_min_s, peak_rss_mb, peak_traced_mb and retained_blocks
+    """
+    setup = setup or (lambda: None)
+    timings = []
+    for _ in range(repeat):
+        setup()
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    # Memory is measured on a separate run since tracing slows the call down
+    setup()
+    gc.collect()
+    with _PeakRSS() as rss:
+        tracemalloc.start()
+        blocks_before = sys.getallocatedblocks()
+        result = run()
+        blocks_after = sys.getallocatedblocks()
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    del result
+
+    return {
+        "wall_s": statistics.median(timings),
+        "wall_min_s": min(timings),
+        "peak_rss_mb": rss.growth_mb,
+        "peak_traced_mb": peak_traced / 2**20,
+        "retained_blocks": blocks_after - blocks_before,
+    }
+
+
+# --- Cases ---
+
+def case_id(case):
+    mix = "-".join(f"{currency}{round(share * 100)}" for currency, share in sorted(case["currency_mix"].items()))
+    return f"{case['symbols']}sym-{case['years']}y-{mix}-miss{case['missing_rate']}"
+
+
+def run_case(case):
+    """
+    Benchmarks every loader and analytic on one synthetic portfolio.
+
+    Meant to run in its own process so caches and allocator state do not carry over.
+
+    Returns:
+        dict: Function name -> metrics from measure()
+    """
+    os.chdir(REPO_ROOT)
+
+    import pandas as pd
+    import streamlit.logger
+    # Bare mode warns on every cached call, and the analytics print their reference date
+    streamlit.logger.set_log_level("error")
+
+    import synthetic_data
+    import utils
+    from datasets import DatasetHandle
+    from price_panel import get_price_panel
+
+    portfolio = synthetic_data.generate_portfolio(
+        n_symbols=case["symbols"], years=case["years"], seed=case["seed"],
+        currency_mix=case["currency_mix"], missing_rate=case["missing_rate"], nan_rate=case["nan_rate"],
+    )
+    store = tempfile.mkdtemp(prefix="benchmark-store-")
+    utils.API_URL = SYNTHETIC_API_URL
+    utils.PERFORMANCE_DATA_FOLDER = store
+    utils.get_http_session().mount(SYNTHETIC_API_URL, _synthetic_adapter(portfolio))
+    repeat = case["repeat"]
+
+    service = utils.get_data_service()
+
+    def cold_store():
+        service.invalidate("performance")
+        shutil.rmtree(store, ignore_errors=True)
+        os.makedirs(store)
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            results["fetch_portfolio_data"] = measure(utils.fetch_portfolio_data, setup=lambda: service.invalidate("holdings"), repeat=repeat)
+            results["load_performance (fetch)"] = measure(utils.load_performance, setup=cold_store, repeat=repeat)
+            results["load_performance (store)"] = measure(utils.load_performance, setup=lambda: service.invalidate("performance"), repeat=repeat)
+
+            holdings = DatasetHandle("holdings", pd.DataFrame(portfolio["holdings"]))
+            performance = utils.load_performance()
+            results["get_price_panel"] = measure(lambda: get_price_panel(performance), setup=get_price_panel.clear, repeat=repeat)
+
+            # The analytics get a fresh panel each time, its memoized views are part of their cost
+            panel = {}
+
+            def fresh_panel(clear_cache):
+                def setup():
+                    clear_cache()
+                    get_price_panel.clear()
+                    panel["current"] = get_price_panel(performance)
+                return setup
+
+            results["calculate_portfolio_correlation"] = measure(
+                lambda: utils.calculate_portfolio_correlation(holdings, panel["current"]),
+                setup=fresh_panel(utils.calculate_portfolio_correlation.clear), repeat=repeat)
+            results["calculate_market_value_changes"] = measure(
+                lambda: utils.calculate_market_value_changes(holdings, panel["current"]),
+                setup=fresh_panel(utils.calculate_market_value_changes.clear), repeat=repeat)
+            results["calc_normalized_benchmark_data"] = measure(
+                lambda: utils.calc_normalized_benchmark_data(panel["current"], portfolio["metrics"]),
+                setup=fresh_panel(utils.calc_normalized_benchmark_data.clear), repeat=repeat)
+        finally:
+            shutil.rmtree(store, ignore_errors=True)
+    return results
+
+
+# --- Baseline ---
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Lists the metrics that grew past baseline * (1 + tolerance) and the absolute floors.
+
+    Returns:
+        list: Human readable descriptions of each regression
+    """
+    regressions = []
+    floors = {"wall_s": MIN_WALL_INCREASE, "peak_traced_mb": MIN_TRACED_INCREASE, "peak_rss_mb": MIN_RSS_INCREASE}
+    for case, functions in results.items():
+        for function, metrics in functions.items():
+            base = baseline.get("cases", {}).get(case, {}).get(function)
+            if not base:
+                continue
+            for metric, floor in floors.items():
+                value, reference = metrics.get(metric), base.get(metric)
+                if value is None or reference is None:
+                    continue
+                if value > reference * (1 + tolerance) and value - reference > floor:
+                    regressions.append(f"{case} {function}: {metric} {value:.4f} vs baseline {reference:.4f}")
+    return regressions
+
+
+def _parse_list(text, cast):
+    return [cast(value) for value in text.split(",") if value]
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        currency, share = part.split("=")
+        mix[currency.strip().upper()] = float(share)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", default="10,100,500", help="Comma separated holding counts (10 to 5000)")
+    parser.add_argument("--years", default="1,5", help="Comma separated history lengths in years (1 to 20)")
+    parser.add_argument("--currency-mix", default="CAD=0.5,USD=0.5", help="Share of holdings per currency")
+    parser.add_argument("--missing-rate", type=float, default=0.01, help="Fraction of bars missing from the history")
+    parser.add_argument("--nan-rate", type=float, default=0.001, help="Fraction of bars with NaN prices")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per function")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative growth over the baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    cases = [
+        {
+            "symbols": symbols, "years": years, "currency_mix": _parse_mix(args.currency_mix),
+            "missing_rate": args.missing_rate, "nan_rate": args.nan_rate, "seed": args.seed, "repeat": args.repeat,
+        }
+        for symbols in _parse_list(args.symbols, int)
+        for years in _parse_list(args.years, float)
+    ]
+    for case in cases:
+        if case["years"] == int(case["years"]):
+            case["years"] = int(case["years"])
+
+    results = {}
+    for case in cases:
+        name = case_id(case)
+        print(f"\n{name}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results[name] = pool.submit(run_case, case).result()
+        for function, metrics in results[name].items():
+            rss = "n/a" if metrics["peak_rss_mb"] is None else f"{metrics['peak_rss_mb']:7.1f}"
+            print(f"  {function:<34} {metrics['wall_s'] * 1000:9.2f} ms   rss +{rss} MB"
+                  f"   traced {metrics['peak_traced_mb']:7.1f} MB   blocks {metrics['retained_blocks']:+d}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cases": results}, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {"cases": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.setdefault("cases", {}).update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline found, run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        regressions = find_regressions(results, json.load(f), args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Benchmark of the batched risk metrics in risk.py.
+
+Every case times risk.risk_metrics on a seeded synthetic returns matrix with its peak memory,
+and for the smaller cases also times a per-symbol pandas implementation of the same figures
+and checks that both agree. The run exits with status 1 if a case takes longer than the
+time budget or the results disagree.
+
+    python benchmarks/risk_benchmark.py
+    python benchmarks/risk_benchmark.py --symbols 1000,5000,10000 --years 1,10 --budget 5
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import risk
+from analytics_benchmark import measure
+from synthetic_data import TRADING_DAYS_PER_YEAR
+
+
+def synthetic_returns(n_symbols, years, seed=0):
+    """Returns (returns, weights, benchmark_returns) with every symbol partly driven by two benchmarks."""
+    rng = np.random.default_rng(seed)
+    n_days = max(30, int(round(years * TRADING_DAYS_PER_YEAR)))
+    dates = pd.bdate_range(end="2025-06-13", periods=n_days)
+    benchmarks = rng.normal(0.0004, 0.011, (n_days, 2))
+    loadings = rng.uniform(0, 1.5, (2, n_symbols))
+    returns = benchmarks @ loadings / 2 + rng.normal(0.0002, rng.uniform(0.005, 0.025, n_symbols), (n_days, n_symbols))
+    symbols = [f"SYM{i:05d}" for i in range(n_symbols)]
+    weights = rng.random(n_symbols)
+    return (
+        pd.DataFrame(returns, index=dates, columns=symbols),
+        pd.Series(weights / weights.sum(), index=symbols),
+        pd.DataFrame(benchmarks, index=dates, columns=["QQQ", "VOO"]),
+    )
+
+
+def naive_risk_metrics(returns, weights, benchmark_returns, level=0.95):
+    """The same figures as risk.risk_metrics, one symbol at a time with pandas."""
+    tail = max(1, int(np.ceil(round((1 - level) * len(returns), 9))))
+    cov = returns.cov()
+    w = weights.reindex(returns.columns)
+    portfolio_volatility = np.sqrt(w @ cov @ w)
+    rows = {}
+    for symbol in returns.columns:
+        series = returns[symbol]
+        worst = series.sort_values().iloc[:tail]
+        wealth = (1 + series).cumprod()
+        row = {
+            'Annualized Volatility': series.std() * np.sqrt(TRADING_DAYS_PER_YEAR),
+            'Historical VaR': -worst.iloc[-1],
+            'Historical CVaR': -worst.mean(),
+            'Max Drawdown': -(wealth / wealth.cummax().clip(lower=1) - 1).min(),
+            'Risk Contribution': w[symbol] * (cov[symbol] @ w) / portfolio_volatility * np.sqrt(TRADING_DAYS_PER_YEAR),
+        }
+        for benchmark in benchmark_returns.columns:
+            row[f'Beta {benchmark}'] = series.cov(benchmark_returns[benchmark]) / benchmark_returns[benchmark].var()
+        rows[symbol] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def run_case(n_symbols, years, repeat, naive_limit, seed):
+    returns, weights, benchmark_returns = synthetic_returns(n_symbols, years, seed)
+    result = {"symbols": n_symbols, "days": len(returns)}
+    result["batched"] = measure(lambda: risk.risk_metrics(returns, weights, benchmark_returns), repeat=repeat)
+
+    if n_symbols <= naive_limit:
+        result["naive"] = measure(lambda: naive_risk_metrics(returns, weights, benchmark_returns), repeat=1)
+        batched, _ = risk.risk_metrics(returns, weights, benchmark_returns)
+        naive = naive_risk_metrics(returns, weights, benchmark_returns)
+        result["matches_naive"] = bool(np.allclose(batched[naive.columns].to_numpy(), naive.to_numpy()))
+    return result
+
+
+def _parse_list(text, cast):
+    return [cast(part) for part in text.split(",") if part.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", default="100,1000,5000", help="Comma separated symbol counts")
+    parser.add_argument("--years", default="1,5", help="Comma separated history lengths in years")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per case")
+    parser.add_argument("--naive-limit", type=int, default=1000, help="Largest case also run with the per-symbol implementation")
+    parser.add_argument("--budget", type=float, default=2.0, help="Seconds a batched case may take")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results, failures = [], []
+    print(f"{'case':<22} {'batched':>12} {'peak rss':>10} {'naive':>12} {'speedup':>9}")
+    for n_symbols in _parse_list(args.symbols, int):
+        for years in _parse_list(args.years, float):
+            result = run_case(n_symbols, years, args.repeat, args.naive_limit, args.seed)
+            results.append(result)
+            name = f"{n_symbols}sym-{result['days']}d"
+            batched = result["batched"]["wall_s"]
+            rss = result["batched"]["peak_rss_mb"]
+            line = f"{name:<22} {batched * 1000:9.1f} ms {'n/a' if rss is None else f'{rss:7.1f} MB':>10}"
+            if "naive" in result:
+                naive = result["naive"]["wall_s"]
+                line += f" {naive * 1000:9.1f} ms {naive / batched:8.1f}x"
+                if not result["matches_naive"]:
+                    failures.append(f"{name}: batched results differ from the per-symbol implementation")
+            print(line)
+            if batched > args.budget:
+                failures.append(f"{name}: {batched:.2f} s is over the {args.budget:.2f} s budget")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cases": results}, f, indent=2)
+
+    if failures:
+        print("\nFailures:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll cases within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Startup benchmark for the dashboard.
+
+Reports how long each dependency takes to import in a fresh interpreter, and how long a
+cold run of app.py takes until the first element is sent (time to first paint) and until
+the script finishes, with the import time of each lazily imported module during that run.
+Run from the repository root:
+
+    python benchmarks/startup_benchmark.py [--runs 3] [--json results.json]
+
+The app run uses the API_URL in config.json, so point it at a reachable API first.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Already imported by the Streamlit server before app.py runs, so not counted against the app
+PRELOADED = ("streamlit", "pandas", "numpy")
+
+AUDITED_MODULES = (
+    "requests",
+    "plotly.graph_objects",
+    "plotly.express",
+    "matplotlib.figure",
+    "seaborn",
+    "yfinance",
+    "pyarrow.feather",
+    "market_data",
+    "price_panel",
+    "charts",
+    "lazy_imports",
+    "utils",
+)
+
+_IMPORT_PROBE = """
+import importlib, sys, time
+sys.path.insert(0, {root!r})
+for name in {preloaded!r}:
+    importlib.import_module(name)
+start = time.perf_counter()
+importlib.import_module({module!r})
+print(time.perf_counter() - start)
+"""
+
+_APP_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import streamlit, pandas, numpy
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+from streamlit.testing.v1 import AppTest
+
+delta_times = []
+_enqueue = ScriptRunContext.enqueue
+
+def enqueue(self, msg):
+    if msg.HasField("delta"):
+        delta_times.append(time.perf_counter())
+    return _enqueue(self, msg)
+
+ScriptRunContext.enqueue = enqueue
+app = AppTest.from_file({app!r}, default_timeout=600)
+start = time.perf_counter()
+app.run()
+end = time.perf_counter()
+# The warm-up thread may still be importing, wait for it so every lazy module is timed
+import lazy_imports
+lazy_imports.start_import_warm_up().join(timeout=60)
+print(json.dumps({{
+    "first_paint": delta_times[0] - start if delta_times else None,
+    "script_run": end - start,
+    "elements": len(delta_times),
+    "exceptions": [e.value for e in app.exception],
+    "lazy_imports": dict(lazy_imports.import_timings),
+}}))
+"""
+
+
+def _run_probe(code):
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return result.stdout.strip().splitlines()[-1]
+
+
+def measure_imports(modules=AUDITED_MODULES, runs=3):
+    """
+    Median import time of each module in a fresh interpreter with PRELOADED already imported.
+
+    Returns:
+        dict: Module name -> seconds, or None if the module could not be imported
+    """
+    timings = {}
+    for module in modules:
+        samples = []
+        for _ in range(runs):
+            try:
+                samples.append(float(_run_probe(_IMPORT_PROBE.format(root=REPO_ROOT, preloaded=PRELOADED, module=module))))
+            except RuntimeError:
+                samples = []
+                break
+        timings[module] = statistics.median(samples) if samples else None
+    return timings
+
+
+def measure_app_startup(runs=3):
+    """
+    Cold runs of app.py, each in a fresh interpreter so no Streamlit cache is warm.
+
+    Returns:
+        dict: Medians of first_paint and script_run in seconds, median seconds per lazily
+            imported module, plus the raw runs
+    """
+    samples = [
+        json.loads(_run_probe(_APP_PROBE.format(root=REPO_ROOT, app=os.path.join(REPO_ROOT, "app.py"))))
+        for _ in range(runs)
+    ]
+    first_paints = [s["first_paint"] for s in samples if s["first_paint"] is not None]
+    lazy_modules = sorted({module for s in samples for module in s["lazy_imports"]})
+    return {
+        "first_paint": statistics.median(first_paints) if first_paints else None,
+        "script_run": statistics.median(s["script_run"] for s in samples),
+        "lazy_imports": {
+            module: statistics.median(s["lazy_imports"][module] for s in samples if module in s["lazy_imports"])
+            for module in lazy_modules
+        },
+        "runs": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions per measurement, the median is reported")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--skip-app", action="store_true", help="Only run the import audit")
+    args = parser.parse_args()
+
+    results = {"imports": measure_imports(runs=args.runs)}
+    print(f"Import time per module (ms, with {', '.join(PRELOADED)} preloaded):")
+    for module, seconds in sorted(results["imports"].items(), key=lambda item: -(item[1] or 0)):
+        print(f"  {module:<24} {'not installed' if seconds is None else f'{seconds * 1000:8.1f}'}")
+
+    if not args.skip_app:
+        results["app"] = measure_app_startup(runs=args.runs)
+        app = results["app"]
+        print("\nCold app run (s):")
+        print(f"  time to first paint      {app['first_paint']:.3f}" if app["first_paint"] is not None else "  time to first paint      n/a")
+        print(f"  full script run          {app['script_run']:.3f}")
+        if app["lazy_imports"]:
+            print("\nLazy imports during the app run (ms, on first use or in the warm-up thread):")
+            for module, seconds in sorted(app["lazy_imports"].items(), key=lambda item: -item[1]):
+                print(f"  {module:<24} {seconds * 1000:8.1f}")
+        for run in app["runs"]:
+            if run["exceptions"]:
+                print(f"  exception: {run['exceptions'][0]}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import io
+
+import numpy as np
+import streamlit as st
+
+from datasets import frame_fingerprint
+
+# --- Correlation heatmap rendering ---
+# Small matrices are drawn as an annotated seaborn heatmap and cached as finished PNG bytes,
+# keyed on a fingerprint of the matrix. Large matrices go to an unannotated Plotly heatmap,
+# which stays interactive where n² annotations would not.
+
+HEATMAP_COLORS = ["#053061", "#2166ac", "#92c5de", "#f7f7f7", "#f4a582", "#d6604d", "#b2182b"]
+HEATMAP_DPI = 200 # Same resolution st.pyplot renders at
+HEATMAP_CACHE_ENTRIES = 16 # Rendered images kept before the least recently used is evicted
+
+
+def _lower_triangle(corr_matrix):
+    """Correlation values with the cells above the diagonal set to NaN."""
+    values = corr_matrix.to_numpy(dtype=float, copy=True)
+    values[np.triu_indices_from(values, k=1)] = np.nan
+    return values
+
+
+def correlation_heatmap_png(corr_matrix):
+    """
+    Returns the annotated correlation heatmap as PNG bytes, rendering it only on a cache miss.
+
+    Args:
+        corr_matrix (pandas.DataFrame): Symmetric asset x asset correlation matrix
+
+    Returns:
+        bytes: PNG image of the lower triangle of the matrix
+    """
+    return _render_heatmap_png(frame_fingerprint(corr_matrix), corr_matrix)
+
+
+@st.cache_data(max_entries=HEATMAP_CACHE_ENTRIES)
+def _render_heatmap_png(fingerprint, _corr_matrix):
+    # Cached on the fingerprint alone, the matrix itself is not hashed
+    from matplotlib.colors import LinearSegmentedColormap
+    from matplotlib.figure import Figure
+    import seaborn as sns
+
+    cmap = LinearSegmentedColormap.from_list('custom_diverging', HEATMAP_COLORS, N=100)
+
+    # Set the figure size based on the number of assets
+    n_assets = len(_corr_matrix)
+    figsize = (min(12, max(8, n_assets * 0.7)), min(10, max(6, n_assets * 0.7)))
+
+    # A bare Figure is not registered with pyplot, so it needs no closing and is safe across sessions
+    fig = Figure(figsize=figsize)
+    ax = fig.subplots()
+    sns.heatmap(
+        _corr_matrix,
+        ax=ax,
+        annot=True,  # Show correlation values
+        fmt=".2f",   # Format to 2 decimal places
+        cmap=cmap,   # Custom colormap
+        vmin=-1, vmax=1,  # Fix bounds between -1 and 1
+        center=0,    # Center the colormap at 0
+        square=True, # Make cells square
+        linewidths=.5,  # Add thin lines between cells
+        annot_kws={"size": 8 if n_assets > 10 else 9},  # Adjust text size based on matrix size
+        mask=np.triu(np.ones_like(_corr_matrix, dtype=bool), k=1),  # Only show lower triangle
+        cbar_kws={"shrink": 0.8, "label": "Correlation"}  # Colorbar settings
+    )
+
+    # Rotate x-axis labels for better readability
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    ax.set_title("Asset Correlation Heatmap", fontsize=14, pad=20)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=HEATMAP_DPI, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def correlation_heatmap_figure(corr_matrix):
+    """
+    Builds an unannotated Plotly heatmap of the lower triangle, for matrices too large to annotate.
+
+    Args:
+        corr_matrix (pandas.DataFrame): Symmetric asset x asset correlation matrix
+
+    Returns:
+        plotly.graph_objects.Figure: Heatmap with hover values instead of cell labels
+    """
+    import plotly.graph_objects as go
+
+    labels = corr_matrix.columns.tolist()
+    colorscale = [[i / (len(HEATMAP_COLORS) - 1), color] for i, color in enumerate(HEATMAP_COLORS)]
+    fig = go.Figure(go.Heatmap(
+        z=_lower_triangle(corr_matrix),
+        x=labels,
+        y=labels,
+        zmin=-1, zmax=1, zmid=0,
+        colorscale=colorscale,
+        colorbar=dict(title=dict(text="Correlation")),
+        hoverongaps=False,
+        hovertemplate="%{y} / %{x}: %{z:.2f}<extra></extra>",
+    ))
+    fig.update_layout(
+        title="Asset Correlation Heatmap",
+        height=max(500, min(1200, 12 * len(labels))),
+        yaxis=dict(autorange="reversed", scaleanchor="x"),
+        xaxis=dict(tickangle=-45),
+    )
+    return fig
@@ -0,0 +1,229 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# --- Process-wide data service ---
+# One instance per server process holds the latest value of every registered dataset and
+# shares it between all sessions. Loads are single-flight: while a load is running, every
+# other caller waits for that load instead of starting its own. Once a value is older than
+# its ttl, callers keep getting it while a single background refresh replaces it, so no
+# render blocks on an expired cache.
+
+_MISSING = object()
+
+
+class _Dataset:
+    """State of one registered dataset. Only touched with the service lock held."""
+
+    def __init__(self, name, loader, ttl):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.value = _MISSING
+        self.loaded_at = None
+        self.error = None
+        self.error_at = None
+        self.warnings = [] # Non-fatal problems reported by the load that produced value
+        self.inflight = None # Future of the running load
+        self.waiters = 0
+        self.stats = {
+            "requests": 0,
+            "hits": 0,          # Fresh value returned
+            "stale_hits": 0,    # Expired value returned while a refresh runs
+            "misses": 0,        # No value yet, this caller ran the load
+            "coalesced": 0,     # No value yet, waited for a load started by another caller
+            "errors_served": 0, # A recent failed load was re-raised without retrying
+            "max_waiters": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "refresh_seconds_total": 0.0,
+            "last_refresh_seconds": None,
+        }
+
+
+class DataService:
+    """
+    Shared, single-flight cache of loader results with stale-while-revalidate refresh.
+
+    Args:
+        max_workers (int): Threads available for background refreshes
+        error_ttl (float): Seconds a failed first load is re-raised before it is retried,
+            so an unreachable API is not hit by every rerun
+    """
+
+    def __init__(self, max_workers=2, error_ttl=30):
+        self.error_ttl = error_ttl
+        self._datasets = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="data-refresh")
+
+    def register(self, name, loader, ttl):
+        """
+        Adds a dataset. Nothing is loaded until the first get().
+
+        Args:
+            name (str): Key for get()
+            loader (callable): Returns the value. Must raise on failure rather than return a placeholder,
+                so a failed refresh keeps the previous value.
+            ttl (float): Seconds a value counts as fresh
+        """
+        with self._lock:
+            self._datasets[name] = _Dataset(name, loader, ttl)
+
+    def get(self, name, timeout=None):
+        """
+        Returns the value of a dataset, loading it only if nothing has been loaded yet.
+
+        Args:
+            name (str): A registered dataset
+            timeout (float, optional): Seconds to wait for a load started by another caller
+
+        Returns:
+            The latest loaded value, which may be older than the ttl while a refresh runs
+
+        Raises:
+            Exception: Whatever the loader raised, if no value has been loaded yet
+        """
+        with self._lock:
+            dataset = self._datasets[name]
+            stats = dataset.stats
+            stats["requests"] += 1
+            now = time.time()
+
+            if dataset.value is not _MISSING:
+                if now - dataset.loaded_at < dataset.ttl:
+                    stats["hits"] += 1
+                else:
+                    stats["stale_hits"] += 1
+                    # After a failed refresh, wait error_ttl before trying again
+                    backing_off = dataset.error is not None and now - dataset.error_at < self.error_ttl
+                    if dataset.inflight is None and not backing_off:
+                        dataset.inflight = Future()
+                        self._executor.submit(self._load, dataset, dataset.inflight)
+                return dataset.value
+
+            if dataset.error is not None and dataset.inflight is None and now - dataset.error_at < self.error_ttl:
+                stats["errors_served"] += 1
+                raise dataset.error
+
+            leader = dataset.inflight is None
+            if leader:
+                stats["misses"] += 1
+                dataset.inflight = Future()
+            else:
+                stats["coalesced"] += 1
+            future = dataset.inflight
+            dataset.waiters += 1
+            stats["max_waiters"] = max(stats["max_waiters"], dataset.waiters)
+
+        try:
+            if leader:
+                # The first load runs on the caller's thread, so it can report progress and warnings
+                try:
+                    self._load(dataset, future)
+                except BaseException:
+                    # The caller was interrupted (e.g. a Streamlit rerun), finish the load for the waiters
+                    if not future.done():
+                        self._executor.submit(self._load, dataset, future)
+                    raise
+            return future.result(timeout=timeout)
+        finally:
+            with self._lock:
+                dataset.waiters -= 1
+
+    def warn(self, message):
+        """
+        Records a non-fatal problem of the load running on this thread, e.g. a fallback it took.
+
+        Loads run on refresh threads where nothing can be shown to a session, so the messages are
+        kept with the loaded value and returned by status(). Ignored outside a load.
+        """
+        warnings = getattr(self._local, "warnings", None)
+        if warnings is not None:
+            warnings.append(message)
+
+    def _load(self, dataset, future):
+        start = time.perf_counter()
+        self._local.warnings = []
+        try:
+            value = dataset.loader()
+        except Exception as e:
+            self._local.warnings = None
+            with self._lock:
+                dataset.error, dataset.error_at = e, time.time()
+                dataset.inflight = None
+                dataset.stats["refresh_failures"] += 1
+            future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        warnings, self._local.warnings = self._local.warnings, None
+        with self._lock:
+            dataset.value, dataset.loaded_at = value, time.time()
+            dataset.warnings = warnings
+            dataset.error = dataset.error_at = None
+            dataset.inflight = None
+            dataset.stats["refreshes"] += 1
+            dataset.stats["refresh_seconds_total"] += elapsed
+            dataset.stats["last_refresh_seconds"] = elapsed
+        future.set_result(value)
+
+    def refresh(self, name):
+        """Starts a background refresh unless one is already running. Returns its Future."""
+        with self._lock:
+            dataset = self._datasets[name]
+            if dataset.inflight is None:
+                dataset.inflight = Future()
+                self._executor.submit(self._load, dataset, dataset.inflight)
+            return dataset.inflight
+
+    def invalidate(self, name):
+        """Drops the loaded value and any remembered error, so the next get() loads again."""
+        with self._lock:
+            dataset = self._datasets[name]
+            dataset.value = _MISSING
+            dataset.loaded_at = dataset.error = dataset.error_at = None
+            dataset.warnings = []
+
+    def status(self, name):
+        """
+        Describes the current value of a dataset.
+
+        Returns:
+            dict: loaded_at (unix time or None), age (seconds or None), stale (bool),
+                refreshing (bool), last_error (exception of the latest failed load, or None)
+                and warnings (messages the load of the current value reported with warn())
+        """
+        with self._lock:
+            dataset = self._datasets[name]
+            age = None if dataset.loaded_at is None else time.time() - dataset.loaded_at
+            return {
+                "loaded_at": dataset.loaded_at,
+                "age": age,
+                "stale": age is not None and age >= dataset.ttl,
+                "refreshing": dataset.inflight is not None,
+                "last_error": dataset.error,
+                "warnings": list(dataset.warnings),
+            }
+
+    def metrics(self):
+        """
+        Counters for every dataset.
+
+        Returns:
+            dict: Dataset name -> counters, plus hit_rate (share of requests answered without
+                waiting for a load), mean_refresh_seconds and the current number of waiters
+        """
+        with self._lock:
+            result = {}
+            for name, dataset in self._datasets.items():
+                stats = dict(dataset.stats)
+                served = stats["hits"] + stats["stale_hits"]
+                stats["hit_rate"] = served / stats["requests"] if stats["requests"] else None
+                stats["mean_refresh_seconds"] = (
+                    stats["refresh_seconds_total"] / stats["refreshes"] if stats["refreshes"] else None
+                )
+                stats["waiters"] = dataset.waiters
+                stats["age_seconds"] = None if dataset.loaded_at is None else time.time() - dataset.loaded_at
+                result[name] = stats
+            return result
@@ -0,0 +1,62 @@
+import hashlib
+import itertools
+import pickle
+import time
+
+import pandas as pd
+
+# --- Versioned dataset handles ---
+# Loaders wrap what they fetched in a DatasetHandle whose fingerprint is computed once at load.
+# Cached analytics hash the handle by that fingerprint instead of hashing the data on every rerun.
+
+_load_counter = itertools.count(1)
+
+
+def frame_fingerprint(df):
+    """Returns a content hash of a DataFrame, used as its version."""
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+    except TypeError:
+        # Columns holding lists or dicts cannot be hashed row-wise
+        row_hashes = pickle.dumps(df)
+    digest = hashlib.blake2b(row_hashes, digest_size=16)
+    digest.update(repr(list(df.columns)).encode())
+    return digest.hexdigest()
+
+
+class DatasetHandle:
+    """
+    A loaded dataset plus its identity.
+
+    Attributes:
+        name (str): Which loader produced the data, e.g. 'performance'
+        data (pandas.DataFrame): The loaded data. Shared between sessions, treat as read-only.
+        fingerprint (str): Content hash of data, equal for equal content across reloads
+        load_id (int): Sequence number of the load within this process
+        loaded_at (float): Unix time of the load
+    """
+
+    __slots__ = ('name', 'data', 'fingerprint', 'load_id', 'loaded_at')
+
+    def __init__(self, name, data, fingerprint=None):
+        self.name = name
+        self.data = data
+        self.fingerprint = fingerprint or frame_fingerprint(data)
+        self.load_id = next(_load_counter)
+        self.loaded_at = time.time()
+
+    @property
+    def id(self):
+        return f"{self.name}:{self.fingerprint}"
+
+    @property
+    def empty(self):
+        return self.data.empty
+
+    def __repr__(self):
+        return f"DatasetHandle({self.id}, rows={len(self.data)}, load_id={self.load_id})"
+
+
+def dataset_hash(handle):
+    """Hash function for st.cache_data: the fingerprint stands in for the data."""
+    return handle.id
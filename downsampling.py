@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+import market_data
+
+# --- Chart downsampling ---
+# Charts only get as many points as they can show. Candles are aggregated to coarser bars
+# with proper OHLCV rules (first open, highest high, lowest low, last close, summed volume)
+# and lines are thinned with Largest-Triangle-Three-Buckets, which keeps the visual shape
+# of the series. Narrowing the date range brings back full resolution.
+
+OHLCV_AGGREGATION = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+RESAMPLE_RULES = {"Daily": "D", "Weekly": "W-FRI", "Monthly": "MS"} # Coarsest last
+FULL_RESOLUTION = "Full"
+AUTO_RESOLUTION = "Auto"
+
+
+def _ohlc_columns(bars):
+    return [column for column in OHLCV_AGGREGATION if column in bars.columns]
+
+
+def drop_empty_bars(bars):
+    """Drops bars whose open, high, low and close are all NaN."""
+    prices = [column for column in ('open', 'high', 'low', 'close') if column in bars.columns]
+    return bars[bars[prices].notna().any(axis=1)]
+
+
+def resample_ohlcv(bars, rule):
+    """
+    Aggregates bars to calendar periods.
+
+    Args:
+        bars (pandas.DataFrame): 'date' sorted ascending and any of 'open', 'high', 'low', 'close', 'volume'
+        rule (str): pandas offset alias, e.g. 'W-FRI' or 'MS'
+
+    Returns:
+        pandas.DataFrame: One bar per period with data, labelled with the period's date
+    """
+    columns = _ohlc_columns(bars)
+    aggregated = drop_empty_bars(bars).set_index('date')[columns].resample(rule).agg(
+        {column: OHLCV_AGGREGATION[column] for column in columns}
+    )
+    return drop_empty_bars(aggregated.reset_index())
+
+
+def bucket_ohlcv(bars, n_buckets):
+    """
+    Aggregates consecutive bars into n_buckets groups of equal size, for ranges too long even for monthly bars.
+
+    Returns:
+        pandas.DataFrame: One bar per group, labelled with the date of its first bar
+    """
+    bars = drop_empty_bars(bars)
+    if len(bars) <= n_buckets:
+        return bars.reset_index(drop=True)
+    groups = np.arange(len(bars)) * n_buckets // len(bars)
+    columns = _ohlc_columns(bars)
+    aggregation = {'date': 'first', **{column: OHLCV_AGGREGATION[column] for column in columns}}
+    return bars.groupby(groups).agg(aggregation).reset_index(drop=True)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions of the points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept. The rest are split into n_out - 2 buckets and
+    from each the point forming the largest triangle with the previously kept point and the
+    average of the next bucket is kept.
+
+    Args:
+        x (numpy.ndarray): Ascending x values, e.g. dates as numbers
+        y (numpy.ndarray): Values without NaNs
+        n_out (int): Points to keep
+
+    Returns:
+        numpy.ndarray: Sorted positions into x and y
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64) # n_out - 2 buckets between the end points
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        # Twice the area of the triangle (previous, candidate, next bucket average)
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def lttb(series, n_out):
+    """Downsamples a Series with a DatetimeIndex or numeric index to n_out points with LTTB."""
+    series = series.dropna()
+    index = series.index
+    x = index.asi8 if isinstance(index, pd.DatetimeIndex) else index.to_numpy(dtype=float)
+    return series.iloc[lttb_indices(x, series.to_numpy(), n_out)]
+
+
+def choose_resolution(bars, max_points):
+    """
+    Finest resolution that shows the bars in at most max_points points.
+
+    Returns:
+        str: FULL_RESOLUTION, a key of RESAMPLE_RULES, or None if even monthly bars are too many
+    """
+    if len(bars) <= max_points:
+        return FULL_RESOLUTION
+    dates = market_data.as_datetime(bars['date'])
+    for resolution, rule in RESAMPLE_RULES.items():
+        periods = dates.dt.to_period(rule if rule != 'MS' else 'M').nunique()
+        if periods < len(bars) and periods <= max_points:
+            return resolution
+    return None
+
+
+def bars_for_range(bars, start=None, end=None, max_points=1000, resolution=AUTO_RESOLUTION):
+    """
+    The bars to draw for a date range, aggregated so that at most max_points are sent to the chart.
+
+    Args:
+        bars (pandas.DataFrame): One symbol's 'date', 'open', 'high', 'low', 'close', 'volume' rows
+        start (datetime, optional): First date shown
+        end (datetime, optional): Last date shown
+        max_points (int): Most bars drawn with AUTO_RESOLUTION
+        resolution (str): AUTO_RESOLUTION, FULL_RESOLUTION or a key of RESAMPLE_RULES
+
+    Returns:
+        tuple: (bars, resolution) - the aggregated bars in the range and the resolution used,
+            'N Bars' when consecutive bars had to be grouped to stay under max_points
+    """
+    bars = bars.assign(date=market_data.as_datetime(bars['date'])).sort_values('date')
+    in_range = np.ones(len(bars), dtype=bool)
+    if start is not None:
+        in_range &= (bars['date'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        in_range &= (bars['date'] < pd.Timestamp(end) + pd.Timedelta(days=1)).to_numpy()
+    bars = bars[in_range]
+
+    if resolution == AUTO_RESOLUTION:
+        resolution = choose_resolution(bars, max_points)
+        if resolution is None:
+            return bucket_ohlcv(bars, max_points), f"{max_points} Bars"
+    if resolution == FULL_RESOLUTION:
+        return bars.reset_index(drop=True), resolution
+    return resample_ohlcv(bars, RESAMPLE_RULES[resolution]), resolution
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from datasets import frame_fingerprint
+
+# --- FX conversion ---
+# Dated CAD rates per currency, built from the same Yahoo Finance tickers the Exchange Rate
+# section loads. Values are converted with the rate in force on their own date, looked up for
+# a whole dates x holdings matrix at once, instead of converting history at today's rate.
+
+BASE_CURRENCY = "CAD"
+# Yahoo Finance ticker of each currency and whether its quote is CAD per unit (1) or units per CAD (-1)
+FX_TICKERS = {
+    "USD": ("CAD=X", 1),
+    "CNY": ("CADCNY=X", -1),
+}
+
+
+def implied_rates(currencies, market_value, market_value_base):
+    """
+    Current rate of every currency implied by the holdings, the median of base over local value.
+
+    Args:
+        currencies (numpy.ndarray): Currency of each holding
+        market_value (numpy.ndarray): Market value in the holding's currency
+        market_value_base (numpy.ndarray): The same market value in the base currency
+
+    Returns:
+        dict: Currency -> base currency per unit, for currencies with a usable holding
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = pd.Series(np.where(market_value > 0, market_value_base / market_value, np.nan))
+    ratio = ratio.groupby(pd.Series(currencies, dtype=object)).median().dropna()
+    return {currency: float(rate) for currency, rate in ratio.items() if rate > 0}
+
+
+class FxRates:
+    """
+    Daily base currency rates of several currencies.
+
+    Args:
+        rates (pandas.DataFrame): Date x currency frame of base currency per unit. Gaps are
+            forward filled, and dates before a currency's first rate use that first rate.
+        base (str): Currency the rates convert to, always 1.0
+    """
+
+    def __init__(self, rates, base=BASE_CURRENCY):
+        rates = rates.sort_index()
+        # Date of each currency's first known rate, before the gaps are filled
+        self._first_dates = {currency: rates[currency].first_valid_index() for currency in rates.columns}
+        rates = rates.ffill().bfill()
+        rates[base] = 1.0
+        self.base = base
+        self.rates = rates
+        self.fingerprint = frame_fingerprint(rates.reset_index())
+        self._dates = rates.index.to_numpy(dtype='datetime64[ns]')
+        self._matrix = rates.to_numpy(dtype=float)
+        self._columns = {currency: position for position, currency in enumerate(rates.columns)}
+
+    @classmethod
+    def from_exchange_rates(cls, exchange_rates, current=None, tickers=FX_TICKERS, base=BASE_CURRENCY):
+        """
+        Builds the rates from load_exchange_rates output.
+
+        Args:
+            exchange_rates (pandas.DataFrame): Wide frame with (Field, Ticker) columns, may be empty
+            current (dict, optional): Currency -> today's rate, e.g. implied_rates of the holdings.
+                Histories are rescaled to end at it, so past values are converted consistently with
+                the current CAD values (which carry the broker's spread), and currencies without
+                history use it as a constant.
+        """
+        columns = {}
+        if not exchange_rates.empty and 'Close' in exchange_rates.columns.get_level_values(0):
+            closes = exchange_rates['Close']
+            for currency, (ticker, direction) in tickers.items():
+                if ticker in closes.columns:
+                    series = closes[ticker].where(closes[ticker] > 0)
+                    if series.notna().any():
+                        columns[currency] = series if direction == 1 else 1 / series
+        rates = pd.DataFrame(columns, index=pd.DatetimeIndex(exchange_rates.index if columns else [], name='Date'))
+        if rates.empty:
+            # One row is enough for constant rates
+            rates = pd.DataFrame(index=pd.DatetimeIndex([pd.Timestamp.now().normalize()], name='Date'))
+        for currency, rate in (current or {}).items():
+            if currency == base:
+                continue
+            if currency in rates.columns:
+                rates[currency] *= rate / rates[currency].ffill().iloc[-1]
+            else:
+                rates[currency] = rate
+        return cls(rates, base=base)
+
+    @property
+    def currencies(self):
+        return list(self._columns)
+
+    def __contains__(self, currency):
+        return currency in self._columns
+
+    def _row_positions(self, dates):
+        dates = pd.DatetimeIndex(dates).to_numpy(dtype='datetime64[ns]')
+        # Latest rate on or before each date, the first rate for dates before it
+        return np.maximum(np.searchsorted(self._dates, dates, side='right') - 1, 0)
+
+    def rate_matrix(self, dates, currencies):
+        """
+        As-of rates for every date and currency.
+
+        Args:
+            dates (array-like): Dates to look up
+            currencies (array-like): Currency of each column, e.g. of each holding
+
+        Returns:
+            numpy.ndarray: len(dates) x len(currencies) rates, NaN for unknown currencies
+        """
+        columns = np.array([self._columns.get(currency, -1) for currency in currencies], dtype=np.int64)
+        matrix = self._matrix[self._row_positions(dates)][:, np.maximum(columns, 0)]
+        matrix[:, columns < 0] = np.nan
+        return matrix
+
+    def first_date(self, currency):
+        """Date of a currency's first known rate, earlier dates use that rate. None for the base or unknown currencies."""
+        return self._first_dates.get(currency)
+
+    def latest(self, currency):
+        """Most recent rate of a currency, NaN if unknown."""
+        column = self._columns.get(currency)
+        return float(self._matrix[-1, column]) if column is not None else np.nan
+
+    def convert(self, values, currencies):
+        """
+        Converts a dates x holdings value matrix to the base currency in one broadcast multiply.
+
+        Args:
+            values (pandas.DataFrame): Values indexed by date, one column per holding
+            currencies (array-like): Currency of each column
+
+        Returns:
+            pandas.DataFrame: Base currency values, NaN for columns in unknown currencies
+        """
+        return values * self.rate_matrix(values.index, currencies)
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import market_data
+from datasets import DatasetHandle, dataset_hash
+
+# --- Array-backed holdings and history stores ---
+# Symbols get an integer id once, when a dataset is loaded. Holdings are kept as one NumPy array
+# per field and the price history is sorted by symbol with each symbol's (start, end) row
+# offsets, so looking up a holding or a symbol's bars is a dict lookup and a slice instead of
+# a boolean mask over the whole column.
+
+
+def _symbol_ids(symbols):
+    """Maps each symbol to the position of its first occurrence."""
+    ids = {}
+    for position, symbol in enumerate(symbols):
+        ids.setdefault(symbol, position)
+    return ids
+
+
+class HoldingsStore:
+    """
+    Holdings as flat arrays, one entry per holdings row in the original order.
+
+    Attributes:
+        symbols (numpy.ndarray): Symbol of every row
+        quantity, price, market_value, market_value_cad (numpy.ndarray): Float columns, NaN where missing
+        weight (numpy.ndarray): Portfolio weight of every row as a fraction, from the 'percentage' column
+        currency (numpy.ndarray): Currency code of every row
+    """
+
+    def __init__(self, holdings_df):
+        def column(name):
+            if name not in holdings_df.columns:
+                return np.full(len(holdings_df), np.nan)
+            return pd.to_numeric(holdings_df[name], errors='coerce').to_numpy(dtype=float)
+
+        self.symbols = np.asarray(holdings_df['symbol'], dtype=object) if 'symbol' in holdings_df.columns else np.array([], dtype=object)
+        self.quantity = column('quantity')
+        self.price = column('current_price')
+        self.market_value = column('current_market_value')
+        self.market_value_cad = column('current_market_value_CAD')
+        self.weight = column('percentage') / 100
+        self.currency = np.asarray(holdings_df['currency'], dtype=object) if 'currency' in holdings_df.columns else np.full(len(holdings_df), None)
+        # A symbol held in several rows resolves to its first row
+        self._ids = _symbol_ids(self.symbols)
+        self._index = pd.Index(self.symbols)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._ids
+
+    def unique_symbols(self):
+        """Held symbols in the order they first appear."""
+        return list(self._ids)
+
+    def id_of(self, symbol):
+        """Row id of a symbol, -1 if it is not held."""
+        return self._ids.get(symbol, -1)
+
+    def ids_of(self, symbols):
+        """Row ids of many symbols at once, -1 for those not held."""
+        if self._index.is_unique:
+            return self._index.get_indexer(symbols)
+        return np.array([self._ids.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+
+    def weights(self, symbols):
+        """
+        Portfolio weights of the given symbols, normalized to sum to 1.0 over them.
+
+        Returns:
+            pandas.Series: Weight per symbol, NaN for symbols that are not held
+        """
+        ids = self.ids_of(symbols)
+        weights = np.where(ids >= 0, self.weight[np.maximum(ids, 0)], np.nan)
+        total_weight = np.nansum(weights)
+        # Normalize weights to sum to 1.0 (in case some symbols were excluded)
+        if total_weight > 0:
+            weights = weights / total_weight
+        return pd.Series(weights, index=pd.Index(symbols, name='symbol'), name='percentage')
+
+    def total_market_value_cad(self):
+        return float(np.nansum(self.market_value_cad))
+
+
+class SymbolHistory:
+    """
+    Price history sorted by symbol, then date, with the (start, end) row offsets of every symbol.
+
+    Args:
+        performance_df (pandas.DataFrame): Long format history with 'symbol', 'date' and OHLCV columns
+    """
+
+    COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self, performance_df):
+        columns = [column for column in self.COLUMNS if column in performance_df.columns]
+        if performance_df.empty:
+            self.data = pd.DataFrame(columns=columns)
+            self._offsets = {}
+            return
+
+        codes, symbols = pd.factorize(np.asarray(performance_df['symbol'], dtype=object), sort=True)
+        dates = market_data.as_datetime(performance_df['date'])
+        order = np.lexsort((dates.to_numpy(), codes))
+        self.data = performance_df[columns].iloc[order].reset_index(drop=True)
+        self.data['date'] = dates.iloc[order].to_numpy()
+
+        ends = np.cumsum(np.bincount(codes, minlength=len(symbols)))
+        starts = ends - np.bincount(codes, minlength=len(symbols))
+        self._offsets = {symbol: (int(start), int(end)) for symbol, start, end in zip(symbols, starts, ends)}
+
+    @property
+    def symbols(self):
+        """Symbols with history, sorted."""
+        return list(self._offsets)
+
+    def __contains__(self, symbol):
+        return symbol in self._offsets
+
+    def bounds(self, symbol):
+        """(start, end) row offsets of a symbol, (0, 0) if it has no history."""
+        return self._offsets.get(symbol, (0, 0))
+
+    def bars(self, symbol):
+        """Rows of one symbol sorted by date, a slice of the shared frame. Treat as read-only."""
+        start, end = self.bounds(symbol)
+        return self.data.iloc[start:end]
+
+    def date_range(self, symbol):
+        """(first, last) date of a symbol's history, (None, None) if it has none."""
+        start, end = self.bounds(symbol)
+        if start == end:
+            return None, None
+        dates = self.data['date']
+        return dates.iloc[start], dates.iloc[end - 1]
+
+
+@st.cache_resource(max_entries=2, hash_funcs={DatasetHandle: dataset_hash})
+def get_holdings_store(holdings):
+    """
+    Returns the HoldingsStore of a holdings dataset, building it on first use.
+
+    Args:
+        holdings (DatasetHandle): Handle returned by fetch_portfolio_data
+    """
+    return HoldingsStore(holdings.data)
+
+
+@st.cache_resource(max_entries=2, hash_funcs={DatasetHandle: dataset_hash})
+def get_symbol_history(performance):
+    """
+    Returns the SymbolHistory of a performance dataset, building it on first use.
+
+    Args:
+        performance (DatasetHandle): Handle returned by load_performance
+    """
+    return SymbolHistory(performance.data)
@@ -0,0 +1,90 @@
+import importlib
+import threading
+import time
+import types
+
+import streamlit as st
+
+# --- Deferred imports ---
+# plotly.express and matplotlib/seaborn together take over a second to import and are only
+# needed once their section renders. They are bound as lazy modules and imported in a
+# background thread once the first elements are on screen, overlapping the data requests.
+# yfinance is left out: it is only needed when the exchange rate store is refreshed.
+
+WARM_UP_MODULES = (
+    "plotly.express",     # Allocation pie and holdings bar chart, first charts on the page
+    "matplotlib.figure",  # Correlation heatmap
+    "matplotlib.colors",
+    "seaborn",
+)
+
+# Seconds spent importing each module, filled in by the first import of a lazy module or the warm-up
+import_timings = {}
+_import_lock = threading.Lock()
+
+
+def _timed_import(name):
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    with _import_lock:
+        import_timings.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+class LazyModule(types.ModuleType):
+    """A module placeholder that imports the real module on first attribute access."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = _timed_import(self.__name__)
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """
+    Returns a stand-in for a module that is imported the first time it is used.
+
+    Args:
+        name (str): Dotted module name, e.g. 'plotly.express'
+
+    Returns:
+        LazyModule: Proxy forwarding attribute access to the imported module
+    """
+    return LazyModule(name)
+
+
+@st.cache_resource
+def start_import_warm_up(modules=WARM_UP_MODULES):
+    """
+    Imports heavy modules in a daemon thread, once per process.
+
+    Call after the first elements have been sent so the imports overlap with data loading
+    instead of delaying the first paint. A section that needs a module before the thread
+    reaches it imports it itself; Python's import lock makes the two wait for one import.
+
+    Returns:
+        threading.Thread: The warm-up thread
+    """
+    def warm_up():
+        for name in modules:
+            try:
+                _timed_import(name)
+            except ImportError:
+                # Optional dependency missing, the section using it reports the error itself
+                continue
+
+    thread = threading.Thread(target=warm_up, name="import-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,269 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Live quotes ---
+# An opt-in streaming mode for the holdings table. One consumer thread per server process
+# reads price ticks from a server-sent events feed into a QuoteStore: flat arrays of the
+# latest price per symbol, with a version number per symbol. Sessions remember the version
+# they last applied and only recompute the holdings whose symbols changed since then.
+
+
+class QuoteStore:
+    """
+    Latest price and tick time of every symbol, in arrays that grow as new symbols appear.
+
+    Every update batch gets a new version number, and each symbol records the version of its
+    last change, so changes_since() finds the changed symbols with one vectorized comparison.
+    """
+
+    def __init__(self, capacity=256):
+        self._slots = {}
+        self._symbols = []
+        self._prices = np.full(capacity, np.nan)
+        self._times = np.zeros(capacity)
+        self._versions = np.zeros(capacity, dtype=np.int64)
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def _slot(self, symbol):
+        slot = self._slots.get(symbol)
+        if slot is None:
+            slot = len(self._symbols)
+            if slot == len(self._prices):
+                grow = len(self._prices)
+                self._prices = np.concatenate([self._prices, np.full(grow, np.nan)])
+                self._times = np.concatenate([self._times, np.zeros(grow)])
+                self._versions = np.concatenate([self._versions, np.zeros(grow, dtype=np.int64)])
+            self._slots[symbol] = slot
+            self._symbols.append(symbol)
+        return slot
+
+    def update(self, ticks):
+        """
+        Records a batch of ticks.
+
+        Args:
+            ticks (list): (symbol, price, unix_time) tuples. A later tick for the same symbol wins.
+
+        Returns:
+            int: Version of the batch
+        """
+        with self._lock:
+            self.version += 1
+            for symbol, price, tick_time in ticks:
+                slot = self._slot(symbol)
+                self._prices[slot] = price
+                self._times[slot] = tick_time
+                self._versions[slot] = self.version
+            return self.version
+
+    def changes_since(self, version):
+        """
+        Symbols whose price changed after a version.
+
+        Args:
+            version (int): Version returned by an earlier call, 0 for everything
+
+        Returns:
+            tuple: (current_version, symbols, prices, times) - the arrays are copies
+        """
+        with self._lock:
+            n = len(self._symbols)
+            slots = np.flatnonzero(self._versions[:n] > version)
+            return self.version, [self._symbols[slot] for slot in slots], self._prices[slots], self._times[slots]
+
+
+def iter_sse_events(lines):
+    """
+    Yields the data of every event in a text/event-stream.
+
+    Args:
+        lines (iterable): Decoded lines of the response body, without line endings
+
+    Yields:
+        str: Data of one event, multi-line data joined with newlines
+    """
+    data = []
+    for line in lines:
+        if not line:
+            # A blank line ends the event
+            if data:
+                yield "\n".join(data)
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip(" "))
+        # Comments (':'), event names, ids and retry hints are not used
+
+
+def parse_ticks(data, received_at=None):
+    """
+    Decodes one event of the quote feed.
+
+    Args:
+        data (str): JSON object {"symbol", "price", "time"} or a list of them. "time" is optional.
+
+    Returns:
+        list: (symbol, price, unix_time) tuples
+    """
+    received_at = time.time() if received_at is None else received_at
+    payload = json.loads(data)
+    if isinstance(payload, dict):
+        payload = [payload]
+    return [(tick["symbol"], float(tick["price"]), float(tick.get("time", received_at))) for tick in payload]
+
+
+class QuoteConsumer:
+    """
+    Reads a server-sent events quote feed into a QuoteStore on a daemon thread, reconnecting
+    with exponential backoff when the stream drops.
+
+    Args:
+        store (QuoteStore): Store to update
+        url (str): URL of the event stream
+        timeout (tuple): (connect, read) seconds, the read timeout also detects a silent feed
+        reconnect_delay (float): Seconds before the first reconnect, doubled after every failure
+        max_reconnect_delay (float): Upper bound of the reconnect delay
+    """
+
+    def __init__(self, store, url, timeout=(5, 60), reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.store = store
+        self.url = url
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connected = False
+        self.ticks = 0
+        self.reconnects = 0
+        self.last_tick_at = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-quotes", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        import requests
+
+        delay = self.reconnect_delay
+        with requests.Session() as session:
+            while not self._stop.is_set():
+                try:
+                    with session.get(self.url, stream=True, timeout=self.timeout,
+                                     headers={"Accept": "text/event-stream"}) as response:
+                        response.raise_for_status()
+                        self.connected = True
+                        delay = self.reconnect_delay
+                        for data in iter_sse_events(response.iter_lines(decode_unicode=True)):
+                            ticks = parse_ticks(data)
+                            self.store.update(ticks)
+                            self.ticks += len(ticks)
+                            self.last_tick_at = time.time()
+                            if self._stop.is_set():
+                                return
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = e
+                self.connected = False
+                self.reconnects += 1
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def status(self):
+        """Returns connected, ticks, reconnects, last_tick_at and last_error."""
+        return {
+            "connected": self.connected,
+            "ticks": self.ticks,
+            "reconnects": self.reconnects,
+            "last_tick_at": self.last_tick_at,
+            "last_error": self.last_error,
+        }
+
+
+class LiveHoldings:
+    """
+    One session's holdings table kept current from a QuoteStore.
+
+    Starts from a holdings snapshot with market value changes. apply() only touches the rows
+    whose symbols ticked since the previous call: their price, market values and change columns
+    are rescaled by the price move, and the portfolio totals are adjusted by the difference.
+
+    Args:
+        holdings_df (pandas.DataFrame): Holdings from calculate_market_value_changes
+        prev_day_change (float): Portfolio 1 day change of the snapshot
+        change_columns (list): Market value change columns to rescale
+    """
+
+    def __init__(self, holdings_df, prev_day_change, change_columns):
+        self.df = holdings_df.reset_index(drop=True).copy()
+        self.change_columns = [column for column in change_columns if column in self.df.columns]
+        self.version = 0
+        self.changed_rows = np.array([], dtype=np.int64)
+
+        self._rows = self.df.groupby('symbol', sort=False).indices
+        self._base_price = self.df['current_price'].astype(float).to_numpy()
+        self._base_value = self.df['current_market_value'].astype(float).to_numpy()
+        self._base_value_cad = self.df['current_market_value_CAD'].astype(float).to_numpy()
+        # Growth since each horizon's base price, so a new price p gives (1 + change) * p / base_price - 1
+        self._base_growth = 1 + self.df[self.change_columns].astype(float).to_numpy()
+        self._value_cad = self._base_value_cad.copy()
+        self.total_value_cad = float(np.nansum(self._value_cad))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._prev_total_cad = self.total_value_cad / (1 + prev_day_change) if prev_day_change is not None else np.nan
+
+    @property
+    def prev_day_change(self):
+        return self.total_value_cad / self._prev_total_cad - 1 if self._prev_total_cad > 0 else np.nan
+
+    def apply(self, store):
+        """
+        Applies the ticks received since the previous call.
+
+        Returns:
+            numpy.ndarray: Positions of the rows that changed
+        """
+        self.version, symbols, prices, _ = store.changes_since(self.version)
+        rows, row_prices = [], []
+        for symbol, price in zip(symbols, prices):
+            positions = self._rows.get(symbol)
+            if positions is not None:
+                rows.append(positions)
+                row_prices.append(np.full(len(positions), price))
+        if not rows:
+            self.changed_rows = np.array([], dtype=np.int64)
+            return self.changed_rows
+
+        rows, row_prices = np.concatenate(rows), np.concatenate(row_prices)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(self._base_price[rows] > 0, row_prices / self._base_price[rows], np.nan)
+        value_cad = self._base_value_cad[rows] * ratio
+        self.total_value_cad += float(np.nansum(value_cad - self._value_cad[rows]))
+        self._value_cad[rows] = value_cad
+
+        df = self.df
+        df.loc[rows, 'current_price'] = row_prices
+        df.loc[rows, 'current_market_value'] = self._base_value[rows] * ratio
+        df.loc[rows, 'current_market_value_CAD'] = value_cad
+        if self.change_columns:
+            df.loc[rows, self.change_columns] = self._base_growth[rows] * ratio[:, None] - 1
+        # Every weight moves when one value does, this is one vector operation over all rows
+        df['percentage'] = self._value_cad / self.total_value_cad * 100
+        self.changed_rows = rows
+        return rows
+
+    def changed_mask(self):
+        """Boolean Series over the rows, True where the last apply() changed the row."""
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[self.changed_rows] = True
+        return pd.Series(mask, index=self.df.index)
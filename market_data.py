@@ -0,0 +1,458 @@
+import codecs
+import json
+import os
+import time
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+# --- Local columnar store for /market/data history ---
+# Each symbol is kept in its own uncompressed Feather (Arrow IPC) file so reloads are
+# memory-mapped instead of re-parsing JSON. manifest.json records when the history was
+# fetched and the date range held by every partition.
+
+MANIFEST_FILE = "manifest.json"
+KEY_COLUMNS = ['symbol', 'date']
+FLOAT_COLUMNS = ('open', 'high', 'low', 'close')
+INT_COLUMNS = ('volume',)
+
+
+def _partition_file(symbol):
+    """Returns the file name of the partition holding one symbol."""
+    return f"symbol={quote(str(symbol), safe='')}.feather"
+
+
+def read_manifest(folder):
+    """Reads the store manifest, returning None if the store does not exist yet."""
+    try:
+        with open(os.path.join(folder, MANIFEST_FILE), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_atomic(path, write):
+    """Writes to a temporary file first so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _dump_json(path, payload):
+    with open(path, 'w') as f:
+        json.dump(payload, f)
+
+
+def _write_manifest(folder, manifest):
+    _write_atomic(os.path.join(folder, MANIFEST_FILE), lambda path: _dump_json(path, manifest))
+
+
+def _write_partition(folder, symbol, symbol_df):
+    """Writes one symbol's rows and returns its manifest entry."""
+    file_name = _partition_file(symbol)
+    symbol_df = symbol_df.reset_index(drop=True)
+    _write_atomic(os.path.join(folder, file_name),
+                  lambda path: symbol_df.to_feather(path, compression='uncompressed'))
+    dates = pd.to_datetime(symbol_df['date'])
+    return {
+        "file": file_name,
+        "start": dates.min().strftime('%Y-%m-%d'),
+        "end": dates.max().strftime('%Y-%m-%d'),
+        "rows": len(symbol_df),
+    }
+
+
+def _read_partition(folder, partition):
+    from pyarrow import feather
+
+    table = feather.read_table(os.path.join(folder, partition["file"]), memory_map=True)
+    return table.to_pandas()
+
+
+def save_history(folder, performance_df):
+    """
+    Writes performance history to the store, one partition per symbol.
+
+    Args:
+        folder (str): Store directory, created if missing
+        performance_df (pandas.DataFrame): Long-format history with 'symbol' and 'date' columns
+    """
+    os.makedirs(folder, exist_ok=True)
+    partitions = {}
+    for symbol, symbol_df in performance_df.groupby('symbol', sort=False, observed=True):
+        partitions[str(symbol)] = _write_partition(folder, symbol, symbol_df)
+
+    now = time.time()
+    _write_manifest(folder, {"fetched_at": now, "full_synced_at": now, "partitions": partitions})
+
+    # Drop partitions of symbols that are no longer part of the history
+    kept = {partition["file"] for partition in partitions.values()}
+    for file_name in os.listdir(folder):
+        if file_name.startswith("symbol=") and file_name.endswith(".feather") and file_name not in kept:
+            os.remove(os.path.join(folder, file_name))
+
+
+def load_history(folder, max_age=None, symbols=None):
+    """
+    Loads performance history from the store without touching the network.
+
+    Args:
+        folder (str): Store directory
+        max_age (float, optional): Maximum age in seconds. Older stores are treated as missing.
+        symbols (list, optional): Only load these symbols
+
+    Returns:
+        pandas.DataFrame or None: The stored history, or None if there is no usable store
+    """
+    manifest = read_manifest(folder)
+    if not manifest or not manifest.get("partitions"):
+        return None
+    if max_age is not None and time.time() - manifest.get("fetched_at", 0) > max_age:
+        return None
+
+    frames = [
+        _read_partition(folder, partition)
+        for symbol, partition in manifest["partitions"].items()
+        if symbols is None or symbol in symbols
+    ]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def save_table(folder, name, df):
+    """Writes a standalone table, such as exchange rates, next to the history partitions."""
+    os.makedirs(folder, exist_ok=True)
+    df = df.reset_index(drop=True)
+    _write_atomic(os.path.join(folder, f"{name}.feather"),
+                  lambda path: df.to_feather(path, compression='uncompressed'))
+
+
+def load_table(folder, name):
+    """Reads a table written by save_table, returning None if it does not exist."""
+    if not os.path.exists(os.path.join(folder, f"{name}.feather")):
+        return None
+    return _read_partition(folder, {"file": f"{name}.feather"})
+
+
+# --- Schema normalization ---
+
+def as_datetime(dates):
+    """Returns dates as datetime64, skipping the parse when they already are."""
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    return pd.to_datetime(dates)
+
+
+def normalize_performance_df(performance_df, downcast=False):
+    """
+    Converts loaded history to the compact schema the analytics expect.
+
+    Symbols become a categorical with sorted categories, dates become datetime64 and the
+    rows are sorted by (symbol, date), so downstream code never has to parse or sort again.
+
+    Args:
+        performance_df (pandas.DataFrame): Long-format history with 'symbol' and 'date' columns
+        downcast (bool): Store OHLC prices as float32 and volume as int32
+
+    Returns:
+        pandas.DataFrame: The normalized history with a fresh RangeIndex
+    """
+    if performance_df.empty:
+        return performance_df
+
+    symbols = performance_df['symbol'].astype('category').cat.remove_unused_categories()
+    df = performance_df.assign(
+        symbol=symbols.cat.reorder_categories(sorted(symbols.cat.categories)),
+        date=as_datetime(performance_df['date']),
+    )
+
+    price_dtype = np.float32 if downcast else np.float64
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(price_dtype)
+    if downcast and 'volume' in df.columns:
+        volume = pd.to_numeric(df['volume'], errors='coerce')
+        if volume.abs().max() < np.iinfo(np.int32).max:
+            df['volume'] = volume.astype('Int32' if volume.isna().any() else np.int32)
+
+    return df.sort_values(['symbol', 'date'], kind='stable', ignore_index=True)
+
+
+# --- Incremental sync ---
+
+def sync_start_date(manifest):
+    """
+    Returns the date to request new bars from, so every symbol receives its missing bars.
+
+    The last stored bar of each symbol is requested again, which lets the API revise it.
+    """
+    return min(partition["end"] for partition in manifest["partitions"].values())
+
+
+def is_full_response(update_df, since):
+    """Detects an API that ignored the since parameter and returned the full history."""
+    if update_df.empty:
+        return False
+    return bool((pd.to_datetime(update_df['date']) < pd.Timestamp(since)).any())
+
+
+def _changed_rows(stored_df, update_df):
+    """Returns the rows of update_df that are new or differ from the stored rows."""
+    value_columns = [column for column in update_df.columns if column not in KEY_COLUMNS]
+    if any(column not in stored_df.columns for column in value_columns):
+        return update_df
+
+    left = update_df.assign(_date=pd.to_datetime(update_df['date']))
+    right = stored_df.assign(_date=pd.to_datetime(stored_df['date']))[['_date'] + value_columns]
+    merged = left.merge(right, on='_date', how='left', suffixes=('', '_stored'), indicator=True)
+
+    changed = (merged['_merge'] == 'left_only').to_numpy().copy()
+    for column in value_columns:
+        new, stored = merged[column], merged[f"{column}_stored"]
+        changed |= ~((new == stored) | (new.isna() & stored.isna())).to_numpy()
+    return update_df[changed]
+
+
+def upsert_history(folder, update_df, full_response=False):
+    """
+    Merges freshly fetched bars into the store, rewriting only the affected partitions.
+
+    New bars are appended and bars with an existing (symbol, date) replace the stored ones,
+    so backfills and revisions only touch the rows they change.
+
+    Args:
+        folder (str): Store directory holding a previously saved history
+        update_df (pandas.DataFrame): Fetched bars, either a delta or the full history
+        full_response (bool): update_df is the full history, so symbols missing from it
+            are dropped from the store
+
+    Returns:
+        list: Symbols whose partitions were rewritten
+    """
+    manifest = read_manifest(folder)
+    partitions = manifest["partitions"]
+
+    if full_response:
+        current_symbols = set(update_df['symbol'].astype(str).unique())
+        for symbol in [symbol for symbol in partitions if symbol not in current_symbols]:
+            os.remove(os.path.join(folder, partitions.pop(symbol)["file"]))
+
+    updated_symbols = []
+    for symbol, symbol_update in update_df.groupby('symbol', sort=False, observed=True):
+        symbol = str(symbol)
+        if symbol in partitions:
+            # Only rows that are new or revised make it past the diff
+            stored_df = _read_partition(folder, partitions[symbol])
+            symbol_update = _changed_rows(stored_df, symbol_update)
+            if symbol_update.empty:
+                continue
+            merged = pd.concat([stored_df, symbol_update], ignore_index=True)
+            merged['_date'] = pd.to_datetime(merged['date'])
+            merged = merged.drop_duplicates(subset='_date', keep='last').sort_values('_date', kind='stable')
+            symbol_update = merged.drop(columns='_date')
+        partitions[symbol] = _write_partition(folder, symbol, symbol_update)
+        updated_symbols.append(symbol)
+
+    manifest["fetched_at"] = time.time()
+    if full_response:
+        manifest["full_synced_at"] = manifest["fetched_at"]
+    _write_manifest(folder, manifest)
+    return updated_symbols
+
+
+# --- Streaming /market/data parser ---
+# The payload is [{"symbol": ..., "data": [{"date": ..., "open": ..., ...}, ...]}, ...].
+# Bars are decoded one at a time from the response chunks and written straight into typed
+# column arrays, so the full history never exists as Python dicts.
+
+DATE_BATCH_SIZE = 8192
+_WHITESPACE = ' \t\n\r'
+
+
+class _JsonStream:
+    """Incremental reader over an iterable of UTF-8 byte chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._exhausted = False
+        self.buf = ''
+        self.pos = 0
+
+    def _fill(self):
+        """Appends the next chunk to the buffer, returning False at the end of the stream."""
+        if self._exhausted:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._exhausted = True
+            self.buf = self.buf[self.pos:] + self._decoder.decode(b'', final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self._decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self, skip=_WHITESPACE):
+        """Returns the next character that is not in skip, or '' at the end of the stream."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in skip:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char, skip=_WHITESPACE):
+        if self.peek(skip) != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.buf, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self._exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._exhausted:
+                    raise
+            self._fill()
+
+
+class _ColumnBuilder:
+    """Growable typed column arrays for the flattened bars."""
+
+    def __init__(self, capacity):
+        self.capacity = max(int(capacity), 1024)
+        self.size = 0
+        self.columns = {}  # column name -> (kind, values, valid mask or None)
+        self.order = []
+        self.symbol_codes = np.empty(self.capacity, dtype=np.int32)
+        self.symbols = {}
+        self._date_strings = []
+
+    def _add_column(self, name):
+        if name in FLOAT_COLUMNS:
+            column = ('float', np.full(self.capacity, np.nan), None)
+        elif name in INT_COLUMNS:
+            column = ('int', np.zeros(self.capacity, dtype=np.int64), np.zeros(self.capacity, dtype=bool))
+        elif name == 'date':
+            column = ('date', np.full(self.capacity, np.datetime64('NaT'), dtype='datetime64[ns]'), None)
+        else:
+            column = ('object', np.full(self.capacity, None, dtype=object), None)
+        self.columns[name] = column
+        self.order.append(name)
+        return column
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+
+        def resized(values, fill):
+            grown = np.empty(new_capacity, dtype=values.dtype)
+            grown[:self.capacity] = values
+            grown[self.capacity:] = fill
+            return grown
+
+        for name, (kind, values, valid) in self.columns.items():
+            fill = {'float': np.nan, 'int': 0, 'date': np.datetime64('NaT'), 'object': None}[kind]
+            self.columns[name] = (kind, resized(values, fill), None if valid is None else resized(valid, False))
+        self.symbol_codes = resized(self.symbol_codes, -1)
+        self.capacity = new_capacity
+
+    def append(self, bar):
+        if self.size == self.capacity:
+            self._flush_dates()
+            self._grow()
+        row = self.size
+        for name, value in bar.items():
+            kind, values, valid = self.columns.get(name) or self._add_column(name)
+            if value is None:
+                continue
+            if kind == 'date':
+                self._date_strings.append((row, value))
+            elif kind == 'int':
+                values[row] = value
+                valid[row] = True
+            else:
+                values[row] = value
+        self.size += 1
+        if len(self._date_strings) >= DATE_BATCH_SIZE:
+            self._flush_dates()
+
+    def set_symbol(self, start, symbol):
+        """Assigns a symbol to the rows appended since start."""
+        code = -1 if symbol is None else self.symbols.setdefault(symbol, len(self.symbols))
+        self.symbol_codes[start:self.size] = code
+
+    def _flush_dates(self):
+        if not self._date_strings:
+            return
+        rows, strings = zip(*self._date_strings)
+        parsed = pd.to_datetime(pd.Index(strings), format='ISO8601')
+        if parsed.tz is not None:
+            parsed = parsed.tz_convert(None)
+        self.columns['date'][1][np.fromiter(rows, dtype=np.int64, count=len(rows))] = parsed.to_numpy('datetime64[ns]')
+        self._date_strings = []
+
+    def to_frame(self):
+        self._flush_dates()
+        n = self.size
+        categories = pd.Index(list(self.symbols))
+        data = {'symbol': pd.Categorical.from_codes(self.symbol_codes[:n], categories=categories)}
+        for name in self.order:
+            kind, values, valid = self.columns[name]
+            if kind == 'int':
+                data[name] = values[:n] if valid[:n].all() else pd.arrays.IntegerArray(values[:n], ~valid[:n])
+            elif kind == 'object':
+                data[name] = pd.Series(values[:n]).infer_objects()
+            else:
+                data[name] = values[:n]
+        return pd.DataFrame(data)
+
+
+def parse_market_data_stream(chunks, size_hint=None):
+    """
+    Parses a /market/data payload incrementally into a typed long-format DataFrame.
+
+    Args:
+        chunks (iterable): UTF-8 encoded byte chunks of the JSON response body
+        size_hint (int, optional): Body size in bytes, used to preallocate the column arrays
+
+    Returns:
+        pandas.DataFrame: One row per symbol and bar with a categorical 'symbol', datetime64
+            'date', float64 OHLC and int64 'volume' columns
+    """
+    stream = _JsonStream(chunks)
+    builder = _ColumnBuilder((size_hint or 0) // 120)
+
+    stream.expect('[')
+    while stream.peek(_WHITESPACE + ',') != ']':
+        # One {"symbol": ..., "data": [...]} object; keys may come in any order
+        stream.expect('{', _WHITESPACE + ',')
+        start, symbol = builder.size, None
+        while stream.peek(_WHITESPACE + ',') != '}':
+            key = stream.value()
+            stream.expect(':')
+            if key == 'data' and stream.peek() == '[':
+                stream.expect('[')
+                while stream.peek(_WHITESPACE + ',') != ']':
+                    bar = stream.value()
+                    if isinstance(bar, dict):
+                        builder.append(bar)
+                stream.expect(']')
+            elif key == 'symbol':
+                symbol = stream.value()
+            else:
+                stream.value()
+        stream.expect('}')
+        builder.set_symbol(start, symbol)
+    stream.expect(']')
+
+    return builder.to_frame()
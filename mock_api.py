@@ -0,0 +1,373 @@
+"""
+Local stand-in for the portfolio API.
+
+Serves /accounts/holdings and /market/data from recorded responses or from a seeded synthetic
+portfolio, with configurable latency, chunked transfer and error injection. Point the dashboard
+at it by setting "API_URL": "http://127.0.0.1:8765" in config.json.
+
+/quotes/stream is a server-sent events feed of random walk price ticks for the holdings, for
+the dashboard's live quotes mode ("LIVE_QUOTES_URL": "http://127.0.0.1:8765/quotes/stream").
+
+    python mock_api.py --symbols 300 --years 5 --latency 0.2 --chunked
+    python mock_api.py --record recordings/          # save the live API's responses
+    python mock_api.py --replay recordings/ --error-rate 0.05
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import synthetic_data
+
+HOLDINGS_FILE = "holdings.json"
+MARKET_DATA_FILE = "market_data.json"
+
+
+# --- Payloads ---
+
+def _history_from_market_data(payload):
+    """Flattens a /market/data response into the long format used by synthetic_data."""
+    frames = [pd.DataFrame(entry.get("data") or []).assign(symbol=entry.get("symbol")) for entry in payload]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=["symbol", "date", "open", "high", "low", "close", "volume"])
+    history_df = pd.concat(frames, ignore_index=True)
+    history_df["date"] = history_df["date"].astype(str).str[:10]
+    return history_df[["symbol"] + [c for c in history_df.columns if c != "symbol"]]
+
+
+class Payloads:
+    """
+    Response bodies served by the mock API.
+
+    Full responses are encoded once. Market data requests with a since parameter are
+    filtered from the history and cached per date.
+    """
+
+    def __init__(self, holdings_body, market_data_body, history_df):
+        self.holdings_body = holdings_body
+        self.market_data_body = market_data_body
+        self.history_df = history_df
+        self._since_bodies = {}
+        self._quote_seeds = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def synthetic(cls, n_symbols=50, years=1, seed=0, currency_mix=None, missing_rate=0.01, nan_rate=0.001):
+        portfolio = synthetic_data.generate_portfolio(
+            n_symbols=n_symbols, years=years, seed=seed, currency_mix=currency_mix,
+            missing_rate=missing_rate, nan_rate=nan_rate,
+        )
+        history_df = portfolio["history"]
+        return cls(synthetic_data.holdings_payload(portfolio), synthetic_data.market_data_payload(history_df), history_df)
+
+    @classmethod
+    def replay(cls, folder):
+        with open(os.path.join(folder, HOLDINGS_FILE), "rb") as f:
+            holdings_body = f.read()
+        with open(os.path.join(folder, MARKET_DATA_FILE), "rb") as f:
+            market_data_body = f.read()
+        return cls(holdings_body, market_data_body, _history_from_market_data(json.loads(market_data_body)))
+
+    def quote_seeds(self):
+        """(symbol, current_price) of every holding, the starting points of the quote stream."""
+        with self._lock:
+            if self._quote_seeds is None:
+                holdings = json.loads(self.holdings_body).get("portfolio_holdings") or []
+                self._quote_seeds = [
+                    (holding["symbol"], float(holding["current_price"]))
+                    for holding in holdings if holding.get("symbol") and holding.get("current_price")
+                ]
+            return self._quote_seeds
+
+    def market_data(self, since=None):
+        if not since:
+            return self.market_data_body
+        since = since[:10]
+        with self._lock:
+            if since not in self._since_bodies:
+                self._since_bodies[since] = synthetic_data.market_data_payload(self.history_df, since=since)
+            return self._since_bodies[since]
+
+
+def record(api_url, folder, timeout=300):
+    """
+    Saves the live API's responses so they can be served with --replay.
+
+    Args:
+        api_url (str): Base URL of the API, e.g. the API_URL in config.json
+        folder (str): Directory to write holdings.json and market_data.json to
+    """
+    import requests
+
+    os.makedirs(folder, exist_ok=True)
+    for path, filename in (("/accounts/holdings", HOLDINGS_FILE), ("/market/data", MARKET_DATA_FILE)):
+        response = requests.get(f"{api_url}{path}", timeout=timeout)
+        response.raise_for_status()
+        with open(os.path.join(folder, filename), "wb") as f:
+            f.write(response.content)
+        print(f"Recorded {path}: {len(response.content):,} bytes")
+
+
+# --- Server ---
+
+class MockAPIServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering API requests from a Payloads instance.
+
+    Args:
+        address (tuple): (host, port) to listen on
+        payloads (Payloads): Bodies to serve
+        latency (float): Seconds to wait before every response
+        jitter (float): Extra random wait of up to this many seconds
+        chunked (bool): Send bodies with Transfer-Encoding: chunked instead of Content-Length
+        chunk_size (int): Bytes per write
+        chunk_delay (float): Seconds to wait between writes, to simulate a slow link
+        error_rate (float): Fraction of requests answered with error_status
+        error_status (int): Status code of injected errors
+        drop_rate (float): Fraction of responses cut off halfway through the body
+        since_param (str): Query parameter carrying the incremental sync start date
+        tick_rate (float): Quote ticks per second on /quotes/stream
+        tick_volatility (float): Standard deviation of the relative price move of one tick
+        seed (int, optional): Seed for the latency and error draws
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, payloads, latency=0.0, jitter=0.0, chunked=False, chunk_size=1 << 16,
+                 chunk_delay=0.0, error_rate=0.0, error_status=503, drop_rate=0.0, since_param="start_date",
+                 tick_rate=20.0, tick_volatility=0.0005, seed=None, verbose=False):
+        super().__init__(address, MockAPIHandler)
+        self.payloads = payloads
+        self.latency = latency
+        self.jitter = jitter
+        self.chunked = chunked
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.since_param = since_param
+        self.tick_rate = tick_rate
+        self.tick_volatility = tick_volatility
+        self.seed = seed
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "errors_injected": 0, "dropped": 0, "bytes_sent": 0, "quote_streams": 0, "ticks_sent": 0}
+        self._stats_lock = threading.Lock()
+
+    def draw(self):
+        """Returns (delay, inject_error, drop) for one request."""
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            inject_error = self.random.random() < self.error_rate
+            drop = not inject_error and self.random.random() < self.drop_rate
+            if inject_error:
+                self.stats["errors_injected"] += 1
+            if drop:
+                self.stats["dropped"] += 1
+        return delay, inject_error, drop
+
+    def count_bytes(self, n):
+        with self._stats_lock:
+            self.stats["bytes_sent"] += n
+
+    def count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive and chunked transfer
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        server = self.server
+        if url.path == "/health":
+            self._send_body(200, json.dumps(server.stats).encode())
+            return
+
+        if url.path == "/quotes/stream":
+            self._stream_quotes()
+            return
+
+        if url.path == "/accounts/holdings":
+            body = server.payloads.holdings_body
+        elif url.path == "/market/data":
+            since = parse_qs(url.query).get(server.since_param, [None])[0]
+            body = server.payloads.market_data(since)
+        else:
+            self._send_body(404, b'{"error": "not found"}')
+            return
+
+        delay, inject_error, drop = server.draw()
+        if delay:
+            time.sleep(delay)
+        if inject_error:
+            self._send_body(server.error_status, b'{"error": "injected failure"}')
+            return
+        self._send_body(200, body, drop=drop)
+
+    def _send_body(self, status, body, drop=False):
+        server = self.server
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if server.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+        if drop:
+            self.send_header("Connection", "close")
+        self.end_headers()
+
+        # A dropped response stops halfway and closes the connection without finishing the body
+        end = len(body) // 2 if drop else len(body)
+        try:
+            for start in range(0, end, server.chunk_size):
+                piece = body[start:min(start + server.chunk_size, end)]
+                if server.chunked:
+                    self.wfile.write(f"{len(piece):x}\r\n".encode() + piece + b"\r\n")
+                else:
+                    self.wfile.write(piece)
+                server.count_bytes(len(piece))
+                if server.chunk_delay:
+                    time.sleep(server.chunk_delay)
+            if drop:
+                self.close_connection = True
+                return
+            if server.chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _stream_quotes(self):
+        """
+        Sends random walk ticks until the client disconnects. Ticks are batched into one event
+        every 100 ms, each tick moving one random holding's price.
+        """
+        server = self.server
+        seeds = server.payloads.quote_seeds()
+        rng = random.Random(server.seed)
+        prices = dict(seeds)
+        symbols = [symbol for symbol, _ in seeds]
+        interval = 0.1
+        carry = 0.0
+        server.count("quote_streams")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while symbols:
+                time.sleep(interval)
+                carry += server.tick_rate * interval
+                n_ticks, carry = int(carry), carry - int(carry)
+                if not n_ticks:
+                    # Keeps idle connections alive through proxies and read timeouts
+                    event = b": keep-alive\n\n"
+                else:
+                    now = time.time()
+                    ticks = []
+                    for symbol in rng.choices(symbols, k=n_ticks):
+                        prices[symbol] *= 1 + rng.gauss(0, server.tick_volatility)
+                        ticks.append({"symbol": symbol, "price": round(prices[symbol], 4), "time": now})
+                    event = f"data: {json.dumps(ticks)}\n\n".encode()
+                    server.count("ticks_sent", n_ticks)
+                self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                self.wfile.flush()
+                server.count_bytes(len(event))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve(payloads, host="127.0.0.1", port=8765, **options):
+    """
+    Starts the mock API in a background thread.
+
+    Returns:
+        MockAPIServer: The running server, stop it with shutdown()
+    """
+    server = MockAPIServer((host, port), payloads, **options)
+    threading.Thread(target=server.serve_forever, name="mock-api", daemon=True).start()
+    return server
+
+
+def _parse_mix(text):
+    return {part.split("=")[0].strip().upper(): float(part.split("=")[1]) for part in text.split(",")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--replay", metavar="DIR", help="Serve responses recorded with --record")
+    source.add_argument("--record", metavar="DIR", help="Save the responses of API_URL from config.json and exit")
+    synthetic = parser.add_argument_group("synthetic data (used without --replay)")
+    synthetic.add_argument("--symbols", type=int, default=50, help="Number of holdings")
+    synthetic.add_argument("--years", type=float, default=1, help="History length in years")
+    synthetic.add_argument("--currency-mix", default="CAD=0.5,USD=0.5", help="Share of holdings per currency")
+    synthetic.add_argument("--missing-rate", type=float, default=0.01)
+    synthetic.add_argument("--nan-rate", type=float, default=0.001)
+    synthetic.add_argument("--seed", type=int, default=0)
+    behaviour = parser.add_argument_group("behaviour")
+    behaviour.add_argument("--latency", type=float, default=0.0, help="Seconds before every response")
+    behaviour.add_argument("--jitter", type=float, default=0.0, help="Extra random latency of up to this many seconds")
+    behaviour.add_argument("--chunked", action="store_true", help="Use chunked transfer encoding")
+    behaviour.add_argument("--chunk-size", type=int, default=1 << 16, help="Bytes per write")
+    behaviour.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between writes")
+    behaviour.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with --error-status")
+    behaviour.add_argument("--error-status", type=int, default=503)
+    behaviour.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of responses cut off mid-body")
+    behaviour.add_argument("--since-param", default="start_date", help="Query parameter for incremental market data")
+    behaviour.add_argument("--tick-rate", type=float, default=20.0, help="Quote ticks per second on /quotes/stream")
+    behaviour.add_argument("--tick-volatility", type=float, default=0.0005, help="Relative standard deviation of one tick")
+    behaviour.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    if args.record:
+        with open("config.json") as f:
+            record(json.load(f)["API_URL"], args.record)
+        return
+
+    if args.replay:
+        payloads = Payloads.replay(args.replay)
+    else:
+        payloads = Payloads.synthetic(
+            n_symbols=args.symbols, years=args.years, seed=args.seed, currency_mix=_parse_mix(args.currency_mix),
+            missing_rate=args.missing_rate, nan_rate=args.nan_rate,
+        )
+    print(f"Holdings {len(payloads.holdings_body):,} bytes, market data {len(payloads.market_data_body):,} bytes")
+
+    server = MockAPIServer(
+        (args.host, args.port), payloads, latency=args.latency, jitter=args.jitter, chunked=args.chunked,
+        chunk_size=args.chunk_size, chunk_delay=args.chunk_delay, error_rate=args.error_rate,
+        error_status=args.error_status, drop_rate=args.drop_rate, since_param=args.since_param,
+        tick_rate=args.tick_rate, tick_volatility=args.tick_volatility, seed=args.seed, verbose=args.verbose,
+    )
+    print(f"Serving on http://{args.host}:{args.port} (set API_URL in config.json to this address)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Stats: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# --- Portfolio NAV ---
+# The CAD value of the portfolio on every date of the price history, from a quantity per
+# holding, a dates x holdings close matrix and the matching as-of FX matrix. Values, daily
+# returns and each holding's contribution come out of one pass of array operations. There is
+# no transaction history, so today's quantities are held over the whole history.
+
+
+def compute_nav(quantity, closes, rates):
+    """
+    Daily CAD values, portfolio returns and per holding return contributions.
+
+    A holding only counts towards a day's return if it has a value on that day and the day
+    before, so holdings entering the history (new listings, later first bars) do not show
+    up as gains.
+
+    Args:
+        quantity (numpy.ndarray): Units held of each holding
+        closes (numpy.ndarray): Dates x holdings closes in each holding's currency, NaN before its first bar
+        rates (numpy.ndarray): Dates x holdings CAD per unit of each holding's currency
+
+    Returns:
+        tuple: (values, returns, contributions) - dates x holdings CAD values, daily portfolio
+            returns (0 on the first date) and dates x holdings contributions that sum to the returns
+    """
+    values = closes * quantity * rates
+    delta = np.zeros_like(values)
+    previous = np.zeros_like(values)
+    both = np.isfinite(values[1:]) & np.isfinite(values[:-1])
+    np.subtract(values[1:], values[:-1], out=delta[1:], where=both)
+    np.copyto(previous[1:], values[:-1], where=both)
+
+    base = previous.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contributions = np.where(base[:, None] > 0, delta / base[:, None], 0.0)
+    return values, contributions.sum(axis=1), contributions
+
+
+class NavHistory:
+    """
+    Result of compute_nav with lookups by date.
+
+    Attributes:
+        values (pandas.DataFrame): Date x holding CAD values
+        nav (pandas.Series): Portfolio CAD value per date, over the holdings with a price
+        returns (pandas.Series): Daily portfolio returns
+        index (pandas.Series): Growth of 1 CAD invested at the first date
+        contributions (pandas.DataFrame): Date x holding return contributions
+    """
+
+    def __init__(self, dates, symbols, values, returns, contributions):
+        dates = pd.DatetimeIndex(dates, name='Date')
+        self.values = pd.DataFrame(values, index=dates, columns=symbols)
+        self.nav = self.values.sum(axis=1, min_count=1).rename('NAV')
+        self.returns = pd.Series(returns, index=dates, name='Return')
+        self.index = (1 + self.returns).cumprod().rename('Index')
+        self.contributions = pd.DataFrame(contributions, index=dates, columns=symbols)
+
+    @classmethod
+    def from_arrays(cls, dates, symbols, quantity, closes, rates):
+        return cls(dates, symbols, *compute_nav(quantity, closes, rates))
+
+    @property
+    def empty(self):
+        return self.values.empty
+
+    @property
+    def latest_date(self):
+        return self.values.index.max()
+
+    def _position(self, date):
+        """Position of the latest date on or before date, -1 if there is none."""
+        return int(self.values.index.searchsorted(pd.Timestamp(date), side='right')) - 1
+
+    def change_since(self, date):
+        """Portfolio return from the close on or before date to the latest close, NaN without history then."""
+        position = self._position(date)
+        if position < 0:
+            return np.nan
+        index = self.index.to_numpy()
+        return float(index[-1] / index[position] - 1)
+
+    def horizon_changes(self, horizons):
+        """
+        Portfolio return over each horizon.
+
+        Args:
+            horizons (dict): Name -> lookback in calendar days from the latest date
+
+        Returns:
+            dict: Name -> return as a fraction
+        """
+        return {name: self.change_since(self.latest_date - pd.Timedelta(days=days)) for name, days in horizons.items()}
+
+    def contribution_since(self, date):
+        """
+        Each symbol's share of the portfolio return since date. The shares sum to change_since(date).
+
+        Returns:
+            pandas.Series: Contribution per symbol, as a fraction of the portfolio value at date.
+                A symbol held in several rows is counted once, with the sum of its rows.
+        """
+        symbols = self.contributions.columns
+        position = self._position(date)
+        if position < 0:
+            return pd.Series(np.nan, index=symbols.unique())
+        index = self.index.to_numpy()
+        # A day's contribution compounds with the growth before it: sum of index[t-1] * c[t] / index[start]
+        growth = index[position:-1] / index[position]
+        contributions = pd.Series(growth @ self.contributions.to_numpy()[position + 1:], index=symbols)
+        return contributions.groupby(level=0, sort=False).sum()
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import market_data
+from datasets import DatasetHandle, dataset_hash
+from fx import FxRates
+
+# --- Shared date x symbol price panel ---
+# The correlation, market value and benchmark analytics all work on the same close matrix.
+# It is built once per version of the history and shared between them and across sessions.
+
+
+def select_prices(price_df, present_df, symbols=None, lookback=None, common_dates_only=False):
+    """
+    Restrict a price matrix to some symbols and a trailing window.
+
+    Args:
+        price_df (pandas.DataFrame): Date x symbol values from build_price_matrix
+        present_df (pandas.DataFrame): Matching row presence flags
+        symbols (list, optional): Symbols to keep, in column order. Symbols without rows in the window are dropped.
+        lookback (pandas.DateOffset, optional): Only keep rows within this offset of the latest date
+        common_dates_only (bool): Only keep dates on which every kept symbol has a row
+
+    Returns:
+        tuple: (price_df, present_df) restricted to dates on which a kept symbol has a row
+    """
+    rows = np.ones(len(price_df), dtype=bool)
+    if lookback is not None and len(price_df):
+        rows = (price_df.index >= price_df.index.max() - lookback)
+    window_present = present_df[rows]
+
+    if symbols is None:
+        columns = window_present.columns[window_present.any(axis=0).to_numpy()].tolist()
+    else:
+        has_rows = window_present.any(axis=0)
+        columns = [symbol for symbol in symbols if symbol in has_rows.index and has_rows[symbol]]
+    window_present = window_present[columns]
+
+    keep = window_present.all(axis=1) if common_dates_only else window_present.any(axis=1)
+    keep = keep.to_numpy()
+    return price_df[rows][columns][keep], window_present[keep]
+
+
+def build_price_matrix(performance_df, value_column='close', symbols=None, lookback=None, common_dates_only=False):
+    """
+    Pivot long-format price history into a date x symbol matrix.
+
+    Args:
+        performance_df (pandas.DataFrame): DataFrame with 'symbol', 'date' and value columns
+        value_column (str): Column to place in the matrix cells
+        symbols (list, optional): Symbols to keep, in column order. Symbols without rows are dropped.
+        lookback (pandas.DateOffset, optional): Only keep rows within this offset of the latest date
+        common_dates_only (bool): Only keep dates on which every kept symbol has a row
+
+    Returns:
+        tuple: (price_df, present_df) sharing a sorted date index and symbol columns.
+            present_df flags the cells that had a row, even if its value is NaN.
+    """
+    keyed = pd.DataFrame({
+        'date': market_data.as_datetime(performance_df['date']),
+        # Plain symbol labels, even when the input stores symbols as a categorical
+        'symbol': np.asarray(performance_df['symbol'], dtype=object),
+        value_column: performance_df[value_column],
+    }).drop_duplicates(subset=['date', 'symbol'], keep='last').set_index(['date', 'symbol'])[value_column]
+
+    price_df = keyed.unstack('symbol').sort_index()
+    price_df.columns.name = None
+    present_df = pd.Series(True, index=keyed.index).unstack('symbol', fill_value=False)
+    present_df = present_df.reindex(index=price_df.index, columns=price_df.columns, fill_value=False)
+
+    if symbols is None and lookback is None and not common_dates_only:
+        return price_df, present_df
+    return select_prices(price_df, present_df, symbols, lookback, common_dates_only)
+
+
+def last_seen_rows(present_df):
+    """For every date and symbol, the position of the symbol's latest row so far, -1 before its first row."""
+    present = present_df.to_numpy()
+    row_numbers = np.where(present, np.arange(len(present))[:, None], -1)
+    return np.maximum.accumulate(row_numbers, axis=0)
+
+
+def asof_positions(present_df, target_dates, last_seen=None):
+    """
+    Find the latest row on or before each target date for every symbol.
+
+    Args:
+        present_df (pandas.DataFrame): Boolean date x symbol matrix from build_price_matrix
+        target_dates (list): Dates to look up
+        last_seen (numpy.ndarray, optional): Precomputed last_seen_rows(present_df)
+
+    Returns:
+        numpy.ndarray: (len(target_dates), n_symbols) row positions into present_df, -1 where no row exists
+    """
+    if last_seen is None:
+        last_seen = last_seen_rows(present_df)
+
+    date_positions = present_df.index.searchsorted(pd.DatetimeIndex(target_dates), side='right') - 1
+    positions = np.full((len(date_positions), last_seen.shape[1]), -1)
+    valid = date_positions >= 0
+    positions[valid] = last_seen[date_positions[valid]]
+    return positions
+
+
+class PricePanel:
+    """
+    Close prices of every symbol on a shared date index, with derived views computed on demand.
+
+    A panel is immutable once built. Derived views are memoized on the panel, and
+    fingerprint identifies the history it was built from, so Streamlit caches can hash a
+    panel without touching its data.
+    """
+
+    def __init__(self, performance_df, fingerprint):
+        self.fingerprint = fingerprint
+        if performance_df.empty:
+            self.closes, self.present = pd.DataFrame(), pd.DataFrame()
+        else:
+            self.closes, self.present = build_price_matrix(performance_df)
+        self._views = {}
+
+    @property
+    def empty(self):
+        return self.closes.empty
+
+    @property
+    def symbols(self):
+        return self.closes.columns.tolist()
+
+    @property
+    def latest_date(self):
+        return self.closes.index.max()
+
+    def _memoized(self, key, compute):
+        if key not in self._views:
+            self._views[key] = compute()
+        return self._views[key]
+
+    def select(self, symbols=None, lookback=None, common_dates_only=False):
+        """Returns (closes, present) restricted as in select_prices."""
+        return select_prices(self.closes, self.present, symbols, lookback, common_dates_only)
+
+    def filled_closes(self):
+        """Closes forward filled, then back filled before each symbol's first bar."""
+        return self._memoized('filled', lambda: self.closes.ffill().bfill())
+
+    def forward_filled_closes(self):
+        """Closes forward filled, NaN before each symbol's first bar."""
+        return self._memoized('forward_filled', lambda: self.closes.ffill())
+
+    def returns(self):
+        """Daily simple returns of the closes, NaN where either close is missing."""
+        return self._memoized('returns', lambda: self.closes.pct_change(fill_method=None))
+
+    def normalized(self, symbols=None, base=100):
+        """Filled closes rebased so every symbol starts at base."""
+        filled = self.filled_closes()
+        if symbols is not None:
+            filled = filled[list(symbols)]
+        return filled / filled.iloc[0] * base
+
+    def asof_positions(self, target_dates):
+        """Row positions of the latest bar on or before each target date, -1 where none exists."""
+        last_seen = self._memoized('last_seen', lambda: last_seen_rows(self.present))
+        return asof_positions(self.present, target_dates, last_seen)
+
+
+@st.cache_resource(max_entries=2, hash_funcs={DatasetHandle: dataset_hash})
+def get_price_panel(performance):
+    """
+    Returns the shared PricePanel for a performance dataset, building it on first use.
+
+    Args:
+        performance (DatasetHandle): Handle returned by load_performance
+    """
+    return PricePanel(performance.data, fingerprint=performance.fingerprint)
+
+
+def analytics_cache(ttl=3600, max_entries=16):
+    """
+    st.cache_data for analytics that take dataset handles and price panels.
+
+    Handles, panels and FX rates are hashed by their precomputed fingerprints, so a cache hit costs the
+    same no matter how large the data is, and the least recently used results are evicted
+    once max_entries is reached.
+    """
+    return st.cache_data(
+        ttl=ttl,
+        max_entries=max_entries,
+        hash_funcs={DatasetHandle: dataset_hash, PricePanel: lambda panel: panel.fingerprint, FxRates: lambda fx: fx.fingerprint},
+    )
@@ -0,0 +1,154 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# --- Portfolio risk ---
+# Every metric is computed for all symbols at once from a dates x symbols returns array, with
+# one pass of NumPy reductions per metric and no per-symbol Python loops. The covariance
+# matrix is never formed: the portfolio terms only need R^T (R w), which costs O(T * n)
+# instead of O(T * n^2) time and O(n^2) memory.
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def annualized_volatility(returns, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """Sample standard deviation of each column, scaled to a year."""
+    return returns.std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+
+def historical_var_cvar(returns, level=0.95):
+    """
+    Historical value at risk and conditional value at risk of each column.
+
+    Args:
+        returns (numpy.ndarray): Dates x symbols simple returns without NaNs
+        level (float): Confidence level, e.g. 0.95
+
+    Returns:
+        tuple: (var, cvar) arrays of losses as positive fractions
+    """
+    # The worst (1 - level) share of days, found with a partial sort instead of a full one
+    # (rounded first, as 1 - 0.95 is slightly more than 0.05 in floating point)
+    tail = max(1, int(np.ceil(round((1 - level) * len(returns), 9))))
+    worst = np.partition(returns, tail - 1, axis=0)[:tail]
+    return -worst[tail - 1], -worst.mean(axis=0)
+
+
+def parametric_var_cvar(mean, std, level=0.95):
+    """
+    Value at risk and conditional value at risk assuming normally distributed returns.
+
+    Args:
+        mean (numpy.ndarray): Mean daily return of each column
+        std (numpy.ndarray): Daily standard deviation of each column
+        level (float): Confidence level, e.g. 0.95
+
+    Returns:
+        tuple: (var, cvar) arrays of losses as positive fractions
+    """
+    normal = NormalDist()
+    z = normal.inv_cdf(1 - level)
+    var = -(mean + z * std)
+    cvar = -(mean - std * normal.pdf(z) / (1 - level))
+    return var, cvar
+
+
+def max_drawdown(returns):
+    """Largest peak to trough fall of each column's compounded value, as a positive fraction."""
+    wealth = np.cumprod(1 + returns, axis=0)
+    peaks = np.maximum.accumulate(wealth, axis=0)
+    # The starting value of 1 counts as a peak too
+    np.maximum(peaks, 1.0, out=peaks)
+    return -(wealth / peaks - 1).min(axis=0)
+
+
+def betas(returns, benchmark_returns):
+    """
+    Beta of every column to every benchmark.
+
+    Args:
+        returns (numpy.ndarray): Dates x symbols returns
+        benchmark_returns (numpy.ndarray): Dates x benchmarks returns on the same dates
+
+    Returns:
+        numpy.ndarray: Symbols x benchmarks betas
+    """
+    demeaned = returns - returns.mean(axis=0)
+    benchmark_demeaned = benchmark_returns - benchmark_returns.mean(axis=0)
+    return (demeaned.T @ benchmark_demeaned) / (benchmark_demeaned ** 2).sum(axis=0)
+
+
+def risk_contributions(returns, weights, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """
+    Marginal and total contribution of each holding to the portfolio's volatility.
+
+    Args:
+        returns (numpy.ndarray): Dates x symbols returns
+        weights (numpy.ndarray): Portfolio weight of each symbol, summing to 1
+        periods_per_year (int): Periods used to annualize
+
+    Returns:
+        tuple: (portfolio_volatility, marginal, contribution) - annualized. The contributions
+            sum to the portfolio volatility.
+    """
+    demeaned = returns - returns.mean(axis=0)
+    # Covariance times weights without forming the covariance: R^T (R w) / (T - 1)
+    cov_weights = demeaned.T @ (demeaned @ weights) / (len(returns) - 1)
+    portfolio_volatility = np.sqrt(weights @ cov_weights)
+    if portfolio_volatility == 0:
+        marginal = np.zeros_like(cov_weights)
+    else:
+        marginal = cov_weights / portfolio_volatility
+    scale = np.sqrt(periods_per_year)
+    return portfolio_volatility * scale, marginal * scale, weights * marginal * scale
+
+
+def risk_metrics(returns, weights, benchmark_returns=None, level=0.95, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """
+    Risk figures for every holding and for the portfolio as a whole.
+
+    Args:
+        returns (pandas.DataFrame): Date x symbol daily returns without NaNs
+        weights (pandas.Series): Portfolio weight of each symbol, normalized to sum to 1
+        benchmark_returns (pandas.DataFrame, optional): Date x benchmark returns on the same dates
+        level (float): VaR and CVaR confidence level
+        periods_per_year (int): Periods used to annualize
+
+    Returns:
+        tuple: (holdings_risk, portfolio_risk) - a DataFrame indexed by symbol and a dict with the
+            same figures for the portfolio, whose daily return is returns @ weights
+    """
+    symbols = returns.columns
+    r = returns.to_numpy(dtype=float)
+    w = weights.reindex(symbols).fillna(0).to_numpy(dtype=float)
+    # The portfolio is computed as one more column alongside the holdings
+    r = np.column_stack([r, r @ w])
+
+    mean = r.mean(axis=0)
+    std = r.std(axis=0, ddof=1)
+    hist_var, hist_cvar = historical_var_cvar(r, level)
+    param_var, param_cvar = parametric_var_cvar(mean, std, level)
+    columns = {
+        'Annualized Volatility': annualized_volatility(r, periods_per_year),
+        'Historical VaR': hist_var,
+        'Historical CVaR': hist_cvar,
+        'Parametric VaR': param_var,
+        'Parametric CVaR': param_cvar,
+        'Max Drawdown': max_drawdown(r),
+    }
+    if benchmark_returns is not None and not benchmark_returns.empty:
+        beta = betas(r, benchmark_returns.to_numpy(dtype=float))
+        for position, benchmark in enumerate(benchmark_returns.columns):
+            columns[f'Beta {benchmark}'] = beta[:, position]
+
+    portfolio_volatility, marginal, contribution = risk_contributions(r[:, :-1], w, periods_per_year)
+    holdings_risk = pd.DataFrame({name: values[:-1] for name, values in columns.items()}, index=symbols)
+    holdings_risk.insert(0, 'Weight', w)
+    holdings_risk['Marginal Risk'] = marginal
+    holdings_risk['Risk Contribution'] = contribution
+    with np.errstate(divide='ignore', invalid='ignore'):
+        holdings_risk['Risk Contribution (%)'] = contribution / portfolio_volatility
+
+    portfolio_risk = {name: float(values[-1]) for name, values in columns.items()}
+    return holdings_risk, portfolio_risk
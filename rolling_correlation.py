@@ -0,0 +1,330 @@
+import numpy as np
+import pandas as pd
+
+# --- Rolling and EWMA correlation ---
+# The engines keep running sums of the returns, so adding a bar costs O(n^2) no matter how
+# long the window or the history is. Missing returns are handled pairwise: every pair of
+# symbols only uses the bars on which both have a return, as pandas' rolling corr does.
+# A CorrelationTracker feeds an engine the new bars of each history version and records the
+# pair correlations after every bar, so time series are read back instead of recomputed.
+
+TAIL_CHECK_ROWS = 30 # Bars compared to detect revised history when the engine keeps no window
+
+
+def _correlation_from_moments(cov, var_i, count, min_periods):
+    """Pairwise correlation from covariances and the variance of the row symbol over the same bars."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.sqrt(var_i * var_i.T)
+    corr[(count < min_periods) | ~(var_i > 0) | ~(var_i.T > 0)] = np.nan
+    return np.clip(corr, -1.0, 1.0, out=corr)
+
+
+class RollingCorrelation:
+    """
+    Correlation over the last window bars, from running sums of x, x^2 and xy.
+
+    Every update adds the new bar's outer products to the sums and subtracts those of the bar
+    leaving the window. The sums are recomputed from the window every resync_every updates so
+    rounding errors cannot build up.
+
+    Args:
+        n_symbols (int): Number of return series
+        window (int): Bars per window
+        min_periods (int, optional): Shared bars a pair needs for a correlation, defaults to half the window
+        resync_every (int, optional): Updates between exact recomputations, defaults to the window
+    """
+
+    def __init__(self, n_symbols, window, min_periods=None, resync_every=None):
+        self.window = window
+        self.min_periods = max(2, min_periods if min_periods is not None else window // 2)
+        self.resync_every = resync_every or window
+        self._bars = np.full((window, n_symbols), np.nan)
+        self._position = 0 # Ring buffer slot of the next bar
+        self._updates = 0
+        # Pairwise sums: count[i, j] bars where both have a return, sum_x[i, j] = sum of x_i over them,
+        # sum_xx[i, j] = sum of x_i^2 over them and sum_xy[i, j] = sum of x_i * x_j
+        self._count = np.zeros((n_symbols, n_symbols))
+        self._sum_x = np.zeros((n_symbols, n_symbols))
+        self._sum_xx = np.zeros((n_symbols, n_symbols))
+        self._sum_xy = np.zeros((n_symbols, n_symbols))
+
+    def _accumulate(self, bar, sign):
+        present = np.isfinite(bar)
+        weight = present.astype(float)
+        x = np.where(present, bar, 0.0)
+        self._count += sign * np.outer(weight, weight)
+        self._sum_x += sign * np.outer(x, weight)
+        self._sum_xx += sign * np.outer(x * x, weight)
+        self._sum_xy += sign * np.outer(x, x)
+
+    def _resync(self):
+        present = np.isfinite(self._bars)
+        weight = present.astype(float)
+        x = np.where(present, self._bars, 0.0)
+        self._count = weight.T @ weight
+        self._sum_x = x.T @ weight
+        self._sum_xx = (x * x).T @ weight
+        self._sum_xy = x.T @ x
+
+    def update(self, bar):
+        """
+        Adds one bar of returns.
+
+        Args:
+            bar (numpy.ndarray): Return of every symbol, NaN where a symbol has none
+        """
+        bar = np.asarray(bar, dtype=float)
+        if self._updates >= self.window:
+            self._accumulate(self._bars[self._position], -1)
+        self._bars[self._position] = bar
+        self._accumulate(bar, 1)
+        self._position = (self._position + 1) % self.window
+        self._updates += 1
+        if self._updates % self.resync_every == 0:
+            self._resync()
+
+    def _moments(self):
+        count = self._count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self._sum_x / count
+            # mean.T[i, j] is the mean of x_j over the bars shared with i
+            cov = (self._sum_xy - self._sum_x * mean.T) / (count - 1)
+            var = (self._sum_xx - self._sum_x * mean) / (count - 1)
+        return cov, var, count
+
+    def covariance(self):
+        """Sample covariance matrix of the window, NaN for pairs with fewer than min_periods shared bars."""
+        cov, _, count = self._moments()
+        cov[count < self.min_periods] = np.nan
+        return cov
+
+    def correlation(self):
+        """Correlation matrix of the window, NaN for pairs with fewer than min_periods shared bars."""
+        cov, var, count = self._moments()
+        return _correlation_from_moments(cov, var, count, self.min_periods)
+
+
+class EwmaCorrelation:
+    """
+    Exponentially weighted correlation, updated in place with every bar.
+
+    Matches pandas' ewm(alpha=..., adjust=False).cov(bias=True) and .corr() on complete data.
+    The covariance is not bias corrected; the correlation is the same either way.
+    A missing return leaves its symbol's mean and its pairs' covariances unchanged.
+
+    Args:
+        n_symbols (int): Number of return series
+        halflife (float): Bars after which a bar's weight has halved
+        min_periods (int): Shared bars a pair needs for a correlation
+    """
+
+    window = None
+
+    def __init__(self, n_symbols, halflife, min_periods=10):
+        self.halflife = halflife
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self.min_periods = max(2, min_periods)
+        self._mean = np.zeros(n_symbols)
+        self._seen = np.zeros(n_symbols, dtype=bool)
+        self._cov = np.zeros((n_symbols, n_symbols))
+        self._count = np.zeros((n_symbols, n_symbols))
+
+    def update(self, bar):
+        """
+        Adds one bar of returns.
+
+        Args:
+            bar (numpy.ndarray): Return of every symbol, NaN where a symbol has none
+        """
+        bar = np.asarray(bar, dtype=float)
+        present = np.isfinite(bar)
+        first = present & ~self._seen
+        self._mean[first] = bar[first]
+        self._seen |= present
+
+        alpha = self.alpha
+        deviation = np.where(present, bar - self._mean, 0.0)
+        pairs = np.outer(present, present)
+        updated = (1 - alpha) * (self._cov + alpha * np.outer(deviation, deviation))
+        np.copyto(self._cov, updated, where=pairs)
+        self._mean += alpha * deviation
+        self._count += pairs
+
+    def covariance(self):
+        """Exponentially weighted covariance matrix, NaN for pairs with fewer than min_periods shared bars."""
+        cov = self._cov.copy()
+        cov[self._count < self.min_periods] = np.nan
+        return cov
+
+    def correlation(self):
+        """Exponentially weighted correlation matrix, NaN for pairs with fewer than min_periods shared bars."""
+        var = np.broadcast_to(np.diag(self._cov)[:, None], self._cov.shape)
+        return _correlation_from_moments(self._cov.copy(), var, self._count, self.min_periods)
+
+
+class CorrelationHistory:
+    """
+    Read-only correlation time series recorded by a CorrelationTracker.
+
+    Attributes:
+        label (str): Name of the window, e.g. '90D'
+        symbols (list): Tracked symbols
+        dates (pandas.DatetimeIndex): Date of every recorded bar
+    """
+
+    def __init__(self, label, symbols, dates, pairs, available):
+        self.label = label
+        self.symbols = symbols
+        self.dates = dates
+        self._pairs = pairs
+        self._available = available
+        self._positions = {symbol: i for i, symbol in enumerate(symbols)}
+
+    @property
+    def empty(self):
+        return len(self.dates) == 0
+
+    def _pair_column(self, i, j):
+        # Pairs are stored in np.tril_indices(n, -1) order
+        i, j = max(i, j), min(i, j)
+        return i * (i - 1) // 2 + j
+
+    def pair(self, symbol_a, symbol_b):
+        """Correlation of two tracked symbols after every bar, as a Series indexed by date."""
+        i, j = self._positions[symbol_a], self._positions[symbol_b]
+        if i == j:
+            values = np.where(self._available[:, i], 1.0, np.nan)
+        else:
+            values = self._pairs[:, self._pair_column(i, j)].astype(float)
+        return pd.Series(values, index=self.dates, name=f"{symbol_a}/{symbol_b}")
+
+    def latest(self):
+        """Correlation matrix after the last bar."""
+        n = len(self.symbols)
+        matrix = np.full((n, n), np.nan)
+        if not self.empty:
+            rows, cols = np.tril_indices(n, -1)
+            matrix[rows, cols] = matrix[cols, rows] = self._pairs[-1]
+            matrix[np.diag_indices(n)] = np.where(self._available[-1], 1.0, np.nan)
+        return pd.DataFrame(matrix, index=self.symbols, columns=self.symbols)
+
+    def portfolio(self, weights):
+        """
+        Portfolio weighted correlation sum(w_i * w_j * C_ij) after every bar.
+
+        Symbols without a correlation yet are left out and the other weights are renormalized.
+
+        Args:
+            weights (pandas.Series): Weight of every tracked symbol
+
+        Returns:
+            pandas.Series: Weighted correlation indexed by date
+        """
+        w = weights.reindex(self.symbols).fillna(0).to_numpy(dtype=float)
+        w = np.where(self._available, w, 0.0)
+        total = w.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w = w / total
+        rows, cols = np.tril_indices(len(self.symbols), -1)
+        cross = np.nansum(w[:, rows] * w[:, cols] * self._pairs, axis=1)
+        values = (w * w).sum(axis=1) + 2 * cross
+        values[total[:, 0] <= 0] = np.nan
+        return pd.Series(values, index=self.dates, name=self.label)
+
+
+class CorrelationTracker:
+    """
+    Runs a correlation engine over a growing return history and records every bar's correlations.
+
+    Args:
+        label (str): Name of the window
+        symbols (list): Return columns to track, in order
+        engine (RollingCorrelation or EwmaCorrelation): Fresh engine sized for the symbols
+    """
+
+    def __init__(self, label, symbols, engine):
+        self.label = label
+        self.symbols = list(symbols)
+        self.engine = engine
+        n = len(self.symbols)
+        self._rows, self._cols = np.tril_indices(n, -1)
+        self._dates = []
+        self._pairs = np.empty((0, len(self._rows)), dtype=np.float32)
+        self._available = np.empty((0, n), dtype=bool)
+        self._tail = pd.DataFrame(columns=self.symbols, dtype=float) # Last bars fed, to detect revisions
+
+    def __len__(self):
+        return len(self._dates)
+
+    def _reserve(self, n_rows):
+        needed = len(self._dates) + n_rows
+        if needed > len(self._pairs):
+            capacity = max(needed, 2 * len(self._pairs), 256)
+            pairs = np.empty((capacity, self._pairs.shape[1]), dtype=np.float32)
+            available = np.empty((capacity, self._available.shape[1]), dtype=bool)
+            pairs[:len(self._dates)] = self._pairs[:len(self._dates)]
+            available[:len(self._dates)] = self._available[:len(self._dates)]
+            # Histories already handed out keep the old arrays, recorded rows are never modified
+            self._pairs, self._available = pairs, available
+
+    def can_extend(self, returns_df):
+        """
+        Whether returns_df continues the history fed so far.
+
+        False if its columns differ or any of the last bars fed was revised, in which case
+        a new tracker has to be built from the full history.
+        """
+        if list(returns_df.columns) != self.symbols:
+            return False
+        if self._tail.empty:
+            return True
+        overlap = returns_df.reindex(self._tail.index)
+        return np.array_equal(overlap.to_numpy(), self._tail.to_numpy(), equal_nan=True)
+
+    def extend(self, returns_df):
+        """
+        Feeds the bars of returns_df dated after the last bar fed.
+
+        Args:
+            returns_df (pandas.DataFrame): Date x symbol returns with the tracked columns
+
+        Returns:
+            int: Number of bars added
+        """
+        if self._dates:
+            returns_df = returns_df[returns_df.index > self._dates[-1]]
+        if returns_df.empty:
+            return 0
+
+        start = len(self._dates)
+        self._reserve(len(returns_df))
+        engine = self.engine
+        for offset, bar in enumerate(returns_df.to_numpy(dtype=float)):
+            engine.update(bar)
+            corr = engine.correlation()
+            self._pairs[start + offset] = corr[self._rows, self._cols]
+            self._available[start + offset] = np.isfinite(np.diag(corr))
+        self._dates.extend(returns_df.index)
+
+        tail_rows = engine.window or TAIL_CHECK_ROWS
+        recent = pd.concat([self._tail, returns_df]) if not self._tail.empty else returns_df
+        self._tail = recent.iloc[-tail_rows:]
+        return len(returns_df)
+
+    def history(self):
+        """Returns a CorrelationHistory of the bars fed so far. It is not affected by later extends."""
+        length = len(self._dates)
+        return CorrelationHistory(
+            self.label, self.symbols, pd.DatetimeIndex(self._dates[:length]),
+            self._pairs[:length], self._available[:length],
+        )
+
+
+def window_label(window):
+    """Display name of a rolling window in bars, e.g. '90D'."""
+    return f"{window}D"
+
+
+def ewma_label(halflife):
+    """Display name of an EWMA correlation."""
+    return f"EWMA ({halflife}D half-life)"
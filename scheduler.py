@@ -0,0 +1,96 @@
+import threading
+import time
+
+# --- Precomputed analytics ---
+# A background thread rebuilds every analytic on a fixed cadence and swaps the finished
+# snapshot in with a single reference assignment. Sessions only read the latest snapshot,
+# so page latency no longer depends on how long the analytics take to compute.
+
+
+class AnalyticsSnapshot:
+    """
+    Everything the dashboard shows, computed from one version of the data. Treat as read-only.
+
+    Attributes:
+        as_of (float): Unix time of the oldest dataset load the snapshot is based on
+        computed_at (float): Unix time the snapshot was finished
+        build_seconds (float): Time spent building it
+        warnings (list): Messages to show with the snapshot, e.g. failed refreshes
+    """
+
+    def __init__(self, as_of, warnings=None, **values):
+        self.as_of = as_of
+        self.computed_at = None
+        self.build_seconds = None
+        self.warnings = list(warnings or [])
+        self.__dict__.update(values)
+
+    def __repr__(self):
+        return f"AnalyticsSnapshot(as_of={self.as_of}, computed_at={self.computed_at})"
+
+
+class AnalyticsScheduler:
+    """
+    Rebuilds an AnalyticsSnapshot every interval seconds on a daemon thread.
+
+    Args:
+        build (callable): Returns a new AnalyticsSnapshot, raises if one cannot be built
+        interval (float): Seconds between builds
+        retry_interval (float): Seconds before retrying after a failed build
+    """
+
+    def __init__(self, build, interval=300, retry_interval=30):
+        self.build = build
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.runs = 0
+        self.failures = 0
+        self.last_error = None
+        self._snapshot = None
+        self._attempted = threading.Event() # Set once the first build has finished or failed
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="analytics-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while True:
+            built = self.run_once()
+            if self._stop.wait(self.interval if built else self.retry_interval):
+                return
+
+    def run_once(self):
+        """Builds a snapshot and publishes it. Returns False and keeps the previous one on failure."""
+        start = time.perf_counter()
+        try:
+            snapshot = self.build()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = e
+            self._attempted.set()
+            return False
+        snapshot.build_seconds = time.perf_counter() - start
+        snapshot.computed_at = time.time()
+        self.runs += 1
+        self.last_error = None
+        self._snapshot = snapshot # Readers see either the old or the new snapshot, never a mix
+        self._attempted.set()
+        return True
+
+    def latest(self, timeout=None):
+        """
+        Returns the latest snapshot, waiting for the first build if none has finished yet.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait for the first build
+
+        Returns:
+            AnalyticsSnapshot: The latest snapshot, or None if no build has succeeded yet
+        """
+        self._attempted.wait(timeout)
+        return self._snapshot
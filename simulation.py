@@ -0,0 +1,243 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# --- Monte Carlo portfolio simulation ---
+# Paths are generated in chunks on a process pool and never kept: every chunk reduces its
+# paths to a histogram of the portfolio value per step, and histograms from all chunks are
+# summed as they finish. Percentiles are read from the merged histograms at any time, so
+# a run can show partial results while it is still going and be cancelled mid-way.
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+HISTOGRAM_BINS = 4000
+HISTOGRAM_RANGE = 8.0 # Standard deviations either side of the expected log value covered by the bins
+
+
+class SimulationInputs:
+    """
+    Return model of the held assets and the value the simulation starts from.
+
+    Args:
+        mean (numpy.ndarray): Mean daily log return of every holding
+        cov (numpy.ndarray): Covariance matrix of the daily log returns
+        weights (numpy.ndarray): Current portfolio weight of every holding, summing to 1
+        initial_value (float): Portfolio value at the start, in CAD
+        symbols (list): Holding symbols, in the order of the arrays
+    """
+
+    def __init__(self, mean, cov, weights, initial_value, symbols):
+        self.mean = np.asarray(mean, dtype=float)
+        self.cov = np.asarray(cov, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.initial_value = float(initial_value)
+        self.symbols = list(symbols)
+
+    @classmethod
+    def from_returns(cls, returns_df, weights, initial_value, days=None):
+        """
+        Estimates the model from a date x symbol matrix of simple returns.
+
+        Args:
+            returns_df (pandas.DataFrame): Returns indexed by date, one column per holding
+            weights (pandas.Series): Portfolio weight per symbol
+            initial_value (float): Portfolio value at the start, in CAD
+            days (array-like, optional): Trading days each return spans, 1 for every return if not
+                given. A return over k days counts as k daily returns with k times the daily mean and
+                variance, so gaps in the dates do not inflate the daily moments.
+        """
+        log_returns = np.log1p(returns_df.to_numpy(dtype=float))
+        days = np.ones(len(log_returns)) if days is None else np.asarray(days, dtype=float)
+        mean = log_returns.sum(axis=0) / days.sum()
+        scaled = (log_returns - np.outer(days, mean)) / np.sqrt(days)[:, None]
+        return cls(
+            mean, scaled.T @ scaled / max(len(scaled) - 1, 1),
+            weights.reindex(returns_df.columns).fillna(0).to_numpy(), initial_value, returns_df.columns,
+        )
+
+    def cholesky(self):
+        """Lower triangular factor of the covariance, with a small ridge if it is only semi-definite."""
+        ridge = 0.0
+        scale = max(float(np.trace(self.cov)) / max(len(self.cov), 1), 1e-12)
+        while True:
+            try:
+                return np.linalg.cholesky(self.cov + ridge * np.eye(len(self.cov)))
+            except np.linalg.LinAlgError:
+                ridge = scale * 1e-10 if ridge == 0 else ridge * 10
+
+    def log_value_scale(self, n_steps):
+        """Per step centre and spread of the log growth of the portfolio, used to place the histogram bins."""
+        steps = np.arange(1, n_steps + 1)
+        spread = np.sqrt(steps * max(float(self.weights @ self.cov @ self.weights), 1e-12))
+        return steps * float(self.weights @ self.mean), spread
+
+
+def simulate_chunk(task):
+    """
+    Simulates one chunk of paths and reduces them to per step histograms. Runs in a worker process.
+
+    Each path holds the starting positions without rebalancing, and every step draws correlated
+    log returns for all holdings.
+
+    Args:
+        task (dict): 'cholesky', 'drift', 'start_values', 'center', 'spread', 'n_paths',
+            'n_steps' and 'seed' (numpy.random.SeedSequence)
+
+    Returns:
+        tuple: (counts, sums, n_paths) - counts is steps x (HISTOGRAM_BINS + 2) including
+            underflow and overflow bins, sums is the sum of the portfolio values per step
+    """
+    rng = np.random.default_rng(task["seed"])
+    n_paths, n_steps = task["n_paths"], task["n_steps"]
+    cholesky_t = task["cholesky"].T.astype(np.float32)
+    drift = task["drift"].astype(np.float32)
+    start_values = task["start_values"]
+    initial_value = start_values.sum()
+
+    values = np.tile(start_values.astype(np.float32), (n_paths, 1))
+    counts = np.zeros((n_steps, HISTOGRAM_BINS + 2), dtype=np.int64)
+    sums = np.zeros(n_steps)
+    bin_scale = HISTOGRAM_BINS / (2 * HISTOGRAM_RANGE)
+    for step in range(n_steps):
+        shocks = rng.standard_normal((n_paths, len(drift)), dtype=np.float32)
+        values *= np.exp(shocks @ cholesky_t + drift)
+        total = values.sum(axis=1, dtype=np.float64)
+        sums[step] = total.sum()
+
+        standardized = (np.log(total / initial_value) - task["center"][step]) / task["spread"][step]
+        bins = np.floor((standardized + HISTOGRAM_RANGE) * bin_scale).astype(np.int64) + 1
+        counts[step] = np.bincount(np.clip(bins, 0, HISTOGRAM_BINS + 1), minlength=HISTOGRAM_BINS + 2)
+    return counts, sums, n_paths
+
+
+class SimulationRun:
+    """
+    A simulation in progress. Chunks are submitted on creation and merged as they finish.
+
+    Args:
+        pool (concurrent.futures.Executor): Executor running simulate_chunk, usually a process pool
+        inputs (SimulationInputs): Return model and starting value
+        n_paths (int): Total number of paths
+        n_steps (int): Trading days to simulate
+        chunk_paths (int): Paths per chunk
+        seed (int): Seed of the run. Every chunk gets its own child seed, so results do not
+            depend on the number of workers or the order in which chunks finish.
+    """
+
+    def __init__(self, pool, inputs, n_paths=100_000, n_steps=252, chunk_paths=10_000, seed=0):
+        self.inputs = inputs
+        self.n_paths = n_paths
+        self.n_steps = n_steps
+        self.error = None
+        self.center, self.spread = inputs.log_value_scale(n_steps)
+        self._counts = np.zeros((n_steps, HISTOGRAM_BINS + 2), dtype=np.int64)
+        self._sums = np.zeros(n_steps)
+        self._paths_done = 0
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+        chunk_sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+        common = {
+            "cholesky": inputs.cholesky(),
+            "drift": inputs.mean,
+            "start_values": inputs.weights * inputs.initial_value,
+            "center": self.center,
+            "spread": self.spread,
+            "n_steps": n_steps,
+        }
+        seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+        self._futures = [pool.submit(simulate_chunk, dict(common, n_paths=size, seed=child)) for size, child in zip(chunk_sizes, seeds)]
+        for future in self._futures:
+            future.add_done_callback(self._merge)
+
+    def _merge(self, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        with self._lock:
+            if self._cancelled:
+                return
+            if error is not None:
+                self.error = error
+                return
+            counts, sums, n_paths = future.result()
+            self._counts += counts
+            self._sums += sums
+            self._paths_done += n_paths
+
+    def cancel(self):
+        """Stops the run. Chunks not started yet are dropped and results of running ones are ignored."""
+        with self._lock:
+            self._cancelled = True
+        for future in self._futures:
+            future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def done(self):
+        return all(future.done() for future in self._futures)
+
+    @property
+    def paths_done(self):
+        return self._paths_done
+
+    def progress(self):
+        """Share of the paths merged so far."""
+        return self._paths_done / self.n_paths if self.n_paths else 1.0
+
+    def _merged(self):
+        with self._lock:
+            return self._counts.copy(), self._sums.copy(), self._paths_done
+
+    def _values(self, standardized):
+        """Portfolio values for standardized log growth, per step."""
+        return self.inputs.initial_value * np.exp(self.center[:, None] + self.spread[:, None] * standardized)
+
+    def bands(self, quantiles=QUANTILES):
+        """
+        Percentiles and mean of the portfolio value after every step, from the paths merged so far.
+
+        Returns:
+            pandas.DataFrame: Indexed by trading day, with a column per quantile (e.g. '5%') and 'Mean'.
+                Empty until the first chunk has finished.
+        """
+        counts, sums, paths_done = self._merged()
+        if paths_done == 0:
+            return pd.DataFrame()
+
+        cumulative = counts.cumsum(axis=1)
+        edges = np.linspace(-HISTOGRAM_RANGE, HISTOGRAM_RANGE, HISTOGRAM_BINS + 1)
+        standardized = np.empty((self.n_steps, len(quantiles)))
+        for position, quantile in enumerate(quantiles):
+            target = quantile * paths_done
+            # Bin holding the target rank, then linear interpolation inside it
+            bins = np.array([np.searchsorted(row, target) for row in cumulative])
+            before = np.where(bins > 0, cumulative[np.arange(self.n_steps), np.maximum(bins - 1, 0)], 0)
+            in_bin = np.maximum(counts[np.arange(self.n_steps), bins], 1)
+            inner = np.clip(bins - 1, 0, HISTOGRAM_BINS - 1) # Underflow and overflow are pinned to the outer edges
+            fraction = np.where((bins >= 1) & (bins <= HISTOGRAM_BINS), (target - before) / in_bin, 0.0)
+            standardized[:, position] = edges[inner] + np.clip(fraction, 0, 1) * (edges[1] - edges[0])
+            standardized[bins > HISTOGRAM_BINS, position] = HISTOGRAM_RANGE
+
+        result = pd.DataFrame(
+            self._values(standardized),
+            index=pd.RangeIndex(1, self.n_steps + 1, name='Trading Day'),
+            columns=[f"{quantile:.0%}" for quantile in quantiles],
+        )
+        result['Mean'] = sums / paths_done
+        return result
+
+    def probability_below(self, value, step=None):
+        """Share of the merged paths whose value after step (default: the last) is below value."""
+        counts, _, paths_done = self._merged()
+        if paths_done == 0:
+            return np.nan
+        step = self.n_steps - 1 if step is None else step
+        standardized = (np.log(value / self.inputs.initial_value) - self.center[step]) / self.spread[step]
+        position = (standardized + HISTOGRAM_RANGE) * HISTOGRAM_BINS / (2 * HISTOGRAM_RANGE)
+        whole = int(np.clip(np.floor(position), 0, HISTOGRAM_BINS))
+        below = counts[step, :whole + 1].sum() + counts[step, whole + 1] * np.clip(position - whole, 0, 1)
+        return float(below / paths_done)
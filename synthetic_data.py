@@ -0,0 +1,188 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# --- Seeded synthetic API payloads ---
+# Generates data in the shapes served by /accounts/holdings and /market/data so the
+# analytics can be benchmarked and load-tested offline. The same seed and arguments
+# always produce the same payloads.
+
+BENCHMARK_SYMBOLS = ("QQQ", "VOO")
+TRADING_DAYS_PER_YEAR = 252
+DEFAULT_END_DATE = "2025-06-13"
+CAD_RATES = {"CAD": 1.0, "USD": 1.35} # Conversion used for current_market_value_CAD
+DEFAULT_CURRENCY_MIX = {"CAD": 0.5, "USD": 0.5}
+
+
+def synthetic_symbols(n_symbols):
+    """Ticker names for n_symbols holdings, e.g. SYM0007."""
+    return [f"SYM{i:04d}" for i in range(n_symbols)]
+
+
+def generate_market_history(symbols, years=1, seed=0, missing_rate=0.0, nan_rate=0.0,
+                            late_start_rate=0.1, end_date=DEFAULT_END_DATE):
+    """
+    Generates daily OHLCV bars as a random walk per symbol.
+
+    Args:
+        symbols (list): Tickers to generate, QQQ and VOO are always added
+        years (float): History length in years of trading days
+        seed (int): Seed for the random generator
+        missing_rate (float): Fraction of bars dropped entirely
+        nan_rate (float): Fraction of bars kept with NaN prices
+        late_start_rate (float): Fraction of symbols whose history starts up to a third of the way in
+        end_date (str): Last business day of the history
+
+    Returns:
+        pandas.DataFrame: Long-format 'symbol', 'date' (YYYY-MM-DD), 'open', 'high', 'low', 'close', 'volume'
+            rows sorted by symbol and date, as /market/data returns them
+    """
+    rng = np.random.default_rng(seed)
+    symbols = list(dict.fromkeys(list(symbols) + list(BENCHMARK_SYMBOLS)))
+    n_symbols = len(symbols)
+    dates = pd.bdate_range(end=end_date, periods=max(2, int(round(years * TRADING_DAYS_PER_YEAR))))
+    n_days = len(dates)
+
+    # Geometric random walk per symbol, days x symbols
+    start_prices = rng.uniform(10, 500, n_symbols)
+    volatility = rng.uniform(0.005, 0.03, n_symbols)
+    log_returns = rng.normal(0.0003, volatility, (n_days, n_symbols))
+    close = start_prices * np.exp(np.cumsum(log_returns, axis=0))
+    open_ = np.vstack([start_prices, close[:-1]]) * (1 + rng.normal(0, volatility / 4, (n_days, n_symbols)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, volatility / 2, (n_days, n_symbols))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, volatility / 2, (n_days, n_symbols))))
+    volume = rng.integers(1_000, 5_000_000, (n_days, n_symbols))
+
+    keep = rng.random((n_days, n_symbols)) >= missing_rate
+    late = (rng.random(n_symbols) < late_start_rate) & ~np.isin(symbols, BENCHMARK_SYMBOLS)
+    first_day = np.where(late, rng.integers(0, max(1, n_days // 3), n_symbols), 0)
+    keep &= np.arange(n_days)[:, None] >= first_day
+    blank = rng.random((n_days, n_symbols)) < nan_rate
+
+    # Symbol-major order, as the API groups bars by symbol
+    keep_t = keep.T
+    columns = {
+        'symbol': np.repeat(np.array(symbols, dtype=object), keep_t.sum(axis=1)),
+        'date': np.broadcast_to(dates.strftime('%Y-%m-%d').to_numpy(dtype=object), (n_symbols, n_days))[keep_t],
+    }
+    for name, values in (('open', open_), ('high', high), ('low', low), ('close', close)):
+        columns[name] = np.where(blank, np.nan, values).round(4).T[keep_t]
+    columns['volume'] = volume.T[keep_t]
+    return pd.DataFrame(columns)
+
+
+def generate_holdings(symbols, history_df=None, seed=0, currency_mix=None):
+    """
+    Generates /accounts/holdings records for the given symbols.
+
+    Args:
+        symbols (list): Held tickers
+        history_df (pandas.DataFrame, optional): History from generate_market_history. Current prices
+            are taken from each symbol's last close when given.
+        seed (int): Seed for the random generator
+        currency_mix (dict, optional): Currency -> share of holdings, e.g. {'CAD': 0.3, 'USD': 0.7}.
+            Every currency needs a rate in CAD_RATES.
+
+    Returns:
+        list: Holding dicts with the fields the dashboard reads
+    """
+    rng = np.random.default_rng(seed)
+    currency_mix = currency_mix or DEFAULT_CURRENCY_MIX
+    currencies = list(currency_mix)
+    shares = np.array([currency_mix[c] for c in currencies], dtype=float)
+
+    last_close = {}
+    if history_df is not None:
+        last_close = history_df.dropna(subset=['close']).groupby('symbol', sort=False)['close'].last().to_dict()
+
+    holdings = []
+    for symbol, currency, quantity, drift in zip(
+        symbols,
+        rng.choice(currencies, size=len(symbols), p=shares / shares.sum()),
+        rng.integers(1, 500, len(symbols)),
+        rng.normal(0, 0.005, len(symbols)),
+    ):
+        # Quotes drift a little from the last close, as an intraday price would
+        price = round(float(last_close.get(symbol, rng.uniform(10, 500))) * (1 + drift), 4)
+        market_value = price * int(quantity)
+        holdings.append({
+            "symbol": symbol,
+            "quantity": float(quantity),
+            "current_price": price,
+            "current_market_value": market_value,
+            "currency": str(currency),
+            "current_market_value_CAD": market_value * CAD_RATES[currency],
+        })
+
+    total_cad = sum(h["current_market_value_CAD"] for h in holdings) or 1.0
+    for holding in holdings:
+        holding["percentage"] = holding["current_market_value_CAD"] / total_cad * 100
+    return holdings
+
+
+def generate_portfolio_metrics(holdings, history_symbols):
+    """
+    Portfolio metrics matching the holdings, with an allocation for every symbol in the history.
+
+    Args:
+        holdings (list): Records from generate_holdings
+        history_symbols (list): Every symbol served by /market/data
+
+    Returns:
+        dict: The 'portfolio_metrics' object of /accounts/holdings
+    """
+    allocations = {h["symbol"]: h["percentage"] for h in holdings}
+    return {
+        "Total Market Value (CAD)": float(sum(h["current_market_value_CAD"] for h in holdings)),
+        "Cumulative Return": 0.1,
+        "Average Daily Return": 0.0004,
+        "Sharpe Ratio": 1.1,
+        "Symbols": list(history_symbols),
+        "Allocations": [f"{allocations.get(symbol, 0.0):.2f}%" for symbol in history_symbols],
+    }
+
+
+def generate_portfolio(n_symbols=50, years=1, seed=0, currency_mix=None, missing_rate=0.01, nan_rate=0.001):
+    """
+    Generates matching holdings, metrics and price history for one synthetic portfolio.
+
+    Returns:
+        dict: 'holdings' (list), 'metrics' (dict) and 'history' (pandas.DataFrame)
+    """
+    symbols = synthetic_symbols(n_symbols)
+    history_df = generate_market_history(symbols, years=years, seed=seed, missing_rate=missing_rate, nan_rate=nan_rate)
+    holdings = generate_holdings(symbols, history_df, seed=seed + 1, currency_mix=currency_mix)
+    metrics = generate_portfolio_metrics(holdings, history_df['symbol'].unique().tolist())
+    return {"holdings": holdings, "metrics": metrics, "history": history_df}
+
+
+def holdings_payload(portfolio):
+    """Encodes a generated portfolio as the /accounts/holdings JSON body."""
+    return json.dumps({"portfolio_holdings": portfolio["holdings"], "portfolio_metrics": portfolio["metrics"]}).encode()
+
+
+def iter_market_data_json(history_df, since=None):
+    """
+    Encodes history as the /market/data JSON body, one symbol at a time.
+
+    Args:
+        history_df (pandas.DataFrame): History from generate_market_history
+        since (str, optional): Only include bars on or after this YYYY-MM-DD date
+
+    Yields:
+        bytes: Consecutive pieces of a JSON array of {"symbol": ..., "data": [...]} objects
+    """
+    if since is not None:
+        history_df = history_df[history_df['date'] >= since]
+    yield b"["
+    for position, (symbol, bars) in enumerate(history_df.groupby('symbol', sort=False)):
+        prefix = b"," if position else b""
+        records = bars.drop(columns='symbol').to_json(orient='records', double_precision=6)
+        yield prefix + b'{"symbol": ' + json.dumps(symbol).encode() + b', "data": ' + records.encode() + b"}"
+    yield b"]"
+
+
+def market_data_payload(history_df, since=None):
+    """Encodes history as the complete /market/data JSON body."""
+    return b"".join(iter_market_data_json(history_df, since=since))
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+# The modules are flat at the repository root, and utils reads config.json from the working directory
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repo_root_cwd(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
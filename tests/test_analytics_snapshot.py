@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+import market_data
+import synthetic_data
+import utils
+from data_service import DataService
+from datasets import DatasetHandle
+
+
+@pytest.fixture
+def portfolio():
+    return synthetic_data.generate_portfolio(n_symbols=5, seed=3)
+
+
+def _service(portfolio, performance_loader):
+    service = DataService()
+    holdings = DatasetHandle("holdings", pd.DataFrame(portfolio["holdings"]))
+    service.register("holdings", lambda: (holdings, portfolio["metrics"]), ttl=60)
+    service.register("performance", performance_loader, ttl=60)
+    return service
+
+
+def test_snapshot_without_performance_data_degrades_to_warnings(monkeypatch, portfolio):
+    def failing_performance():
+        raise ConnectionError("API unavailable")
+
+    monkeypatch.setattr(utils, "get_data_service", lambda: _service(portfolio, failing_performance))
+    monkeypatch.setattr(utils, "load_exchange_rates", lambda *args, **kwargs: pd.DataFrame())
+    monkeypatch.setattr(utils, "_load_stale_performance", lambda: None)
+
+    snapshot = utils.build_analytics_snapshot()
+
+    assert snapshot.performance.empty
+    assert snapshot.warnings == ["Error fetching performance data from API: API unavailable"]
+    assert snapshot.normalized_benchmark.empty
+    assert snapshot.correlation_matrix is None
+    assert snapshot.nav_history is None
+    assert snapshot.market_values is not None and snapshot.prev_day_change is None
+
+
+def test_failing_rolling_correlation_is_reported_as_a_warning(monkeypatch, portfolio):
+    performance = DatasetHandle("performance", market_data.normalize_performance_df(portfolio["history"]))
+
+    def failing_rolling_correlations(holdings, price_panel):
+        raise ValueError("tracked symbols changed")
+
+    monkeypatch.setattr(utils, "get_data_service", lambda: _service(portfolio, lambda: performance))
+    monkeypatch.setattr(utils, "load_exchange_rates", lambda *args, **kwargs: pd.DataFrame())
+    monkeypatch.setattr(utils, "calculate_rolling_correlations", failing_rolling_correlations)
+
+    snapshot = utils.build_analytics_snapshot()
+
+    assert "Error calculating rolling correlations: tracked symbols changed" in snapshot.warnings
+    assert snapshot.rolling_correlations == {} and snapshot.rolling_portfolio_corr.empty
+    assert snapshot.correlation_matrix is not None
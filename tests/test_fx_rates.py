@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+import market_data
+import synthetic_data
+import utils
+from datasets import DatasetHandle
+from price_panel import PricePanel
+
+
+def _fake_download(first_available):
+    """Stands in for Yahoo Finance, with rates from first_available on. Records the requested starts."""
+    requests = []
+
+    def download(tickers, start=None, period=None):
+        requests.append(start)
+        dates = pd.bdate_range(max(pd.Timestamp(start), pd.Timestamp(first_available)), synthetic_data.DEFAULT_END_DATE, name='Date')
+        columns = pd.MultiIndex.from_product([utils.EXCHANGE_RATE_FIELDS, list(tickers)], names=['Field', 'Ticker'])
+        return pd.DataFrame(np.full((len(dates), len(columns)), 1.3), index=dates, columns=columns)
+
+    return download, requests
+
+
+def _portfolio(years):
+    symbols = synthetic_data.synthetic_symbols(3)
+    history_df = synthetic_data.generate_market_history(symbols, years=years, seed=8, late_start_rate=0.0)
+    holdings_df = pd.DataFrame(synthetic_data.generate_holdings(symbols, history_df, seed=9, currency_mix={"USD": 1.0}))
+    performance_df = market_data.normalize_performance_df(history_df)
+    return DatasetHandle("holdings", holdings_df), PricePanel(performance_df, fingerprint=f"fx-{years}")
+
+
+def test_fx_rates_cover_the_whole_price_history(monkeypatch, tmp_path):
+    download, requests = _fake_download("2000-01-01")
+    monkeypatch.setattr(utils, "_download_exchange_rates", download)
+    monkeypatch.setattr(utils, "PERFORMANCE_DATA_FOLDER", str(tmp_path))
+    holdings, panel = _portfolio(years=5)
+
+    fx_rates = utils.get_fx_rates(holdings, panel)
+
+    first_price_date = panel.closes.index.min()
+    assert requests == [f"{first_price_date:%Y-%m-%d}"]
+    assert fx_rates.first_date("USD") <= first_price_date + pd.Timedelta(days=7)
+    assert utils._fx_coverage_warnings(holdings, panel, fx_rates) == []
+
+
+def test_rates_starting_after_the_price_history_are_reported(monkeypatch, tmp_path):
+    download, _ = _fake_download("2024-01-02")
+    monkeypatch.setattr(utils, "_download_exchange_rates", download)
+    monkeypatch.setattr(utils, "PERFORMANCE_DATA_FOLDER", str(tmp_path))
+    holdings, panel = _portfolio(years=3)
+
+    fx_rates = utils.get_fx_rates(holdings, panel)
+
+    assert utils._fx_coverage_warnings(holdings, panel, fx_rates) == [
+        "USD exchange rates start on 2024-01-02, values before then are converted at that day's rate."
+    ]
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import market_data
+import synthetic_data
+import utils
+from datasets import DatasetHandle
+from price_panel import PricePanel
+
+
+@pytest.fixture
+def stale_quotes():
+    """History and holdings whose quotes are still yesterday's last close."""
+    symbols = synthetic_data.synthetic_symbols(4)
+    history_df = synthetic_data.generate_market_history(symbols, years=1, seed=5, late_start_rate=0.0)
+    holdings_df = pd.DataFrame(synthetic_data.generate_holdings(symbols, history_df, seed=6, currency_mix={"CAD": 1.0}))
+    last_close = history_df.groupby('symbol')['close'].last()
+    holdings_df['current_price'] = holdings_df['symbol'].map(last_close).astype(float)
+    holdings_df['current_market_value'] = holdings_df['current_price'] * holdings_df['quantity']
+    holdings_df['current_market_value_CAD'] = holdings_df['current_market_value']
+    return history_df, DatasetHandle("holdings", holdings_df)
+
+
+@pytest.mark.parametrize("downcast", [False, True])
+def test_stale_quote_is_compared_with_the_previous_close(stale_quotes, downcast):
+    history_df, holdings = stale_quotes
+    performance_df = market_data.normalize_performance_df(history_df, downcast=downcast)
+    panel = PricePanel(performance_df, fingerprint=f"stale-quotes-{downcast}")
+
+    result_df, prev_day_change = utils.calculate_market_value_changes(holdings, panel)
+
+    closes = history_df.pivot(index='date', columns='symbol', values='close')
+    expected = (closes.iloc[-1] / closes.iloc[-2] - 1).reindex(holdings.data['symbol']).to_numpy()
+    np.testing.assert_allclose(result_df['Market Value 1 Day (%)'], expected, rtol=1e-4)
+
+    previous_value = (closes.iloc[-2].reindex(holdings.data['symbol']).to_numpy() * holdings.data['quantity']).sum()
+    assert prev_day_change == pytest.approx(holdings.data['current_market_value_CAD'].sum() / previous_value - 1, rel=1e-4)
@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+
+from rolling_correlation import CorrelationTracker, RollingCorrelation
+
+
+def test_extend_counts_only_new_bars():
+    dates = pd.bdate_range("2025-01-01", periods=100)
+    returns_df = pd.DataFrame(np.random.default_rng(0).normal(0, 0.01, (100, 3)), index=dates, columns=["A", "B", "C"])
+    tracker = CorrelationTracker("30D", list(returns_df.columns), RollingCorrelation(3, 30))
+
+    assert tracker.extend(returns_df.iloc[:50]) == 50
+    assert tracker.can_extend(returns_df)
+    assert tracker.extend(returns_df) == 50
+    assert tracker.extend(returns_df) == 0
+    assert len(tracker) == 100
@@ -1,11 +1,29 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
+import numpy as np
 import streamlit as st
 import json
 import os
 import re
+import time
 from datetime import datetime
 
+import market_data
+from data_service import DataService
+from scheduler import AnalyticsScheduler, AnalyticsSnapshot
+from datasets import DatasetHandle
+from price_panel import PricePanel, analytics_cache, build_price_matrix, get_price_panel
+from holdings_store import get_holdings_store, get_symbol_history
+from fx import FxRates, implied_rates
+from nav import NavHistory
+from risk import risk_metrics
+from simulation import SimulationInputs
+from downsampling import AUTO_RESOLUTION, FULL_RESOLUTION, bars_for_range, lttb
+from rolling_correlation import CorrelationTracker, EwmaCorrelation, RollingCorrelation, ewma_label, window_label
+from live_quotes import QuoteConsumer, QuoteStore
+
 # --- Configuration Loading ---
 def load_config():
     """Loads configuration from config.json."""
@@ -22,341 +40,945 @@ def load_config():
 config = load_config()
 API_URL = config.get("API_URL")
 PERFORMANCE_DATA_FOLDER = config.get("PERFORMANCE_DATA_FOLDER")
+PERFORMANCE_CACHE_TTL = config.get("PERFORMANCE_CACHE_TTL", 3600) # Seconds before the local history store is refreshed
+PERFORMANCE_FULL_SYNC_INTERVAL = config.get("PERFORMANCE_FULL_SYNC_INTERVAL", 86400) # Seconds between full re-syncs that pick up revisions
+MARKET_DATA_SINCE_PARAM = config.get("MARKET_DATA_SINCE_PARAM", "start_date") # Query parameter used to request only newer bars
+PERFORMANCE_DOWNCAST = config.get("PERFORMANCE_DOWNCAST", False) # Store prices as float32 and volume as int32
+HTTP_TIMEOUT = config.get("HTTP_TIMEOUT", [5, 60]) # Seconds, either one value or [connect, read]
+HTTP_RETRIES = config.get("HTTP_RETRIES", 3)
+HTTP_BACKOFF = config.get("HTTP_BACKOFF", 0.5) # Retry delays grow as backoff * 2 ** attempt
+ANALYTICS_CACHE_ENTRIES = config.get("ANALYTICS_CACHE_ENTRIES", 16) # Results kept per analytic before LRU eviction
+HOLDINGS_CACHE_TTL = config.get("HOLDINGS_CACHE_TTL", 300) # Seconds before holdings are refreshed in the background
+DATA_SERVICE_ERROR_TTL = config.get("DATA_SERVICE_ERROR_TTL", 30) # Seconds before a failed API load is retried
+ANALYTICS_REFRESH_INTERVAL = config.get("ANALYTICS_REFRESH_INTERVAL", 300) # Seconds between precomputed analytics snapshots
+HEATMAP_ANNOTATION_LIMIT = config.get("HEATMAP_ANNOTATION_LIMIT", 40) # Assets above which the correlation heatmap switches to Plotly
+ROLLING_CORRELATION_WINDOWS = config.get("ROLLING_CORRELATION_WINDOWS", [30, 90, 252]) # Trading days per rolling correlation window
+ROLLING_CORRELATION_HALFLIFE = config.get("ROLLING_CORRELATION_HALFLIFE", 30) # Trading days, for the EWMA correlation
+ROLLING_CORRELATION_SYMBOLS = config.get("ROLLING_CORRELATION_SYMBOLS", 50) # Largest holdings with rolling pair correlations
+RISK_CONFIDENCE_LEVEL = config.get("RISK_CONFIDENCE_LEVEL", 0.95) # Confidence level of the VaR and CVaR figures
+SIMULATION_WORKERS = config.get("SIMULATION_WORKERS") # Processes generating Monte Carlo paths, defaults to the CPU count
+SIMULATION_CHUNK_PATHS = config.get("SIMULATION_CHUNK_PATHS", 10000) # Paths per chunk, bounds the memory of a worker
+CHART_MAX_POINTS = config.get("CHART_MAX_POINTS", 1000) # Most candles or line points sent to the browser per chart
+LIVE_QUOTES_URL = config.get("LIVE_QUOTES_URL") # Server-sent events feed of price ticks, live quotes are unavailable without it
+LIVE_QUOTES_REFRESH = config.get("LIVE_QUOTES_REFRESH", 2) # Seconds between live updates of the holdings table
+
+# Define currency pairs and their tickers
+CURRENCY_PAIRS = {
+    "USD/CAD": "CAD=X",  # Canadian Dollar to US Dollar
+    "CAD/CNY": "CADCNY=X",  # Canadian Dollar to Chinese Yuan
+    "USD/CNY": "CNY=X",  # US Dollar to Chinese Yuan
+    "BTC/USD": "BTC-USD",  # US Dollar to Bitcoin
+}
+
+
+@st.cache_resource
+def get_http_session():
+    """
+    Returns the process-wide HTTP session used for all API calls.
+    
+    The session keeps connections to the API alive between requests and retries
+    connection errors and 429/5xx responses with exponential backoff.
+    """
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _http_get(path, **kwargs):
+    """GET an API path through the shared session with the configured timeout."""
+    timeout = tuple(HTTP_TIMEOUT) if isinstance(HTTP_TIMEOUT, list) else HTTP_TIMEOUT
+    return get_http_session().get(f"{API_URL}{path}", timeout=timeout, **kwargs)
+
+
+def _fetch_holdings():
+    """
+    Fetches portfolio data from the Questrade API endpoint.
+    
+    Raises on any failure instead of returning a placeholder, so the data service keeps
+    serving the previous holdings when a refresh fails.
+    
+    Returns:
+        tuple: (DatasetHandle of the holdings DataFrame, portfolio metrics dict)
+    """
+    if not API_URL:
+        raise ValueError("API_URL is not configured in config.json.")
+    response = _http_get("/accounts/holdings")
+    response.raise_for_status()  # Raises an HTTPError for bad responses (4XX or 5XX)
+    data = response.json()
+    # Basic validation of the expected structure
+    if "portfolio_holdings" not in data or "portfolio_metrics" not in data:
+        raise ValueError("Portfolio data from API is not in the expected format.")
+    return DatasetHandle("holdings", pd.DataFrame(data["portfolio_holdings"])), data["portfolio_metrics"]
+
 
-@st.cache_data(ttl=300) # Cache data for 5 minutes
 def fetch_portfolio_data():
-    """Fetches portfolio data from the Questrade API endpoint."""
+    """
+    Returns the portfolio holdings and metrics shared by all sessions.
+    
+    Served by the data service, refreshed in the background every HOLDINGS_CACHE_TTL seconds.
+    
+    Returns:
+        tuple: (DatasetHandle of the holdings DataFrame, portfolio metrics dict), or (None, None) on failure
+    """
     try:
-        if not API_URL:
-            st.error("API_URL is not configured in config.json.")
-            return None, None
-        response = requests.get(f"{API_URL}/accounts/holdings")
-        response.raise_for_status()  # Raises an HTTPError for bad responses (4XX or 5XX)
-        data = response.json()
-        # Basic validation of the expected structure
-        if "portfolio_holdings" not in data or "portfolio_metrics" not in data:
-            st.error("Portfolio data from API is not in the expected format.")
-            return None, None
-        return data["portfolio_holdings"], data["portfolio_metrics"]
+        holdings = get_data_service().get("holdings")
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching portfolio data from API: {e}")
         return None, None
     except json.JSONDecodeError:
         st.error("Error decoding JSON response from API.")
         return None, None
+    except ValueError as e:
+        st.error(str(e))
+        return None, None
+    _warn_if_refresh_failed("holdings", "portfolio data")
+    return holdings
 
 
-@st.cache_data(ttl=3600) # Cache data for 6 hours
-def load_performance():
-    """Fetches performance data from API and converts to pandas DataFrame."""
-    try:
-        if not API_URL:
-            st.error("API_URL is not configured in config.json.")
-            return pd.DataFrame(), None
-        
-        response = requests.get(f"{API_URL}/market/data")
+def _fetch_market_data(params=None):
+    """Streams /market/data into a typed DataFrame with one row per symbol and bar."""
+    with _http_get("/market/data", params=params, stream=True) as response:
         response.raise_for_status()  # Raises an HTTPError for bad responses (4XX or 5XX)
-        
-        # Convert the JSON response to a pandas DataFrame
-        data = response.json()
-        df = pd.DataFrame(data)
-        
-        # Explode the 'data' column to create a row for each item in the list
-        df = df.explode('data')
-        
-        # Extract the symbol before normalizing
-        symbols = df['symbol'].reset_index(drop=True)
-        
-        # Normalize the nested JSON in the 'data' column
-        normalized_data = pd.json_normalize(df['data'])
-        
-        # Add the symbol column back to the normalized data
-        result_df = pd.concat([symbols, normalized_data], axis=1)
+        size_hint = int(response.headers.get('Content-Length') or 0)
+        return market_data.parse_market_data_stream(response.iter_content(chunk_size=1 << 16), size_hint=size_hint)
+
+
+def _sync_performance_history(folder):
+    """
+    Brings the local store up to date and returns the full history.
+    
+    Only bars since the last stored date are requested. If the API ignores the since
+    parameter, or a periodic full sync is due, the full response is diffed against the
+    store instead, so backfills and revisions still land without rewriting unchanged rows.
+    """
+    manifest = market_data.read_manifest(folder)
+    since = market_data.sync_start_date(manifest)
+    full_sync_due = time.time() - manifest.get("full_synced_at", 0) > PERFORMANCE_FULL_SYNC_INTERVAL
+    
+    update_df = _fetch_market_data(None if full_sync_due else {MARKET_DATA_SINCE_PARAM: since})
+    full_response = full_sync_due or market_data.is_full_response(update_df, since)
+    market_data.upsert_history(folder, update_df, full_response=full_response)
+    return market_data.load_history(folder)
 
-        return result_df  # Return DataFrame and None instead of file path
+
+def load_performance():
+    """
+    Loads performance data as a DatasetHandle wrapping a pandas DataFrame.
+    
+    History is served from the local store in PERFORMANCE_DATA_FOLDER while it is younger than
+    PERFORMANCE_CACHE_TTL, so restarts do not re-download and re-parse the full JSON payload.
+    Once it expires, only the bars added since the last sync are fetched and merged in.
+    
+    The result is normalized once, fingerprinted once, and shared read-only between sessions
+    and analytics through the data service, which refreshes it in the background.
+    """
+    try:
+        performance = get_data_service().get("performance")
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching performance data from API: {e}")
-        return pd.DataFrame()
+        return _stale_performance()
     except json.JSONDecodeError:
         st.error("Error decoding JSON response from API.")
-        return pd.DataFrame()
+        return _stale_performance()
     except Exception as e:
         st.error(f"Unexpected error loading performance data: {e}")
+        return DatasetHandle("performance", pd.DataFrame())
+    _warn_if_refresh_failed("performance", "performance data")
+    return performance
+
+
+def _load_performance_dataset():
+    """Data service loader: the normalized performance history."""
+    performance_df = market_data.normalize_performance_df(_load_performance_history(), downcast=PERFORMANCE_DOWNCAST)
+    return DatasetHandle("performance", performance_df)
+
+
+def _load_performance_history():
+    """Returns the raw performance history from the local store or the API. Raises if neither has it."""
+    has_store = False
+    if PERFORMANCE_DATA_FOLDER:
+        try:
+            cached_df = market_data.load_history(PERFORMANCE_DATA_FOLDER, max_age=PERFORMANCE_CACHE_TTL)
+            if cached_df is not None:
+                return cached_df
+            has_store = bool((market_data.read_manifest(PERFORMANCE_DATA_FOLDER) or {}).get("partitions"))
+        except Exception as e:
+            get_data_service().warn(f"Could not read local performance store, fetched from API instead: {e}")
+
+    if not API_URL:
+        raise ValueError("API_URL is not configured in config.json.")
+    
+    if has_store:
+        try:
+            return _sync_performance_history(PERFORMANCE_DATA_FOLDER)
+        except (KeyError, ValueError, OSError) as e:
+            # A corrupt or incompatible store is rebuilt from a full download below
+            if isinstance(e, requests.exceptions.RequestException):
+                raise
+            get_data_service().warn(f"Incremental sync failed, re-downloaded full history: {e}")
+    
+    result_df = _fetch_market_data()
+
+    if PERFORMANCE_DATA_FOLDER:
+        try:
+            market_data.save_history(PERFORMANCE_DATA_FOLDER, result_df)
+        except Exception as e:
+            get_data_service().warn(f"Could not write local performance store: {e}")
+
+    return result_df
+
+
+@st.cache_resource(ttl=60)
+def _load_stale_performance():
+    """Falls back to the local store regardless of its age when the API is unavailable."""
+    if PERFORMANCE_DATA_FOLDER:
+        try:
+            stale_df = market_data.load_history(PERFORMANCE_DATA_FOLDER)
+            if stale_df is not None:
+                return DatasetHandle("performance", market_data.normalize_performance_df(stale_df, downcast=PERFORMANCE_DOWNCAST))
+        except Exception:
+            pass
+    return None
+
+
+def _stale_performance():
+    """The stale local store as a handle, or an empty one, for when the API load failed."""
+    stale = _load_stale_performance()
+    if stale is None:
+        return DatasetHandle("performance", pd.DataFrame())
+    st.warning("Showing performance data from the local store, which may be out of date.")
+    return stale
+
+
+# --- Shared data service ---
+
+@st.cache_resource
+def get_data_service():
+    """
+    Returns the process-wide DataService holding the API datasets for every session.
+    
+    Concurrent sessions share one in-flight fetch per dataset, and expired data keeps being
+    served while a background refresh replaces it.
+    """
+    service = DataService(error_ttl=DATA_SERVICE_ERROR_TTL)
+    service.register("holdings", _fetch_holdings, ttl=HOLDINGS_CACHE_TTL)
+    service.register("performance", _load_performance_dataset, ttl=PERFORMANCE_CACHE_TTL)
+    return service
+
+
+def _refresh_failure_message(name, label):
+    """Describes why expired data is being shown, or returns None if its last refresh succeeded."""
+    status = get_data_service().status(name)
+    if status["stale"] and status["last_error"] is not None:
+        loaded_at = datetime.fromtimestamp(status["loaded_at"]).strftime("%Y-%m-%d %H:%M")
+        return f"Showing {label} from {loaded_at}, the latest refresh failed: {status['last_error']}"
+    return None
+
+
+def _warn_if_refresh_failed(name, label):
+    """Tells the user when expired data is shown because its background refresh failed."""
+    message = _refresh_failure_message(name, label)
+    if message:
+        st.warning(message)
+
+
+EXCHANGE_RATE_FIELDS = ['Open', 'High', 'Low', 'Close']
+EXCHANGE_RATE_TABLE = "exchange_rates"
+# Problems of the latest uncached load_exchange_rates run. It runs on the scheduler thread,
+# so they are shown through the analytics snapshot instead of st.warning
+exchange_rate_warnings = []
+
+
+def _period_offset(period):
+    """Converts a Yahoo Finance period such as '5d', '6mo' or '1y' to a DateOffset."""
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    return {
+        'd': pd.DateOffset(days=count),
+        'wk': pd.DateOffset(weeks=count),
+        'mo': pd.DateOffset(months=count),
+        'y': pd.DateOffset(years=count),
+    }[unit]
+
+
+def _download_exchange_rates(tickers, **kwargs):
+    """Downloads all tickers in one batched request as a wide (field, ticker) frame."""
+    import yfinance as yf
+    data = yf.download(list(tickers), progress=False, group_by='column', **kwargs)
+    if data.empty:
         return pd.DataFrame()
+    if not isinstance(data.columns, pd.MultiIndex):
+        # Older yfinance releases return flat columns for a single ticker
+        data.columns = pd.MultiIndex.from_product([data.columns, list(tickers)])
+    data = data.loc[:, data.columns.get_level_values(0).isin(EXCHANGE_RATE_FIELDS)]
+    data.columns = data.columns.set_names(['Field', 'Ticker'])
+    data.index = pd.DatetimeIndex(data.index).tz_localize(None).rename('Date')
+    return data
 
 
-@st.cache_data(ttl=3600)
-def calculate_portfolio_correlation(holdings_df, performance_df):
+@st.cache_data(ttl=86400)  # Cache for 1 day
+def load_exchange_rates(tickers=tuple(CURRENCY_PAIRS.values()), period="1y", start=None):
     """
-    Calculate the weighted correlation matrix for stocks in the portfolio.
+    Load exchange rate history for all currency pairs in one batched Yahoo Finance request.
     
-    Args:
-        holdings_df (pandas.DataFrame): DataFrame with portfolio holdings including percentage weights
-        performance_df (pandas.DataFrame): DataFrame with historical price data
+    When a previous download is kept in PERFORMANCE_DATA_FOLDER and reaches back far enough,
+    only the days since its last date are requested and appended, so the daily refresh does
+    not re-download the full history.
     
+    Args:
+        tickers (tuple): Yahoo Finance ticker symbols for the exchange rate pairs
+        period (str): Time period for data retrieval (default: 1 year)
+        start (str, optional): First date to retrieve, 'YYYY-MM-DD'. Overrides period.
+        
     Returns:
-        tuple: (correlation_matrix, weighted_correlation_matrix, portfolio_weighted_correlation)
+        pandas.DataFrame: Wide frame indexed by Date with (Field, Ticker) columns
     """
+    exchange_rate_warnings.clear()
+    first_date = pd.Timestamp(start) if start is not None else None
     try:
-        if performance_df.empty or holdings_df.empty:
-            # st.warning("Empty performance or holdings data. Cannot calculate portfolio correlation.")
-            return None, None, None
-
-        # Ensure date column is in datetime format
-        performance_df['date'] = pd.to_datetime(performance_df['date'])
-        
-        # Filter performance data for the last year
-        current_date = performance_df['date'].max()
-        one_year_ago = current_date - pd.DateOffset(years=1)
-        yearly_perf_df = performance_df[performance_df['date'] >= one_year_ago]
-        
-        # Get portfolio symbols from holdings
-        portfolio_symbols = holdings_df['symbol'].unique().tolist()
+        stored = None
+        if PERFORMANCE_DATA_FOLDER:
+            stored = market_data.load_table(PERFORMANCE_DATA_FOLDER, EXCHANGE_RATE_TABLE)
         
-        # Filter for symbols in both the holdings and performance data
-        valid_symbols = [symbol for symbol in portfolio_symbols if symbol in yearly_perf_df['symbol'].values]
-        
-        if len(valid_symbols) < 2:
-            # st.warning("Need at least 2 valid symbols with performance data to calculate correlations.")
-            return None, None, None
-            
-        # Create a price DataFrame with dates as index and symbols as columns
-        price_data = {}
-        common_dates = None
-        
-        for symbol in valid_symbols:
-            symbol_data = yearly_perf_df[yearly_perf_df['symbol'] == symbol]
-            price_series = symbol_data.set_index('date')['close']
-            price_data[symbol] = price_series
-            
-            if common_dates is None:
-                common_dates = set(price_series.index)
-            else:
-                common_dates = common_dates.intersection(set(price_series.index))
-        
-        # Only use dates common to all symbols
-        common_dates = sorted(list(common_dates))
-        if len(common_dates) < 30:  # Require at least 30 days of common data
-            # st.warning(f"Insufficient common price data across all symbols (only {len(common_dates)} days).")
-            return None, None, None
-            
-        # Create the price DataFrame
-        price_df = pd.DataFrame(index=common_dates)
-        for symbol in valid_symbols:
-            price_df[symbol] = price_data[symbol].reindex(common_dates)
-        
-        # Calculate daily returns (percentage change)
-        returns_df = price_df.pct_change().dropna()
-        
-        # Calculate the correlation matrix
-        correlation_matrix = returns_df.corr()
-        
-        # Get weights for each symbol
-        weights = {}
-        total_weight = 0
-        for symbol in valid_symbols:
-            symbol_row = holdings_df[holdings_df['symbol'] == symbol].iloc[0]
-            weight = float(symbol_row['percentage']) if isinstance(symbol_row['percentage'], str) else float(symbol_row.get('percentage', 0))
-            weights[symbol] = weight / 100  # Convert from percentage to decimal
-            total_weight += weight / 100
-        
-        # Normalize weights to sum to 1.0 (in case some symbols were excluded)
-        if total_weight > 0:
-            for symbol in weights:
-                weights[symbol] /= total_weight
+        # A week of slack, the requested start may fall on a weekend or holiday
+        if (stored is not None and not stored.empty and set(tickers) <= set(stored['Ticker'])
+                and (first_date is None or stored['Date'].min() <= first_date + pd.Timedelta(days=7))):
+            # Re-request the last stored day as well, it may have been a partial bar
+            stored = stored.pivot(index='Date', columns='Ticker', values=EXCHANGE_RATE_FIELDS)
+            stored.columns = stored.columns.set_names(['Field', 'Ticker'])
+            update = _download_exchange_rates(tickers, start=stored.index.max().strftime('%Y-%m-%d'))
+            data = pd.concat([stored, update]) if not update.empty else stored
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+        elif start is not None:
+            data = _download_exchange_rates(tickers, start=start)
+        else:
+            data = _download_exchange_rates(tickers, period=period)
         
-        # Calculate the weighted correlation matrix
-        weighted_corr_matrix = pd.DataFrame(0.0, index=valid_symbols, columns=valid_symbols)
-        for i in valid_symbols:
-            for j in valid_symbols:
-                weighted_corr_matrix.at[i, j] = correlation_matrix.at[i, j] * weights[i] * weights[j]
+        if data.empty:
+            return data
         
-        # Calculate portfolio weighted correlation (sum all weighted correlations)
-        portfolio_weighted_corr = weighted_corr_matrix.values.sum()
+        # The whole history is kept, so a longer request after a shorter one does not download it again
+        if PERFORMANCE_DATA_FOLDER:
+            try:
+                long_df = data.stack('Ticker', future_stack=True).reset_index()
+                market_data.save_table(PERFORMANCE_DATA_FOLDER, EXCHANGE_RATE_TABLE, long_df)
+            except Exception as e:
+                exchange_rate_warnings.append(f"Could not store exchange rate data: {e}")
+        if first_date is None:
+            first_date = data.index.max() - _period_offset(period)
+        return data[data.index >= first_date]
+    except Exception as e:
+        exchange_rate_warnings.append(f"Error loading exchange rate data: {e}")
+        return pd.DataFrame()
+
+
+def load_exchange_rate_data(ticker, period="1y"):
+    """
+    Slice one pair out of the batched exchange rate frame and process it for visualization.
+    
+    Args:
+        ticker (str): Yahoo Finance ticker symbol for the exchange rate pair
+        period (str): Time period for data retrieval (default: 1 year)
         
-        return correlation_matrix, weighted_corr_matrix, portfolio_weighted_corr
+    Returns:
+        pandas.DataFrame: Processed exchange rate data with simple column structure
+    """
+    rates = load_exchange_rates(period=period)
+    if rates.empty or ('Close', ticker) not in rates.columns:
+        return pd.DataFrame()
+    
+    pair_df = rates.xs(ticker, axis=1, level='Ticker').dropna(subset=['Close'])
+    
+    # Create a clean DataFrame with the columns we need
+    processed_df = pd.DataFrame({'Date': pair_df.index})
+    for col_name in ['Close', 'Open', 'High', 'Low']:
+        if col_name in pair_df.columns:
+            processed_df[col_name] = pair_df[col_name].to_numpy()
+    
+    # Calculate daily change
+    processed_df['Daily Change %'] = processed_df['Close'].pct_change() * 100
+    
+    return processed_df
+
+
+def _implied_fx_rates(store):
+    """Today's CAD rates implied by the holdings' own market values."""
+    return implied_rates(store.currency, store.market_value, store.market_value_cad)
+
+
+def get_fx_rates(holdings, price_panel):
+    """
+    Dated CAD rates of the held currencies from the batched exchange rate download, anchored
+    to today's rates implied by the holdings. Currencies without history use today's rate.
+    
+    Args:
+        holdings (DatasetHandle): Portfolio holdings including currencies and CAD market values
+        price_panel (PricePanel): Price history the rates are needed for, from its first date
+    
+    Returns:
+        FxRates: Rates to convert values in any held currency to CAD
+    """
+    start = None if price_panel.empty else price_panel.closes.index.min().strftime('%Y-%m-%d')
+    return FxRates.from_exchange_rates(load_exchange_rates(start=start), current=_implied_fx_rates(get_holdings_store(holdings)))
+
+
+def _fx_coverage_warnings(holdings, price_panel, fx_rates):
+    """Names the held currencies whose rates start after the price history, earlier dates use their first rate."""
+    if price_panel.empty:
+        return []
+    first_price_date = price_panel.closes.index.min()
+    warnings = []
+    for currency in pd.unique(get_holdings_store(holdings).currency):
+        first_rate_date = fx_rates.first_date(currency)
+        if first_rate_date is not None and first_rate_date > first_price_date + pd.Timedelta(days=7):
+            warnings.append(
+                f"{currency} exchange rates start on {first_rate_date:%Y-%m-%d}, values before then "
+                f"are converted at that day's rate."
+            )
+    return warnings
+
+
+# Lookback in calendar days for each market value change column
+MARKET_VALUE_HORIZONS = {
+    'Market Value 1 Day (%)': 1,
+    'Market Value 1 WK (%)': 7,
+    'Market Value 1 Month (%)': 30,
+    'Market Value 6 Months (%)': 180,
+    # Only substruct 360 days to prevent None return in previous Year
+    'Market Value 1 Year (%)': 360,
+}
+
+
+def _portfolio_prices(holdings, price_panel):
+    """
+    Close matrix the correlation and risk analytics share: the last year of the held symbols,
+    on the dates common to all of them.
+    
+    Returns:
+        pandas.DataFrame: Date x symbol closes, or None with fewer than 2 symbols or 30 common dates
+    """
+    # Get portfolio symbols from holdings
+    portfolio_symbols = get_holdings_store(holdings).unique_symbols()
+    
+    # Price matrix for the last year, restricted to symbols in both the holdings and performance data
+    # and to dates common to all of those symbols
+    price_df, _ = price_panel.select(symbols=portfolio_symbols, lookback=pd.DateOffset(years=1), common_dates_only=True)
+    
+    if len(price_df.columns) < 2:
+        # st.warning("Need at least 2 valid symbols with performance data to calculate correlations.")
+        return None
         
-    except Exception as e:
-        st.error(f"Error calculating portfolio correlation: {e}")
-        import traceback
-        st.error(traceback.format_exc())
+    if len(price_df) < 30:  # Require at least 30 days of common data
+        # st.warning(f"Insufficient common price data across all symbols (only {len(price_df)} days).")
+        return None
+    return price_df
+
+@analytics_cache(ttl=3600, max_entries=ANALYTICS_CACHE_ENTRIES)
+def calculate_portfolio_correlation(holdings, price_panel):
+    """
+    Calculate the weighted correlation matrix for stocks in the portfolio.
+    
+    Args:
+        holdings (DatasetHandle): Portfolio holdings including percentage weights
+        price_panel (PricePanel): Shared price panel built from the historical price data
+    
+    Returns:
+        tuple: (correlation_matrix, weighted_correlation_matrix, portfolio_weighted_correlation)
+    """
+    holdings_df = holdings.data
+    if price_panel.empty or holdings_df.empty:
+        # st.warning("Empty performance or holdings data. Cannot calculate portfolio correlation.")
         return None, None, None
 
-@st.cache_data(ttl=3600)
-def calculate_market_value_changes(holdings_df, performance_df):
+    price_df = _portfolio_prices(holdings, price_panel)
+    if price_df is None:
+        return None, None, None
+    valid_symbols = price_df.columns.tolist()
+    
+    # Calculate daily returns (percentage change)
+    returns_df = price_df.pct_change().dropna()
+    
+    # Calculate the correlation matrix
+    correlation_matrix = returns_df.corr()
+    
+    # Weights summing to 1.0 over the valid symbols
+    weights = get_holdings_store(holdings).weights(valid_symbols).to_numpy()
+    
+    # Calculate the weighted correlation matrix as w w^T * C
+    weighted_corr_matrix = pd.DataFrame(np.outer(weights, weights) * correlation_matrix.to_numpy(), index=valid_symbols, columns=valid_symbols)
+    
+    # Calculate portfolio weighted correlation (sum all weighted correlations)
+    portfolio_weighted_corr = weighted_corr_matrix.values.sum()
+    
+    return correlation_matrix, weighted_corr_matrix, portfolio_weighted_corr
+
+@analytics_cache(ttl=3600, max_entries=ANALYTICS_CACHE_ENTRIES)
+def calculate_market_value_changes(holdings, price_panel, horizons=None, fx_rates=None):
     """
     Calculate market value changes for different time periods and add them as columns to holdings_df.
     
+    All horizons are resolved in one vectorized pass over a date x symbol close matrix
+    instead of filtering performance_df once per holding.
+    
     Args:
-        holdings_df (pandas.DataFrame): DataFrame with portfolio holdings including quantity and market value
-        performance_df (pandas.DataFrame): DataFrame with historical price data
+        holdings (DatasetHandle): Portfolio holdings including quantity and market value
+        price_panel (PricePanel): Shared price panel built from the historical price data
+        horizons (dict, optional): Mapping of output column name to lookback in calendar days.
+            Defaults to MARKET_VALUE_HORIZONS. The 1 day horizon also drives the portfolio change.
+        fx_rates (FxRates, optional): CAD rates used to convert past market values at the rate
+            of their date. Defaults to the rates implied by the holdings, constant over time.
     
     Returns:
         tuple: (updated holdings_df with new columns, previous_day_change_percentage as float)
     """
-    try:
-        if holdings_df.empty or performance_df.empty:
-            # st.warning("Empty holdings or performance data. Cannot calculate market value changes.")
-            return holdings_df.copy(), None
-        
-        # Make a copy of the holdings dataframe to avoid modifying the original
-        result_df = holdings_df.copy()
-        
-        # Ensure date column is datetime
-        performance_df['date'] = pd.to_datetime(performance_df['date'])
-        
-        # Simply use the most recent date in the performance data as our reference point
-        # This is the most reliable approach since market data might have delays
-        latest_date = performance_df['date'].max()
-        
-        # Print the reference date (can be seen when running outside of Streamlit)
-        print(f"Using {latest_date} as reference date for market value calculations")
-
-        # Calculate target dates for different time periods
-        prev_day_target = latest_date - pd.Timedelta(days=1)  # Previous transaction day
-        week_target = latest_date - pd.Timedelta(days=7)      # 1 week ago
-        month_target = latest_date - pd.Timedelta(days=30)    # 1 month ago
-        six_month_target = latest_date - pd.Timedelta(days=180)  # 6 months ago
-        # Only substruct 360 days to prevent None return in previous Year
-        year_target = latest_date - pd.Timedelta(days=360)    # 1 year ago
-        
-        # Dictionary to store previous transaction day's total market value (CAD)
-        prev_day_market_value_cad = 0.0
-        current_day_market_value_cad = 0.0
-        cad_exchange_sample = result_df[result_df['currency'] == 'USD'].sample(1)
-        cad_exchange_rate = cad_exchange_sample['current_market_value_CAD']/cad_exchange_sample['current_market_value']
-        cad_exchange_rate = float(cad_exchange_rate.iloc[0])
-
-        # Process each symbol in the holdings
-        for idx, row in result_df.iterrows():
-            symbol = row['symbol']
-            quantity = float(row['quantity'])
-
-            currency = row['currency']
-            current_price = float(row['current_price'])
-            current_market_value_local = float(row['current_market_value'])
-            current_market_value_cad = float(row['current_market_value_CAD'])
-            
-            # Add current market value (CAD) to total
-            current_day_market_value_cad += current_market_value_cad
-            
-            # Filter performance data for this symbol
-            symbol_perf = performance_df[performance_df['symbol'] == symbol].sort_values('date', ascending=False)
-            
-            if symbol_perf.empty:
-                # No performance data for this symbol, fill with NaN
-                result_df.at[idx, 'Market Value 1 Day (%)'] = float('nan')
-                result_df.at[idx, 'Market Value 1 WK (%)'] = float('nan')
-                result_df.at[idx, 'Market Value 1 Month (%)'] = float('nan')
-                result_df.at[idx, 'Market Value 6 Months (%)'] = float('nan')
-                result_df.at[idx, 'Market Value 1 Year (%)'] = float('nan')
-                continue
-            
-            # Get the current day's closing price
-            current_day_data = symbol_perf[symbol_perf['date'] == latest_date]
-            if current_day_data.empty and len(symbol_perf) > 0:
-                # If there's no data for the latest date, use the most recent available
-                current_day_data = symbol_perf.iloc[0:1]
-            
-            # Function to find the closest date to a target date
-            def find_closest_date(target_date):
-                # Find the closest date that's <= target_date
-                valid_dates = symbol_perf[symbol_perf['date'] <= target_date]
-                if not valid_dates.empty:
-                    return valid_dates.iloc[0]
-                return None
-            
-            # Find closest dates for each period
-            prev_day_data = find_closest_date(prev_day_target)
-            week_ago_data = find_closest_date(week_target)
-            month_ago_data = find_closest_date(month_target)
-            six_month_ago_data = find_closest_date(six_month_target)
-            year_ago_data = find_closest_date(year_target)
-            # Calculate market value changes
-            if prev_day_data is not None:
-                if current_price != current_day_data['close'].item():
-                    prev_price = float(current_day_data['close'].item())
-                else:
-                    prev_price = float(prev_day_data['close'])
-                prev_market_value = prev_price * quantity
-                if currency == "USD":
-                    prev_market_value_cad = prev_market_value * cad_exchange_rate
-                else:
-                    prev_market_value_cad = prev_market_value
-                change_1d = (current_market_value_local - prev_market_value) / prev_market_value if prev_market_value > 0 else 0
-                result_df.at[idx, 'Market Value 1 Day (%)'] = change_1d  # Convert to percentage
-                # Add to previous day total for portfolio calculation
-                prev_day_market_value_cad += prev_market_value_cad
-            else:
-                result_df.at[idx, 'Market Value 1 Day (%)'] = float('nan')
-            
-            if week_ago_data is not None:
-                week_price = float(week_ago_data['close'])
-                week_market_value = week_price * quantity
-                change_1w = (current_market_value_local - week_market_value) / week_market_value if week_market_value > 0 else 0
-                result_df.at[idx, 'Market Value 1 WK (%)'] = change_1w
-            else:
-                result_df.at[idx, 'Market Value 1 WK (%)'] = float('nan')
-            
-            if month_ago_data is not None:
-                month_price = float(month_ago_data['close'])
-                month_market_value = month_price * quantity
-                change_1m = (current_market_value_local - month_market_value) / month_market_value if month_market_value > 0 else 0
-                result_df.at[idx, 'Market Value 1 Month (%)'] = change_1m
-            else:
-                result_df.at[idx, 'Market Value 1 Month (%)'] = float('nan')
-            
-            if six_month_ago_data is not None:
-                six_month_price = float(six_month_ago_data['close'])
-                six_month_market_value = six_month_price * quantity
-                change_6m = (current_market_value_local - six_month_market_value) / six_month_market_value if six_month_market_value > 0 else 0
-                result_df.at[idx, 'Market Value 6 Months (%)'] = change_6m
-            else:
-                result_df.at[idx, 'Market Value 6 Months (%)'] = float('nan')
+    holdings_df = holdings.data
+    if holdings_df.empty or price_panel.empty:
+        # st.warning("Empty holdings or performance data. Cannot calculate market value changes.")
+        return holdings_df.copy(), None
+    
+    if horizons is None:
+        horizons = MARKET_VALUE_HORIZONS
+    
+    # Make a copy of the holdings dataframe to avoid modifying the original
+    result_df = holdings_df.copy()
+    
+    price_df = price_panel.closes
+    
+    # Simply use the most recent date in the performance data as our reference point
+    # This is the most reliable approach since market data might have delays
+    latest_date = price_df.index.max()
+    
+    # Print the reference date (can be seen when running outside of Streamlit)
+    print(f"Using {latest_date} as reference date for market value calculations")
+
+    # Row 0 is the reference date, the remaining rows follow the horizons in order
+    target_dates = [latest_date] + [latest_date - pd.Timedelta(days=days) for days in horizons.values()]
+    positions = price_panel.asof_positions(target_dates)
+    
+    # Arrays line up with the rows of result_df
+    store = get_holdings_store(holdings)
+    quantity = store.quantity
+    current_price = store.price
+    current_market_value_local = store.market_value
+    current_market_value_cad = store.market_value_cad
+    
+    if fx_rates is None:
+        fx_rates = FxRates.from_exchange_rates(pd.DataFrame(), current=_implied_fx_rates(store))
+    # CAD per unit of each holding's currency on every target date
+    cad_rates = fx_rates.rate_matrix(target_dates, store.currency)
+    
+    # Holdings without performance data get column -1 and no as-of rows
+    symbol_cols = price_df.columns.get_indexer(store.symbols)
+    holding_positions = np.where(symbol_cols >= 0, positions[:, symbol_cols], -1)
+    has_data = holding_positions >= 0
+    closes = price_df.to_numpy()
+    asof_closes = np.where(has_data, closes[np.maximum(holding_positions, 0), np.maximum(symbol_cols, 0)], np.nan)
+    current_close = asof_closes[0]
+    
+    portfolio_prev_day_change = None
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for row, (column, days) in enumerate(horizons.items(), start=1):
+            base_price, base_rate = asof_closes[row], cad_rates[row]
+            if days == 1:
+                # Quotes move intraday, so the previous close is today's close unless the quote is stale.
+                # Closes may be float32 (PERFORMANCE_DOWNCAST), so compare within float32 precision
+                intraday = ~np.isclose(current_price, current_close, rtol=1e-6, atol=0)
+                base_price = np.where(intraday, current_close, base_price)
+                base_rate = np.where(intraday, cad_rates[0], base_rate)
+            base_market_value = base_price * quantity
+            change = np.where(base_market_value > 0, (current_market_value_local - base_market_value) / base_market_value, 0.0)
+            result_df[column] = np.where(has_data[row], change, np.nan)
             
-            if year_ago_data is not None:
-                year_price = float(year_ago_data['close'])
-                year_market_value = year_price * quantity
-                change_1y = (current_market_value_local - year_market_value) / year_market_value if year_market_value > 0 else 0
-                result_df.at[idx, 'Market Value 1 Year (%)'] = change_1y
-            else:
-                result_df.at[idx, 'Market Value 1 Year (%)'] = float('nan')
-        
-        # Calculate portfolio-level change percentage for previous day
-        portfolio_prev_day_change = (current_day_market_value_cad - prev_day_market_value_cad) / prev_day_market_value_cad if prev_day_market_value_cad > 0 else 0
+            if days == 1:
+                # Calculate portfolio-level change percentage for previous day, over the
+                # holdings whose previous value is known, converted at that day's rate
+                prev_market_value_cad = base_market_value * base_rate
+                counted = has_data[row] & np.isfinite(prev_market_value_cad) & np.isfinite(current_market_value_cad)
+                prev_day_market_value_cad = float(prev_market_value_cad[counted].sum())
+                current_day_market_value_cad = float(current_market_value_cad[counted].sum())
+                portfolio_prev_day_change = (current_day_market_value_cad - prev_day_market_value_cad) / prev_day_market_value_cad if prev_day_market_value_cad > 0 else 0
+    
+    return result_df, portfolio_prev_day_change
+
+
+@analytics_cache(ttl=86400, max_entries=ANALYTICS_CACHE_ENTRIES) # Cache for a day
+def calc_normalized_benchmark_data(price_panel, portfolio_metrics_data):
+    """
+    Portfolio value against QQQ and VOO, all rebased to 100 at the first date.
+    
+    Args:
+        price_panel (PricePanel): Shared price panel built from the historical price data
+        portfolio_metrics_data (dict): Portfolio metrics with matching 'Symbols' and 'Allocations' lists
         
-        return result_df, portfolio_prev_day_change
+    Returns:
+        pandas.DataFrame: Date-indexed QQQ, VOO and Portfolio columns, empty without price data
+    """
+    if price_panel.empty:
+        return pd.DataFrame()
+
+    # Close prices from the shared panel, forward then back filled
+    prices_df = price_panel.filled_closes()
+
+    symbols_allocs = dict(zip(portfolio_metrics_data["Symbols"], portfolio_metrics_data["Allocations"]))
+    symbols_allocs = {k: float(v.strip('%')) for k, v in symbols_allocs.items()}
+    sorted_symbols = sorted(prices_df.columns)
+    sorted_portfolio = {symbol: symbols_allocs[symbol] for symbol in sorted_symbols}
+    allocations = [float(alloc) for alloc in sorted_portfolio.values()]
+
+    normalized_allocs_positions = prices_df / prices_df.iloc[0] * allocations
+    normalized_allocs_positions = normalized_allocs_positions.sum(axis = 1)
+    normalized_benchmark_data = price_panel.normalized(['QQQ', 'VOO'])
+    normalized_benchmark_data['Portfolio'] = normalized_allocs_positions
+
+    return normalized_benchmark_data
+
+
+@analytics_cache(ttl=3600, max_entries=ANALYTICS_CACHE_ENTRIES)
+def calculate_portfolio_nav(holdings, price_panel, fx_rates):
+    """
+    Daily CAD value of the current holdings over the whole price history, with daily returns
+    and each holding's contribution, see nav.compute_nav.
+    
+    Args:
+        holdings (DatasetHandle): Portfolio holdings including quantities and currencies
+        price_panel (PricePanel): Shared price panel built from the historical price data
+        fx_rates (FxRates): CAD rates of the held currencies
+    
+    Returns:
+        NavHistory: Values of the holdings with price history, or None if there is none
+    """
+    if price_panel.empty or holdings.empty:
+        return None
+    store = get_holdings_store(holdings)
+    columns = price_panel.closes.columns.get_indexer(store.symbols)
+    held = columns >= 0
+    if not held.any():
+        return None
+
+    dates = price_panel.closes.index
+    closes = price_panel.forward_filled_closes().to_numpy()[:, columns[held]]
+    rates = fx_rates.rate_matrix(dates, store.currency[held])
+    return NavHistory.from_arrays(dates, store.symbols[held], store.quantity[held], closes, rates)
+
+
+@analytics_cache(ttl=3600, max_entries=ANALYTICS_CACHE_ENTRIES)
+def calculate_portfolio_risk(holdings, price_panel, level=RISK_CONFIDENCE_LEVEL):
+    """
+    Volatility, VaR/CVaR, drawdown, benchmark betas and risk contributions of every holding.
+    
+    Uses the same returns matrix as calculate_portfolio_correlation. Betas are to QQQ and VOO,
+    measured over the same intervals as the holdings' returns.
+    
+    Args:
+        holdings (DatasetHandle): Portfolio holdings including percentage weights
+        price_panel (PricePanel): Shared price panel built from the historical price data
+        level (float): VaR and CVaR confidence level
+    
+    Returns:
+        tuple: (holdings_risk, portfolio_risk) - DataFrame indexed by symbol and dict of
+            portfolio figures, see risk.risk_metrics. (None, None) if there is too little data.
+    """
+    holdings_df = holdings.data
+    if price_panel.empty or holdings_df.empty:
+        return None, None
+
+    price_df = _portfolio_prices(holdings, price_panel)
+    if price_df is None:
+        return None, None
+    returns_df = price_df.pct_change().dropna()
+    weights = get_holdings_store(holdings).weights(price_df.columns)
+
+    benchmarks = [symbol for symbol in ('QQQ', 'VOO') if symbol in price_panel.closes.columns]
+    benchmark_prices = price_panel.filled_closes()[benchmarks].reindex(price_df.index)
+    benchmark_returns = benchmark_prices.pct_change().loc[returns_df.index].dropna(axis=1)
+
+    return risk_metrics(returns_df, weights, benchmark_returns, level=level)
+
+
+@analytics_cache(ttl=3600, max_entries=ANALYTICS_CACHE_ENTRIES)
+def calculate_simulation_inputs(holdings, price_panel):
+    """
+    Return model for the Monte Carlo simulation, estimated from the returns matrix of
+    calculate_portfolio_correlation and the current holding weights.
+    
+    The simulation starts from the total CAD market value of all holdings, spread over the
+    holdings that have enough price history. The returns matrix only keeps the dates common to
+    all holdings, so each return is weighted by the trading days of the price panel it spans.
     
+    Args:
+        holdings (DatasetHandle): Portfolio holdings including percentage weights and CAD market values
+        price_panel (PricePanel): Shared price panel built from the historical price data
+    
+    Returns:
+        SimulationInputs: Mean and covariance of the daily log returns, weights and starting value,
+            or None if there is too little data
+    """
+    holdings_df = holdings.data
+    if price_panel.empty or holdings_df.empty:
+        return None
+
+    price_df = _portfolio_prices(holdings, price_panel)
+    if price_df is None:
+        return None
+    returns_df = price_df.pct_change().dropna()
+    # Trading days between consecutive common dates, counted on the dates of all symbols
+    positions = price_panel.closes.index.get_indexer(price_df.index)
+    days = pd.Series(np.diff(positions), index=price_df.index[1:]).loc[returns_df.index]
+    weights = get_holdings_store(holdings).weights(price_df.columns)
+    initial_value = get_holdings_store(holdings).total_market_value_cad()
+    return SimulationInputs.from_returns(returns_df, weights, initial_value, days=days)
+
+@st.cache_resource
+def get_simulation_pool():
+    """Executor shared by the Monte Carlo runs of every session, a process pool where processes can be forked."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    # Spawned workers would re-run the parent's __main__, which under Streamlit is app.py itself.
+    # Forked workers start from a copy of this process instead. Elsewhere, threads still run the
+    # NumPy parts of a chunk in parallel since those release the GIL.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=SIMULATION_WORKERS, mp_context=multiprocessing.get_context("fork"))
+    return ThreadPoolExecutor(max_workers=SIMULATION_WORKERS, thread_name_prefix="simulation")
+
+
+# --- Price chart data ---
+
+@analytics_cache(ttl=3600, max_entries=ANALYTICS_CACHE_ENTRIES * 4)
+def get_chart_bars(performance, symbol, start=None, end=None, resolution=AUTO_RESOLUTION, max_points=CHART_MAX_POINTS):
+    """
+    Candles of one symbol for a date range, aggregated so the chart gets at most max_points bars.
+    
+    Args:
+        performance (DatasetHandle): Handle returned by load_performance
+        symbol (str): Symbol to chart
+        start (datetime, optional): First date shown
+        end (datetime, optional): Last date shown
+        resolution (str): 'Auto' picks the finest resolution that fits, or 'Full', 'Daily', 'Weekly', 'Monthly'
+        max_points (int): Most bars returned with 'Auto'
+    
+    Returns:
+        tuple: (bars, resolution) - 'date', 'open', 'high', 'low', 'close', 'volume' bars and the resolution used
+    """
+    return bars_for_range(get_symbol_history(performance).bars(symbol), start, end, max_points, resolution)
+
+@analytics_cache(ttl=3600, max_entries=ANALYTICS_CACHE_ENTRIES * 4)
+def get_chart_line(performance, symbol, start=None, end=None, max_points=CHART_MAX_POINTS):
+    """
+    Closes of one symbol for a date range, thinned with LTTB to at most max_points points.
+    
+    Returns:
+        pandas.Series: Close prices indexed by date
+    """
+    bars, _ = bars_for_range(get_symbol_history(performance).bars(symbol), start, end, resolution=FULL_RESOLUTION)
+    return lttb(bars.set_index('date')['close'], max_points)
+
+
+# --- Rolling correlation ---
+
+@st.cache_resource
+def _rolling_correlation_trackers():
+    """Trackers kept between snapshot builds, by window label. Only the scheduler thread updates them."""
+    return {}
+
+def calculate_rolling_correlations(holdings, price_panel):
+    """
+    Extends the rolling and EWMA correlation histories with the bars added since the previous build.
+    
+    Only the largest ROLLING_CORRELATION_SYMBOLS holdings are tracked. The full history is
+    replayed only on the first build, or when the tracked symbols or recent returns change.
+    
+    Args:
+        holdings (DatasetHandle): Portfolio holdings including percentage weights
+        price_panel (PricePanel): Shared price panel built from the historical price data
+    
+    Returns:
+        tuple: (histories, portfolio_corr) - dict of window label -> CorrelationHistory, and a
+            date x window DataFrame of the portfolio weighted correlation. ({}, empty DataFrame)
+            if fewer than 2 holdings have price data.
+    """
+    holdings_df = holdings.data
+    if price_panel.empty or holdings_df.empty:
+        return {}, pd.DataFrame()
+
+    store = get_holdings_store(holdings)
+    largest = store.weights(store.unique_symbols()).sort_values(ascending=False).index
+    symbols = [symbol for symbol in largest if symbol in price_panel.closes.columns][:ROLLING_CORRELATION_SYMBOLS]
+    if len(symbols) < 2:
+        return {}, pd.DataFrame()
+
+    returns_df = price_panel.returns()[symbols].dropna(how='all')
+    engines = {window_label(window): lambda window=window: RollingCorrelation(len(symbols), window) for window in ROLLING_CORRELATION_WINDOWS}
+    engines[ewma_label(ROLLING_CORRELATION_HALFLIFE)] = lambda: EwmaCorrelation(len(symbols), ROLLING_CORRELATION_HALFLIFE)
+
+    trackers = _rolling_correlation_trackers()
+    for label in list(trackers):
+        if label not in engines:
+            del trackers[label]
+
+    weights = store.weights(symbols)
+    histories, portfolio_corr = {}, {}
+    for label, make_engine in engines.items():
+        tracker = trackers.get(label)
+        if tracker is None or not tracker.can_extend(returns_df):
+            tracker = trackers[label] = CorrelationTracker(label, symbols, make_engine())
+        tracker.extend(returns_df)
+        histories[label] = tracker.history()
+        portfolio_corr[label] = histories[label].portfolio(weights)
+    return histories, pd.DataFrame(portfolio_corr)
+
+
+# --- Precomputed analytics snapshots ---
+
+def _calculate(warnings, label, default, calculate, *args, **kwargs):
+    """Runs one analytic of a snapshot build. If it raises, a warning is added and default returned."""
+    try:
+        return calculate(*args, **kwargs)
     except Exception as e:
-        st.error(f"Error calculating market value changes: {e}")
-        import traceback
-        st.error(traceback.format_exc())
-        return holdings_df.copy(), None
+        warnings.append(f"Error calculating {label}: {e}")
+        return default
+
+def build_analytics_snapshot():
+    """
+    Refreshes the expired datasets and computes every analytic the dashboard shows.
+    
+    Runs on the scheduler thread. Holdings are required; if performance data cannot be
+    loaded the stale local store is used and the snapshot carries a warning instead. An
+    analytic that fails is left empty and reported the same way.
+    
+    Returns:
+        AnalyticsSnapshot: The datasets, shared price panel and analytics results
+    """
+    service = get_data_service()
+    datasets = ("holdings", "performance")
+    # Expired datasets are refreshed concurrently and awaited here, not by a user session
+    pending = []
+    for name in datasets:
+        status = service.status(name)
+        if status["loaded_at"] is None or status["stale"]:
+            pending.append(service.refresh(name))
+    load_exchange_rates()
+    for future in pending:
+        future.exception()
+
+    warnings = []
+    holdings, portfolio_metrics = service.get("holdings")
+    try:
+        performance = service.get("performance")
+    except Exception as e:
+        warnings.append(f"Error fetching performance data from API: {e}")
+        performance = _load_stale_performance()
+        if performance is None:
+            performance = DatasetHandle("performance", pd.DataFrame())
+        else:
+            warnings.append("Showing performance data from the local store, which may be out of date.")
+    for name, label in (("holdings", "portfolio data"), ("performance", "performance data")):
+        message = _refresh_failure_message(name, label)
+        if message:
+            warnings.append(message)
+        warnings.extend(service.status(name)["warnings"])
+
+    loaded_at = [service.status(name)["loaded_at"] for name in datasets]
+    price_panel = get_price_panel(performance)
+    fx_rates = get_fx_rates(holdings, price_panel)
+    warnings.extend(exchange_rate_warnings)
+    warnings.extend(_fx_coverage_warnings(holdings, price_panel, fx_rates))
+    correlation_matrix, weighted_corr_matrix, portfolio_weighted_corr = _calculate(
+        warnings, "portfolio correlation", (None, None, None), calculate_portfolio_correlation, holdings, price_panel
+    )
+    market_values, prev_day_change = _calculate(
+        warnings, "market value changes", (holdings.data.copy(), None), calculate_market_value_changes, holdings, price_panel, fx_rates=fx_rates
+    )
+    rolling_correlations, rolling_portfolio_corr = _calculate(
+        warnings, "rolling correlations", ({}, pd.DataFrame()), calculate_rolling_correlations, holdings, price_panel
+    )
+    holdings_risk, portfolio_risk = _calculate(warnings, "portfolio risk", (None, None), calculate_portfolio_risk, holdings, price_panel)
+    nav_history = _calculate(warnings, "the portfolio value history", None, calculate_portfolio_nav, holdings, price_panel, fx_rates)
+    # The 1 day portfolio change comes from calculate_market_value_changes, which accounts for intraday quotes
+    portfolio_changes = {} if nav_history is None else nav_history.horizon_changes(
+        {column: days for column, days in MARKET_VALUE_HORIZONS.items() if days > 1}
+    )
+    simulation_inputs = _calculate(warnings, "simulation inputs", None, calculate_simulation_inputs, holdings, price_panel)
+    normalized_benchmark = _calculate(warnings, "benchmark", pd.DataFrame(), calc_normalized_benchmark_data, price_panel, portfolio_metrics)
+    return AnalyticsSnapshot(
+        as_of=min((t for t in loaded_at if t is not None), default=time.time()),
+        warnings=warnings,
+        holdings=holdings,
+        portfolio_metrics=portfolio_metrics,
+        performance=performance,
+        price_panel=price_panel,
+        fx_rates=fx_rates,
+        correlation_matrix=correlation_matrix,
+        weighted_corr_matrix=weighted_corr_matrix,
+        portfolio_weighted_corr=portfolio_weighted_corr,
+        rolling_correlations=rolling_correlations,
+        rolling_portfolio_corr=rolling_portfolio_corr,
+        holdings_risk=holdings_risk,
+        portfolio_risk=portfolio_risk,
+        simulation_inputs=simulation_inputs,
+        market_values=market_values,
+        prev_day_change=prev_day_change,
+        nav_history=nav_history,
+        portfolio_changes=portfolio_changes,
+        normalized_benchmark=normalized_benchmark,
+    )
+
+
+# --- Live quotes ---
+
+@st.cache_resource
+def get_quote_consumer():
+    """
+    Returns the process-wide quote consumer, connected on first use. Every session in live mode
+    reads the same QuoteStore, so the feed is consumed once however many sessions are open.
+    """
+    timeout = tuple(HTTP_TIMEOUT) if isinstance(HTTP_TIMEOUT, list) else HTTP_TIMEOUT
+    return QuoteConsumer(QuoteStore(), LIVE_QUOTES_URL, timeout=timeout).start()
+
+
+@st.cache_resource
+def get_analytics_scheduler():
+    """Returns the process-wide scheduler that rebuilds the analytics every ANALYTICS_REFRESH_INTERVAL seconds."""
+    return AnalyticsScheduler(
+        build_analytics_snapshot,
+        interval=ANALYTICS_REFRESH_INTERVAL,
+        retry_interval=DATA_SERVICE_ERROR_TTL,
+    ).start()
+
         
 if __name__ == '__main__':
     # Test functions (optional)
     holdings, metrics = fetch_portfolio_data()
     if holdings and metrics:
         print("Portfolio Holdings:")
-        print(pd.DataFrame(holdings).head())
+        print(holdings.data.head())
         print("\nPortfolio Metrics:")
         print(metrics)
 
     print("\nAttempting to load latest performance data...")
-    perf_df, max_performance_date = load_performance()
-    if max_performance_date:
-        print(f"\nPerformance Data from {max_performance_date}:")
-        print(perf_df.head())
+    performance = load_performance()
+    if not performance.empty:
+        print(f"\nPerformance Data up to {performance.data['date'].max()}:")
+        print(performance.data.head())
     else:
         print("Could not load a performance from API.")
 
     # Test portfolio correlation
     print("\nCalculating portfolio correlation...")
-    holdings_df = pd.DataFrame(holdings) if holdings else pd.DataFrame()
-    perf_df_for_cv = perf_df if not perf_df.empty else pd.DataFrame()
+    price_panel = get_price_panel(performance)
     
-    if not holdings_df.empty and not perf_df_for_cv.empty:
-        correlation_matrix, weighted_corr_matrix, portfolio_weighted_corr = calculate_portfolio_correlation(holdings_df, perf_df_for_cv)
+    if holdings and not holdings.empty and not price_panel.empty:
+        correlation_matrix, weighted_corr_matrix, portfolio_weighted_corr = calculate_portfolio_correlation(holdings, price_panel)
         if correlation_matrix is not None and weighted_corr_matrix is not None and portfolio_weighted_corr is not None:
             print("Portfolio Correlation Results:")
             print(f"\nPortfolio Weighted Correlation: {portfolio_weighted_corr:.4f}")
@@ -369,8 +991,8 @@ if __name__ == '__main__':
         
     # Test market value changes function
     print("\nCalculating market value changes...")
-    if not holdings_df.empty and not perf_df.empty:
-        updated_holdings, portfolio_day_change = calculate_market_value_changes(holdings_df, perf_df)
+    if holdings and not holdings.empty and not price_panel.empty:
+        updated_holdings, portfolio_day_change = calculate_market_value_changes(holdings, price_panel)
         if updated_holdings is not None and portfolio_day_change is not None:
             print("Market Value Changes Results:")
             print(f"Portfolio 1-Day Change: {portfolio_day_change*100:.2f}%")